@@ -17,6 +17,7 @@ class Activity(models.Model):
     description = models.TextField(_('descrição'), blank=True)
     activity_type = models.CharField(_('tipo'), max_length=20, choices=ACTIVITY_TYPES)
     icon = models.CharField(_('ícone'), max_length=50, blank=True, help_text=_('Nome do ícone ou emoji'))
+    updated_at = models.DateTimeField(_('atualizado em'), auto_now=True)
     
     class Meta:
         verbose_name = _('atividade')
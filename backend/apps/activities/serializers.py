@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from ufranotes.values import ValuesSerializerMixin
 from .models import Activity
 
 
-class ActivitySerializer(serializers.ModelSerializer):
+class ActivitySerializer(ValuesSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Activity model
     """
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from ufranotes.response_cache import ACTIVITIES, invalidate
+from .models import Activity
+
+
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+def invalidate_responses_for_activity(sender, instance, **kwargs):
+    """
+    Signal to invalidate the cached responses showing activities
+    """
+    invalidate(ACTIVITIES)
@@ -1,9 +1,12 @@
 from django.test import TestCase
+from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from .models import Activity
 
+User = get_user_model()
+
 
 class ActivityModelTest(TestCase):
     """Test cases for Activity model"""
@@ -56,3 +59,15 @@ class ActivityAPITest(APITestCase):
         
         # Should require authentication
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_list_not_modified(self):
+        """Test the activity list is answered with 304 until an activity changes"""
+        user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.client.force_authenticate(user=user)
+        url = reverse('activity-list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        self.activity.name = 'Renamed'
+        self.activity.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
@@ -1,12 +1,16 @@
 from rest_framework import viewsets, permissions
+from ufranotes.conditional import ConditionalRequestMixin
+from ufranotes.response_cache import ACTIVITIES
+from ufranotes.values import ValuesListMixin
 from .models import Activity
 from .serializers import ActivitySerializer
 
 
-class ActivityViewSet(viewsets.ModelViewSet):
+class ActivityViewSet(ConditionalRequestMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Activity model
     """
     queryset = Activity.objects.all()
     serializer_class = ActivitySerializer
-    permission_classes = [permissions.IsAuthenticated] 
\ No newline at end of file
+    permission_classes = [permissions.IsAuthenticated]
+    cache_scopes = [ACTIVITIES] 
\ No newline at end of file
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
-from .models import Note, Checkbox, Connection
+from .models import Note, Checkbox, Connection, DeletedObject
 
 
 @admin.register(Note)
@@ -27,15 +27,24 @@ class CheckboxAdmin(admin.ModelAdmin):
     list_display = ('text', 'note', 'is_checked', 'order')
     list_filter = ('is_checked', 'note__user')
     search_fields = ('text', 'note__title')
-    ordering = ('note', 'order')
+    ordering = ('note', 'rank')
     list_editable = ('is_checked', 'order')
 
 
 @admin.register(Connection)
 class ConnectionAdmin(admin.ModelAdmin):
     """Admin configuration for Connection model"""
-    list_display = ('source', 'target', 'label', 'created_at')
+    list_display = ('source', 'target', 'user', 'label', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('source__title', 'target__title', 'label')
     ordering = ('-created_at',)
     readonly_fields = ('created_at',)
+
+
+@admin.register(DeletedObject)
+class DeletedObjectAdmin(admin.ModelAdmin):
+    """Admin configuration for DeletedObject model"""
+    list_display = ('model_name', 'object_id', 'user', 'deleted_at')
+    list_filter = ('model_name', 'deleted_at')
+    ordering = ('-deleted_at',)
+    readonly_fields = ('deleted_at',)
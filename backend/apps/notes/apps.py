@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class NotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.notes'
-    verbose_name = 'Notas' 
\ No newline at end of file
+    verbose_name = 'Notas'
+    
+    def ready(self):
+        import apps.notes.signals
@@ -0,0 +1,282 @@
+"""
+Streaming export and import of a user's notes as NDJSON.
+
+The export is one JSON object per line: the notes, then their checkboxes,
+the links between notes and activities and the connections, each line
+tagged with its "type" and referring to notes by their exported id. Rows
+are read in primary key order, a chunk at a time, and written as they are
+read, so neither side ever holds the whole export in memory. Under ASGI,
+where Django reads a sync iterator whole before sending it, the chunks come
+from an async iterator instead. Pages are read by key instead of with one
+iterator() query because the MySQL driver loads the complete result of a
+query before the first row is returned.
+
+The import reads the request body line by line, validates each object with
+the API serializers and inserts them with bulk_create in batches, in one
+transaction. No state grows with the input: each created note is keyed by
+its exported id, so the checkboxes, activities and connections that refer
+to it are attached, and duplicate lines skipped instead of counted,
+through one query per batch.
+"""
+
+import uuid
+import orjson
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from rest_framework import serializers
+from apps.activities.models import Activity
+from .bulk import bulk_insert, notes_changed, recount_checkboxes
+from .models import Note, Checkbox, Connection
+from .ranking import is_valid_rank, rank_for_order
+from .search import index_notes
+from .serializers import NoteSerializer, CheckboxSerializer, ConnectionSerializer
+
+CHUNK_SIZE = 2000
+BATCH_SIZE = 500
+
+NOTE_COLUMNS = [
+    'id', 'title', 'content', 'has_reminder', 'reminder_datetime', 'reminder_frequency',
+    'has_checkboxes', 'all_checked', 'xp_value',
+]
+CHECKBOX_COLUMNS = ['note', 'text', 'is_checked', 'order', 'rank']
+ACTIVITY_COLUMNS = ['note', 'activity']
+CONNECTION_COLUMNS = ['source', 'target', 'label']
+
+
+def keyset_chunks(queryset, columns, chunk_size=None):
+    """
+    Yield the .values() rows of the queryset in primary key order, one list
+    of rows per query
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    queryset = queryset.order_by('pk').values('pk', *columns)
+    last = None
+    while True:
+        rows = list((queryset if last is None else queryset.filter(pk__gt=last))[:chunk_size])
+        if rows:
+            last = rows[-1]['pk']
+            for row in rows:
+                del row['pk']
+            yield rows
+        if len(rows) < chunk_size:
+            return
+
+
+def export_chunks(user):
+    """
+    Yield the NDJSON lines of the user's notes and of everything attached to
+    them, one chunk of lines at a time. Notes created while the export runs
+    are left out, along with whatever refers to them, so every reference
+    points to an exported note.
+    """
+    notes = Note.objects.filter(user=user)
+    last_note = notes.order_by('-pk').values_list('pk', flat=True).first()
+    if last_note is None:
+        return
+    
+    exports = [
+        ('note', notes.filter(pk__lte=last_note), NOTE_COLUMNS),
+        ('checkbox', Checkbox.objects.filter(note__user=user, note__lte=last_note), CHECKBOX_COLUMNS),
+        ('activity', Note.activities.through.objects.filter(note__user=user, note__lte=last_note), ACTIVITY_COLUMNS),
+        ('connection', Connection.objects.filter(user=user, source__lte=last_note, target__lte=last_note), CONNECTION_COLUMNS),
+    ]
+    for object_type, queryset, columns in exports:
+        for rows in keyset_chunks(queryset, columns):
+            yield b''.join(orjson.dumps({'type': object_type, **row}) + b'\n' for row in rows)
+
+
+async def aexport_chunks(user):
+    """
+    export_chunks() for responses served over ASGI, which would otherwise
+    read a sync iterator whole before sending it: each chunk is read in a
+    thread, and sent before the next one is read
+    """
+    chunks = export_chunks(user)
+    read = sync_to_async(next)
+    while True:
+        chunk = await read(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+class NoteImporter:
+    """
+    Incremental import of an export into a user's account
+    
+    Lines are added one at a time with add() and inserted in batches; the
+    notes of a batch are inserted before anything referring to them. Each
+    created note gets a bulk_key derived from the import and its exported
+    id, so references to notes, and repeated ids, are resolved through the
+    database with one query per batch instead of a map of every note.
+    """
+    
+    def __init__(self, request):
+        self.user = request.user
+        self.import_key = uuid.uuid4()
+        self.counts = {'notes': 0, 'checkboxes': 0, 'activities': 0, 'connections': 0}
+        self.notes, self.checkboxes, self.links, self.connections = [], [], [], []
+        self.note_serializer = NoteSerializer(context={'request': request})
+        self.checkbox_serializer = CheckboxSerializer()
+        self.label_field = ConnectionSerializer().fields['label']
+        self.activity_ids = set(Activity.objects.values_list('id', flat=True))
+        self.line = 0
+    
+    def error(self, detail, line=None):
+        return serializers.ValidationError({'line': line or self.line, 'errors': detail})
+    
+    def validate(self, validator, row):
+        try:
+            return validator.run_validation(row)
+        except serializers.ValidationError as exc:
+            raise self.error(exc.detail)
+    
+    def note_key(self, exported_id):
+        """
+        Return the bulk_key of the note created for an exported note id
+        """
+        return uuid.uuid5(self.import_key, str(exported_id))
+    
+    def reference(self, row, key):
+        """
+        Return the key of the note an exported note id refers to, with the
+        line to report if that note isn't part of the export
+        """
+        if type(row.get(key)) is not int:
+            raise self.error({key: 'Note not found in the export.'})
+        return (self.line, key, self.note_key(row[key]))
+    
+    def add(self, line):
+        """
+        Validate one line of the export and queue the object it describes
+        """
+        self.line += 1
+        if not line.strip():
+            return
+        try:
+            row = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            raise self.error('Invalid JSON.')
+        if not isinstance(row, dict):
+            raise self.error('Expected a JSON object.')
+        
+        object_type = row.get('type')
+        if object_type == 'note':
+            if type(row.get('id')) is not int:
+                raise self.error({'id': 'A unique integer id is required.'})
+            note = Note(user=self.user, bulk_key=self.note_key(row['id']), **self.validate(self.note_serializer, row))
+            note.all_checked = row.get('all_checked') is True
+            note.normalize()
+            self.notes.append((self.line, note))
+        elif object_type == 'checkbox':
+            note = self.reference(row, 'note')
+            checkbox = Checkbox(**self.validate(self.checkbox_serializer, row))
+            checkbox.rank = row['rank'] if is_valid_rank(row.get('rank')) else rank_for_order(checkbox.order)
+            self.checkboxes.append((note, checkbox))
+        elif object_type == 'activity':
+            note = self.reference(row, 'note')
+            if type(row.get('activity')) is not int or row['activity'] not in self.activity_ids:
+                raise self.error({'activity': 'Activity not found.'})
+            self.links.append((note, row['activity']))
+        elif object_type == 'connection':
+            source, target = self.reference(row, 'source'), self.reference(row, 'target')
+            label = self.validate(self.label_field, row.get('label', ''))
+            self.connections.append((source, target, label))
+        else:
+            raise self.error({'type': 'Unknown object type.'})
+        
+        if max(len(self.notes), len(self.checkboxes), len(self.links), len(self.connections)) >= BATCH_SIZE:
+            self.flush()
+    
+    def insert_notes(self):
+        """
+        Insert the queued notes, rejecting exported ids seen before
+        """
+        keys = {}
+        for line, note in self.notes:
+            if note.bulk_key in keys:
+                raise self.error({'id': 'A unique integer id is required.'}, line)
+            keys[note.bulk_key] = line
+        repeated = Note.objects.filter(bulk_key__in=keys).values_list('bulk_key', flat=True)
+        if repeated:
+            raise self.error({'id': 'A unique integer id is required.'}, min(keys[key] for key in repeated))
+        
+        notes = bulk_insert([note for _, note in self.notes], BATCH_SIZE)
+        index_notes(notes)
+        self.counts['notes'] += len(notes)
+    
+    def resolve(self, references):
+        """
+        Return the ids of the created notes the references point to, by key
+        """
+        keys = {key for _, _, key in references}
+        note_ids = dict(Note.objects.filter(user=self.user, bulk_key__in=keys).values_list('bulk_key', 'pk'))
+        missing = [(line, name) for line, name, key in references if key not in note_ids]
+        if missing:
+            line, name = min(missing)
+            raise self.error({name: 'Note not found in the export.'}, line)
+        return note_ids
+    
+    def flush(self):
+        """
+        Insert the queued objects, notes first, skipping the activity links
+        and connections already imported
+        """
+        if self.notes:
+            self.insert_notes()
+        references = [note for note, _ in self.checkboxes] + [note for note, _ in self.links] + [
+            reference for source, target, _ in self.connections for reference in (source, target)
+        ]
+        note_ids = self.resolve(references) if references else {}
+        
+        if self.checkboxes:
+            checkboxes = []
+            for (_, _, key), checkbox in self.checkboxes:
+                checkbox.note_id = note_ids[key]
+                checkboxes.append(checkbox)
+            Checkbox.objects.bulk_create(checkboxes, batch_size=BATCH_SIZE)
+            recount_checkboxes({checkbox.note_id for checkbox in checkboxes}, BATCH_SIZE)
+            self.counts['checkboxes'] += len(checkboxes)
+        if self.links:
+            pairs = {(note_ids[key], activity_id) for (_, _, key), activity_id in self.links}
+            existing = Note.activities.through.objects.filter(note__in={note_id for note_id, _ in pairs})
+            pairs -= set(existing.values_list('note_id', 'activity_id'))
+            Note.activities.through.objects.bulk_create([
+                Note.activities.through(note_id=note_id, activity_id=activity_id) for note_id, activity_id in pairs
+            ], batch_size=BATCH_SIZE)
+            self.counts['activities'] += len(pairs)
+        if self.connections:
+            labels = {}
+            for (_, _, source), (_, _, target), label in self.connections:
+                labels.setdefault((note_ids[source], note_ids[target]), label)
+            existing = Connection.objects.filter(source__in={source_id for source_id, _ in labels})
+            for pair in existing.values_list('source_id', 'target_id'):
+                labels.pop(pair, None)
+            Connection.objects.bulk_create([
+                Connection(user=self.user, source_id=source_id, target_id=target_id, label=label)
+                for (source_id, target_id), label in labels.items()
+            ], batch_size=BATCH_SIZE)
+            self.counts['connections'] += len(labels)
+        self.notes, self.checkboxes, self.links, self.connections = [], [], [], []
+    
+    def finish(self):
+        """
+        Insert what is left and bring the user's caches up to date
+        """
+        self.flush()
+        if self.counts['notes']:
+            notes_changed(self.user.pk)
+        return self.counts
+
+
+def import_lines(request, lines):
+    """
+    Import the NDJSON lines of an export into the current user's account
+    and return the number of objects created of each type. Any invalid line
+    rolls back the whole import.
+    """
+    with transaction.atomic():
+        importer = NoteImporter(request)
+        for line in lines:
+            importer.add(line)
+        return importer.finish()
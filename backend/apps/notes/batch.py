@@ -0,0 +1,316 @@
+"""
+Batch execution of create, update and delete operations on a user's notes,
+checkboxes and connections, in one request and one transaction.
+
+Operations run in order. Consecutive operations of the same method on the
+same resource form a group, validated one by one with the API serializers
+and written together: creations with one bulk INSERT, updates of notes and
+checkboxes with bulk_update and deletions with one DELETE per group.
+Updates of connections, which may move them to other notes, are saved one
+by one. The checkbox counters, search index and caches that save() and the
+model signals maintain are brought up to date once, when the batch ends.
+
+An `id`, or the note referenced by a checkbox or connection, may be the
+client_id of an object created earlier in the batch. If any operation
+fails the whole batch is rolled back.
+"""
+
+from itertools import groupby
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from .bulk import bulk_insert, notes_changed, recount_checkboxes
+from .models import Note, Checkbox, Connection
+from .search import index_notes
+from .serializers import NoteSerializer, CheckboxSerializer, ConnectionSerializer, BatchOperationSerializer
+
+
+class BatchFailed(Exception):
+    pass
+
+
+class QueryCounter:
+    """
+    Execute wrapper counting the queries run on a connection
+    """
+    
+    def __init__(self):
+        self.count = 0
+    
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class BatchExecutor:
+    """
+    Runs the operations of a batch for the requesting user, keeping one
+    result per operation
+    """
+    
+    def __init__(self, request):
+        self.user = request.user
+        self.context = {'request': request}
+        self.created = {name: {} for name in BatchOperationSerializer.RESOURCES}
+        self.results = []
+        self.failed = False
+        self.reindexed = {}
+        self.recounted = set()
+        self.changed = False
+        self.similarity = False
+    
+    def resolve(self, resource, value):
+        """
+        Return the id a value refers to: an id, or the client_id of an object
+        created earlier in the batch
+        """
+        if isinstance(value, str):
+            return self.created[resource].get(value)
+        return value if type(value) is int else None
+    
+    def succeed(self, index, status_code, object_id, operation=None):
+        self.results[index] = {'status': status_code, 'id': object_id}
+        if operation and operation.get('client_id'):
+            self.created[operation['resource']][operation['client_id']] = object_id
+            self.results[index]['client_id'] = operation['client_id']
+    
+    def fail(self, index, status_code, errors):
+        self.results[index] = {'status': status_code, 'errors': errors}
+        self.failed = True
+    
+    def validate(self, index, serializer, data):
+        """
+        Return the validated data, or None after recording the errors
+        """
+        try:
+            return serializer.run_validation(data)
+        except serializers.ValidationError as exc:
+            self.fail(index, status.HTTP_400_BAD_REQUEST, exc.detail)
+            return None
+    
+    def run(self, operations):
+        self.results = [None] * len(operations)
+        groups = groupby(enumerate(operations), key=lambda item: (item[1]['method'], item[1]['resource']))
+        for (method, resource), group in groups:
+            getattr(self, f'{method}_{resource}')(list(group))
+        self.finish()
+    
+    def finish(self):
+        """
+        Update what save() and the model signals would have, once
+        """
+        if self.reindexed:
+            index_notes(self.reindexed.values())
+        if self.recounted:
+            recount_checkboxes(self.recounted)
+        if self.changed:
+            notes_changed(self.user.pk, similarity=self.similarity)
+    
+    def create_notes(self, operations):
+        serializer = NoteSerializer(context=self.context)
+        created = []
+        for index, operation in operations:
+            data = self.validate(index, serializer, operation['data'])
+            if data is not None:
+                note = Note(user=self.user, **data)
+                note.normalize()
+                created.append((index, operation, note))
+        
+        bulk_insert([note for _, _, note in created])
+        for index, operation, note in created:
+            self.succeed(index, status.HTTP_201_CREATED, note.pk, operation)
+            self.reindexed[note.pk] = note
+        if created:
+            self.changed = self.similarity = True
+    
+    def update_notes(self, operations):
+        serializer = NoteSerializer(partial=True, context=self.context)
+        ids = [self.resolve('notes', operation['id']) for _, operation in operations]
+        notes = Note.objects.filter(user=self.user).in_bulk([note_id for note_id in ids if note_id is not None])
+        updated, fields = {}, set()
+        for (index, operation), note_id in zip(operations, ids):
+            if note_id not in notes:
+                self.fail(index, status.HTTP_404_NOT_FOUND, {'id': 'Note not found.'})
+                continue
+            data = self.validate(index, serializer, operation['data'])
+            if data is None:
+                continue
+            note = notes[note_id]
+            for name, value in data.items():
+                setattr(note, name, value)
+            fields.update(data)
+            updated[note.pk] = note
+            self.succeed(index, status.HTTP_200_OK, note.pk)
+        
+        if not updated:
+            return
+        now = timezone.now()
+        for note in updated.values():
+            note._loaded_reminder = note.normalize()
+            note.updated_at = now
+        Note.objects.bulk_update(updated.values(), fields | {'xp_value', 'next_fire_at', 'updated_at'})
+        if {'title', 'content'} & fields:
+            self.reindexed.update(updated)
+            self.similarity = True
+        self.changed = True
+    
+    def delete(self, queryset, resource, operations, not_found):
+        """
+        Delete the objects of a group with one query; deletions still send
+        the model signals, which keep tombstones and counters
+        """
+        ids = [self.resolve(resource, operation['id']) for _, operation in operations]
+        existing = set(queryset.filter(pk__in=[i for i in ids if i is not None]).values_list('pk', flat=True))
+        for (index, _), object_id in zip(operations, ids):
+            if object_id in existing:
+                self.succeed(index, status.HTTP_204_NO_CONTENT, object_id)
+            else:
+                self.fail(index, status.HTTP_404_NOT_FOUND, {'id': not_found})
+        if existing:
+            queryset.filter(pk__in=existing).delete()
+    
+    def delete_notes(self, operations):
+        self.delete(Note.objects.filter(user=self.user), 'notes', operations, 'Note not found.')
+    
+    def owned_notes(self, note_ids):
+        note_ids = [note_id for note_id in note_ids if note_id is not None]
+        return set(Note.objects.filter(user=self.user, pk__in=note_ids).values_list('pk', flat=True))
+    
+    def create_checkboxes(self, operations):
+        serializer = CheckboxSerializer()
+        note_ids = [self.resolve('notes', operation['data'].get('note')) for _, operation in operations]
+        owned = self.owned_notes(note_ids)
+        created = []
+        for (index, operation), note_id in zip(operations, note_ids):
+            if note_id not in owned:
+                self.fail(index, status.HTTP_400_BAD_REQUEST, {'note': "This note doesn't belong to you."})
+                continue
+            data = self.validate(index, serializer, operation['data'])
+            if data is not None:
+                created.append((index, operation, Checkbox(note_id=note_id, **data)))
+        
+        if created:
+            Checkbox.place([checkbox for _, _, checkbox in created])
+        bulk_insert([checkbox for _, _, checkbox in created])
+        for index, operation, checkbox in created:
+            self.succeed(index, status.HTTP_201_CREATED, checkbox.pk, operation)
+            self.recounted.add(checkbox.note_id)
+        if created:
+            self.changed = True
+    
+    def update_checkboxes(self, operations):
+        serializer = CheckboxSerializer(partial=True)
+        ids = [self.resolve('checkboxes', operation['id']) for _, operation in operations]
+        checkboxes = Checkbox.objects.filter(note__user=self.user).in_bulk([i for i in ids if i is not None])
+        updated, moved, fields = {}, {}, set()
+        for (index, operation), checkbox_id in zip(operations, ids):
+            if checkbox_id not in checkboxes:
+                self.fail(index, status.HTTP_404_NOT_FOUND, {'id': 'Checkbox not found.'})
+                continue
+            data = self.validate(index, serializer, operation['data'])
+            if data is None:
+                continue
+            checkbox = checkboxes[checkbox_id]
+            for name, value in data.items():
+                setattr(checkbox, name, value)
+            if 'order' in data:
+                moved[checkbox.pk] = checkbox
+                fields.add('rank')
+            fields.update(data)
+            updated[checkbox.pk] = checkbox
+            self.succeed(index, status.HTTP_200_OK, checkbox.pk)
+        
+        if not updated:
+            return
+        if moved:
+            Checkbox.place(list(moved.values()))
+        now = timezone.now()
+        for checkbox in updated.values():
+            checkbox.updated_at = now
+        Checkbox.objects.bulk_update(updated.values(), fields | {'updated_at'})
+        if 'is_checked' in fields:
+            self.recounted.update(checkbox.note_id for checkbox in updated.values())
+        self.changed = True
+    
+    def delete_checkboxes(self, operations):
+        self.delete(Checkbox.objects.filter(note__user=self.user), 'checkboxes', operations, 'Checkbox not found.')
+    
+    def create_connections(self, operations):
+        label_field = ConnectionSerializer().fields['label']
+        pairs = [
+            (self.resolve('notes', operation['data'].get('source')), self.resolve('notes', operation['data'].get('target')))
+            for _, operation in operations
+        ]
+        owned = self.owned_notes([note_id for pair in pairs for note_id in pair])
+        taken = set(
+            Connection.objects.filter(source__in=owned, target__in=owned).values_list('source', 'target')
+        ) if owned else set()
+        created = []
+        for (index, operation), (source_id, target_id) in zip(operations, pairs):
+            if source_id not in owned or target_id not in owned:
+                self.fail(index, status.HTTP_400_BAD_REQUEST, {'non_field_errors': ['Both notes must belong to you.']})
+                continue
+            if (source_id, target_id) in taken:
+                self.fail(index, status.HTTP_400_BAD_REQUEST, {
+                    'non_field_errors': ['The fields source, target must make a unique set.'],
+                })
+                continue
+            label = self.validate(index, label_field, operation['data'].get('label', ''))
+            if label is not None:
+                taken.add((source_id, target_id))
+                created.append((index, operation, Connection(
+                    user=self.user, source_id=source_id, target_id=target_id, label=label,
+                )))
+        
+        bulk_insert([connection for _, _, connection in created])
+        for index, operation, connection in created:
+            self.succeed(index, status.HTTP_201_CREATED, connection.pk, operation)
+        if created:
+            endpoints = {note_id for _, _, connection in created for note_id in (connection.source_id, connection.target_id)}
+            Note.objects.filter(pk__in=endpoints).update(layout_stale=True)
+            self.changed = True
+    
+    def update_connections(self, operations):
+        ids = [self.resolve('connections', operation['id']) for _, operation in operations]
+        connections = Connection.objects.filter(user=self.user).in_bulk([i for i in ids if i is not None])
+        for (index, operation), connection_id in zip(operations, ids):
+            if connection_id not in connections:
+                self.fail(index, status.HTTP_404_NOT_FOUND, {'id': 'Connection not found.'})
+                continue
+            data = dict(operation['data'])
+            for field in ['source', 'target']:
+                if field in data:
+                    data[field] = self.resolve('notes', data[field])
+            serializer = ConnectionSerializer(connections[connection_id], data=data, partial=True, context=self.context)
+            if not serializer.is_valid():
+                self.fail(index, status.HTTP_400_BAD_REQUEST, serializer.errors)
+                continue
+            source = serializer.validated_data.get('source', serializer.instance.source)
+            target = serializer.validated_data.get('target', serializer.instance.target)
+            if source.user_id != self.user.pk or target.user_id != self.user.pk:
+                self.fail(index, status.HTTP_400_BAD_REQUEST, {'non_field_errors': ['Both notes must belong to you.']})
+                continue
+            self.succeed(index, status.HTTP_200_OK, serializer.save().pk)
+    
+    def delete_connections(self, operations):
+        self.delete(Connection.objects.filter(user=self.user), 'connections', operations, 'Connection not found.')
+
+
+def execute_batch(request, operations):
+    """
+    Run the operations in one transaction and return whether they all
+    succeeded, with the result of each one; when one fails, the others are
+    rolled back and reported with 424 Failed Dependency
+    """
+    executor = BatchExecutor(request)
+    try:
+        with transaction.atomic():
+            executor.run(operations)
+            if executor.failed:
+                raise BatchFailed()
+    except BatchFailed:
+        executor.results = [
+            result if 'errors' in result else {'status': status.HTTP_424_FAILED_DEPENDENCY}
+            for result in executor.results
+        ]
+    return not executor.failed, executor.results
@@ -0,0 +1,79 @@
+"""
+Helpers for writes that bypass save() and the model signals.
+
+bulk_create and bulk_update skip Model.save() and send no signals, so the
+code using them takes care of what those would have done: the checkbox
+counters of the notes, and the caches and indexes derived from a user's
+notes, updated once for the whole batch instead of once per row.
+"""
+
+import uuid
+from django.db import connection
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from ufranotes.events import publish
+from ufranotes.response_cache import invalidate_user
+from .cache import invalidate_mindmap
+from .models import Note, Checkbox
+from .tasks import queue_similarity_update
+
+BATCH_SIZE = 500
+
+
+def bulk_insert(objects, batch_size=BATCH_SIZE):
+    """
+    Insert objects of one model with bulk_create and set their primary keys.
+    Backends that can't return the keys of a multi-row INSERT (MySQL) read
+    them back with one query per batch, by the unique fields the model names
+    in BULK_KEY: a random bulk_key set here for notes and checkboxes that
+    don't have one yet, the endpoints for connections.
+    """
+    if not objects:
+        return objects
+    model = type(objects[0])
+    returns_keys = connection.features.can_return_rows_from_bulk_insert
+    if not returns_keys and model.BULK_KEY == ('bulk_key',):
+        for obj in objects:
+            if obj.bulk_key is None:
+                obj.bulk_key = uuid.uuid4()
+    model._base_manager.bulk_create(objects, batch_size=batch_size)
+    if returns_keys:
+        return objects
+    
+    for start in range(0, len(objects), batch_size):
+        batch = objects[start:start + batch_size]
+        lookups = {f'{name}__in': {getattr(obj, name) for obj in batch} for name in model.BULK_KEY}
+        rows = model._base_manager.filter(**lookups).values_list(*model.BULK_KEY, 'pk')
+        pks = {row[:-1]: row[-1] for row in rows}
+        for obj in batch:
+            obj.pk = pks[tuple(getattr(obj, name) for name in model.BULK_KEY)]
+            obj._state.adding = False
+    return objects
+
+
+def recount_checkboxes(note_ids, batch_size=BATCH_SIZE):
+    """
+    Recompute the checkbox counters and all_checked status of the given
+    notes, with a constant number of queries per batch of notes
+    """
+    note_ids = list(note_ids)
+    checkboxes = Checkbox.objects.filter(note=OuterRef('pk')).order_by().values('note')
+    total = checkboxes.annotate(total=Count('pk')).values('total')
+    checked = checkboxes.annotate(checked=Count('pk', filter=Q(is_checked=True))).values('checked')
+    for start in range(0, len(note_ids), batch_size):
+        notes = Note.objects.filter(pk__in=note_ids[start:start + batch_size])
+        notes.update(checkbox_count=Coalesce(Subquery(total), 0), checked_count=Coalesce(Subquery(checked), 0))
+        Note.derive_all_checked(notes)
+
+
+def notes_changed(user_id, similarity=True):
+    """
+    Invalidate what is derived from the user's notes: the cached mind map
+    and API responses and, unless told otherwise, the term matrix. Live
+    streams get a 'sync' event in place of one event per row.
+    """
+    invalidate_mindmap(user_id)
+    invalidate_user(user_id)
+    publish(user_id, 'sync', 'changed', {})
+    if similarity:
+        queue_similarity_update(user_id)
@@ -0,0 +1,99 @@
+"""
+Per-user cache of the mind map payload.
+
+Cached payloads are stored under keys that include a per-user version
+number; saving or deleting a note or connection bumps the version, so
+stale payloads are never read again and simply expire. As with the response
+cache, the version is bumped when the change is made and again when its
+transaction commits, so a payload built by a concurrent request from rows
+read before the commit is never served either.
+"""
+
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def mindmap_version_key(user_id):
+    return f'mindmap:version:{user_id}'
+
+
+def new_version():
+    """
+    Return a fresh version number, used when the counter was evicted so it
+    can never collide with a version issued before
+    """
+    return time.time_ns()
+
+
+def get_mindmap_version(user_id):
+    """
+    Return the current mind map version of the user
+    """
+    key = mindmap_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_mindmap_version(user_id):
+    key = mindmap_version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, new_version(), None)
+
+
+def invalidate_mindmap(user_id):
+    """
+    Invalidate the cached mind map of the user, now and once the current
+    transaction commits
+    """
+    bump_mindmap_version(user_id)
+    transaction.on_commit(lambda: bump_mindmap_version(user_id))
+
+
+def layout_version_key(user_id):
+    return f'mindmap:layout:{user_id}'
+
+
+def is_layout_current(user_id, version):
+    """
+    Return True when the stored layout was brought up to date at the given
+    mind map version
+    """
+    return cache.get(layout_version_key(user_id)) == version
+
+
+def mark_layout_current(user_id, version):
+    cache.set(layout_version_key(user_id), version, settings.MINDMAP_CACHE_TIMEOUT)
+
+
+def get_cached_mindmap(user_id, build):
+    """
+    Return the cached mind map of the user, building it with the given
+    callable on a miss
+    """
+    key = f'mindmap:{user_id}:{get_mindmap_version(user_id)}'
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, settings.MINDMAP_CACHE_TIMEOUT)
+    return payload
+
+
+async def aget_cached_mindmap(user_id, build):
+    """
+    get_cached_mindmap() of the async views, building the mind map with
+    the given coroutine function
+    """
+    key = f'mindmap:{user_id}:{await sync_to_async(get_mindmap_version)(user_id)}'
+    payload = await cache.aget(key)
+    if payload is None:
+        payload = await build()
+        await cache.aset(key, payload, settings.MINDMAP_CACHE_TIMEOUT)
+    return payload
@@ -0,0 +1,180 @@
+"""
+Traversal of a user's note graph, following connections in both
+directions.
+
+Neighborhoods are computed by one of two engines, chosen by the
+NOTES_GRAPH_BACKEND setting:
+
+- 'cte': a single recursive common table expression following both
+  directions through the (user, source) and (user, target) indexes, on
+  databases whose WITH RECURSIVE accepts several recursive SELECTs
+  (MySQL 8, MariaDB 10.2, SQLite 3.34).
+- 'bfs': a breadth-first search issuing one batched query per level and
+  direction, for any database.
+
+'auto' (the default) uses 'cte' when the database supports it. Shortest
+paths always use a bidirectional breadth-first search, which stops as
+soon as the searches from both ends meet.
+"""
+
+from django.conf import settings
+from django.db import connection
+
+MAX_DEPTH = 5
+MAX_PATH_LENGTH = 10
+BATCH_SIZE = 500
+
+NEIGHBORHOOD_SQL = '''
+    WITH RECURSIVE reach (id, depth) AS (
+        SELECT %s, 0
+        UNION
+        SELECT c.{target}, reach.depth + 1 FROM reach JOIN {table} c
+        ON c.{user} = %s AND c.{source} = reach.id
+        WHERE reach.depth < %s
+        UNION
+        SELECT c.{source}, reach.depth + 1 FROM reach JOIN {table} c
+        ON c.{user} = %s AND c.{target} = reach.id
+        WHERE reach.depth < %s
+    )
+    SELECT id, MIN(depth) FROM reach GROUP BY id
+'''
+
+
+def supports_recursive_cte():
+    if connection.vendor == 'mysql':
+        return connection.mysql_version >= ((10, 2) if connection.mysql_is_mariadb else (8,))
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 34)
+    return False
+
+
+def get_backend():
+    backend = settings.NOTES_GRAPH_BACKEND
+    if backend == 'auto':
+        return 'cte' if supports_recursive_cte() else 'bfs'
+    return backend
+
+
+def neighbor_pairs(user, note_ids):
+    """
+    Yield (note, neighbor) pairs for the connections touching the given
+    notes, in both directions
+    """
+    from .models import Connection
+    
+    connections = Connection.objects.filter(user=user)
+    note_ids = list(note_ids)
+    for start in range(0, len(note_ids), BATCH_SIZE):
+        batch = note_ids[start:start + BATCH_SIZE]
+        yield from connections.filter(source__in=batch).values_list('source', 'target')
+        yield from connections.filter(target__in=batch).values_list('target', 'source')
+
+
+def neighborhood_with_cte(user, note_id, depth):
+    from .models import Connection
+    
+    quote = connection.ops.quote_name
+    sql = NEIGHBORHOOD_SQL.format(
+        table=quote(Connection._meta.db_table),
+        user=quote(Connection._meta.get_field('user').column),
+        source=quote(Connection._meta.get_field('source').column),
+        target=quote(Connection._meta.get_field('target').column),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [note_id, user.pk, depth, user.pk, depth])
+        return dict(cursor.fetchall())
+
+
+def neighborhood_with_bfs(user, note_id, depth):
+    distances = {note_id: 0}
+    frontier = [note_id]
+    for level in range(1, depth + 1):
+        if not frontier:
+            break
+        reached = []
+        for _, neighbor in neighbor_pairs(user, frontier):
+            if neighbor not in distances:
+                distances[neighbor] = level
+                reached.append(neighbor)
+        frontier = reached
+    return distances
+
+
+def neighborhood(user, note_id, depth):
+    """
+    Return the distance of every note reachable from the given note in at
+    most `depth` connections
+    """
+    if get_backend() == 'cte':
+        return neighborhood_with_cte(user, note_id, depth)
+    return neighborhood_with_bfs(user, note_id, depth)
+
+
+def shortest_path(user, start, end, max_length=MAX_PATH_LENGTH):
+    """
+    Return the ids of the notes on a shortest path between two notes, or
+    None when they are not connected within `max_length` connections
+    """
+    if start == end:
+        return [start]
+    
+    # note -> (previous note towards the search origin, distance)
+    forward = {start: (None, 0)}
+    backward = {end: (None, 0)}
+    forward_frontier, backward_frontier = [start], [end]
+    
+    for _ in range(max_length):
+        if not forward_frontier or not backward_frontier:
+            return None
+        if len(forward_frontier) <= len(backward_frontier):
+            visited, other, frontier = forward, backward, forward_frontier
+        else:
+            visited, other, frontier = backward, forward, backward_frontier
+        
+        reached = []
+        meetings = []
+        for note, neighbor in neighbor_pairs(user, frontier):
+            if neighbor not in visited:
+                visited[neighbor] = (note, visited[note][1] + 1)
+                reached.append(neighbor)
+                if neighbor in other:
+                    meetings.append(neighbor)
+        if meetings:
+            meeting = min(meetings, key=lambda note: (forward[note][1] + backward[note][1], note))
+            return walk(forward, meeting)[::-1] + walk(backward, meeting)[1:]
+        
+        if visited is forward:
+            forward_frontier = reached
+        else:
+            backward_frontier = reached
+    return None
+
+
+def walk(visited, note):
+    """
+    Return the notes from the given one back to the origin of a search
+    """
+    path = []
+    while note is not None:
+        path.append(note)
+        note = visited[note][0]
+    return path
+
+
+def subgraph(user, note_ids):
+    """
+    Return the mind map nodes and edges between the given notes
+    """
+    from .models import Note, Connection
+    
+    note_ids = set(note_ids)
+    nodes = list(
+        Note.objects.filter(user=user, id__in=note_ids)
+        .order_by('id').values('id', 'title', 'has_checkboxes', 'all_checked')
+    )
+    edges = [
+        edge for edge in Connection.objects.filter(user=user, source__in=note_ids)
+        .order_by('id').values('id', 'source', 'target', 'label')
+        if edge['target'] in note_ids
+    ]
+    return nodes, edges
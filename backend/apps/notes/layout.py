@@ -0,0 +1,136 @@
+"""
+Force-directed layout of a user's mind map.
+
+Node positions are computed on the server with a NumPy-vectorized
+Fruchterman-Reingold simulation and stored on each note (layout_x,
+layout_y), so the browser only has to draw them. The layout is
+incremental: notes without a position, and notes flagged with
+layout_stale because a connection touching them was added or removed, are
+relaxed together with their direct neighbors while every other note stays
+where it is.
+"""
+
+import math
+import numpy as np
+
+IDEAL_DISTANCE = 220.0
+FULL_ITERATIONS = 60
+INCREMENTAL_ITERATIONS = 30
+MIN_DISTANCE = 1.0
+CHUNK_SIZE = 256
+
+
+def initial_positions(positions, placed, edges, seed):
+    """
+    Place the notes that have no position yet next to their placed
+    neighbors, or on a disk around the existing layout when they have none
+    """
+    rng = np.random.default_rng(seed)
+    positions = positions.copy()
+    missing = np.flatnonzero(~placed)
+    if not len(missing):
+        return positions
+    
+    centre = positions[placed].mean(axis=0) if placed.any() else np.zeros(2)
+    radius = IDEAL_DISTANCE * math.sqrt(len(positions))
+    angles = rng.uniform(0, 2 * math.pi, len(missing))
+    distances = radius * np.sqrt(rng.uniform(0, 1, len(missing)))
+    positions[missing] = centre + np.column_stack([np.cos(angles), np.sin(angles)]) * distances[:, None]
+    
+    if placed.any() and len(edges):
+        neighbor_sum = np.zeros_like(positions)
+        neighbor_count = np.zeros(len(positions))
+        for a, b in [(edges[:, 0], edges[:, 1]), (edges[:, 1], edges[:, 0])]:
+            usable = placed[b]
+            np.add.at(neighbor_sum, a[usable], positions[b[usable]])
+            np.add.at(neighbor_count, a[usable], 1)
+        near = missing[neighbor_count[missing] > 0]
+        jitter = rng.uniform(-0.5, 0.5, (len(near), 2)) * IDEAL_DISTANCE
+        positions[near] = neighbor_sum[near] / neighbor_count[near, None] + jitter
+    return positions
+
+
+def relax(positions, edges, movable, iterations):
+    """
+    Run the force-directed simulation, moving only the movable notes;
+    fixed notes still repel and attract the movable ones
+    """
+    positions = positions.astype(float)
+    movable = np.flatnonzero(movable)
+    if not len(movable):
+        return positions
+    
+    k = IDEAL_DISTANCE
+    temperature = k * max(1.0, math.sqrt(len(movable)) / 2)
+    cooling = temperature / (iterations + 1)
+    source, target = (edges[:, 0], edges[:, 1]) if len(edges) else (np.array([], int), np.array([], int))
+    
+    for _ in range(iterations):
+        displacement = np.zeros_like(positions)
+        
+        # repulsion k²/d between every movable note and every note, by chunks;
+        # sum_j (p_i - p_j) f_ij is computed as p_i sum_j f_ij - (f @ p)_i
+        # (in single precision, which halves the memory traffic)
+        single = positions.astype(np.float32)
+        squares = (single ** 2).sum(axis=1)
+        for start in range(0, len(movable), CHUNK_SIZE):
+            rows = movable[start:start + CHUNK_SIZE]
+            distance_sq = single[rows] @ single.T
+            distance_sq *= -2
+            distance_sq += squares[rows, None]
+            distance_sq += squares[None, :]
+            force = np.maximum(distance_sq, MIN_DISTANCE, out=distance_sq)
+            np.divide(k * k, force, out=force)
+            displacement[rows] = single[rows] * force.sum(axis=1)[:, None] - force @ single
+        
+        # attraction d²/k along connections
+        delta = positions[source] - positions[target]
+        distance = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), MIN_DISTANCE)
+        pull = delta * (distance / k)[:, None]
+        np.add.at(displacement, source, -pull)
+        np.add.at(displacement, target, pull)
+        
+        step = displacement[movable]
+        length = np.maximum(np.sqrt((step ** 2).sum(axis=1)), MIN_DISTANCE)
+        positions[movable] += step / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature -= cooling
+    return positions
+
+
+def update_layout(nodes, edges):
+    """
+    Bring the mind map layout up to date: lay out the notes that need it,
+    set 'x' and 'y' on every node and return the notes whose position
+    changed as (id, x, y) tuples to be saved
+    
+    Each node has 'id', 'layout_x', 'layout_y' and 'layout_stale'; each
+    edge has 'source' and 'target'.
+    """
+    index = {node['id']: i for i, node in enumerate(nodes)}
+    positions = np.array([[node['layout_x'] or 0.0, node['layout_y'] or 0.0] for node in nodes]).reshape(-1, 2)
+    placed = np.array([node['layout_x'] is not None and node['layout_y'] is not None for node in nodes], dtype=bool)
+    stale = np.array([node['layout_stale'] for node in nodes], dtype=bool) | ~placed
+    pairs = np.array(
+        [(index[edge['source']], index[edge['target']]) for edge in edges
+         if edge['source'] in index and edge['target'] in index],
+        dtype=int,
+    ).reshape(-1, 2)
+    
+    changed = []
+    if stale.any():
+        movable = stale.copy()
+        if len(pairs):
+            movable[pairs[stale[pairs[:, 0]], 1]] = True
+            movable[pairs[stale[pairs[:, 1]], 0]] = True
+        iterations = INCREMENTAL_ITERATIONS if placed.any() else FULL_ITERATIONS
+        seed = sum(node['id'] for node in nodes)
+        positions = relax(initial_positions(positions, placed, pairs, seed), pairs, movable, iterations)
+        changed = [
+            (nodes[i]['id'], float(positions[i, 0]), float(positions[i, 1]))
+            for i in np.flatnonzero(movable)
+        ]
+    
+    for node, (x, y) in zip(nodes, positions.tolist()):
+        node['x'] = round(x, 1)
+        node['y'] = round(y, 1)
+    return changed
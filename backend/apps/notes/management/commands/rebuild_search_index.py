@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from apps.notes.models import Note
+from apps.notes.search import get_backend, index_notes
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the inverted index used by the note search
+    """
+    help = 'Reconstrói o índice de busca das notas'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        if get_backend() != 'index':
+            self.stdout.write('A busca usa o índice FULLTEXT do MySQL; nada a reconstruir.')
+            return
+        
+        batch_size = options['batch_size']
+        batch = []
+        total = 0
+        for note in Note.objects.only('id', 'user_id', 'title', 'content').order_by('id').iterator(chunk_size=batch_size):
+            batch.append(note)
+            if len(batch) == batch_size:
+                index_notes(batch)
+                total += len(batch)
+                batch = []
+        index_notes(batch)
+        total += len(batch)
+        
+        self.stdout.write(self.style.SUCCESS(f'{total} notas indexadas.'))
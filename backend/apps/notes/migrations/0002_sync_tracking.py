@@ -0,0 +1,52 @@
+# Generated by Django 4.2.8 on 2026-10-18 08:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedObject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(choices=[('note', 'Nota'), ('checkbox', 'Checkbox'), ('connection', 'Conexão')], max_length=20, verbose_name='modelo')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='id do objeto')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='excluído em')),
+            ],
+            options={
+                'verbose_name': 'objeto excluído',
+                'verbose_name_plural': 'objetos excluídos',
+            },
+        ),
+        migrations.AddField(
+            model_name='checkbox',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='atualizado em'),
+        ),
+        migrations.AddField(
+            model_name='connection',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='atualizado em'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'updated_at'], name='notes_note_user_id_630db2_idx'),
+        ),
+        migrations.AddField(
+            model_name='deletedobject',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deleted_objects', to=settings.AUTH_USER_MODEL, verbose_name='usuário'),
+        ),
+        migrations.AddIndex(
+            model_name='deletedobject',
+            index=models.Index(fields=['user', 'deleted_at'], name='notes_delet_user_id_138c7f_idx'),
+        ),
+    ]
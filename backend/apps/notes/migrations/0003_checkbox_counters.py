@@ -0,0 +1,38 @@
+# Generated by Django 4.2.8 on 2026-10-18 08:47
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_checkbox_counts(apps, schema_editor):
+    """Fill the checkbox counters of existing notes"""
+    Note = apps.get_model('notes', 'Note')
+    Checkbox = apps.get_model('notes', 'Checkbox')
+    
+    counts = Checkbox.objects.filter(note=OuterRef('pk')).values('note')
+    Note.objects.update(
+        checkbox_count=Coalesce(Subquery(counts.annotate(c=Count('id')).values('c')), Value(0)),
+        checked_count=Coalesce(Subquery(counts.annotate(c=Count('id', filter=Q(is_checked=True))).values('c')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0002_sync_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='checkbox_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='total de checkboxes'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='checked_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='checkboxes marcados'),
+        ),
+        migrations.RunPython(backfill_checkbox_counts, migrations.RunPython.noop),
+    ]
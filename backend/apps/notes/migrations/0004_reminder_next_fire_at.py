@@ -0,0 +1,26 @@
+# Generated by Django 4.2.8 on 2026-10-18 08:57
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_next_fire_at(apps, schema_editor):
+    """Schedule the reminders of existing notes at their current datetime"""
+    Note = apps.get_model('notes', 'Note')
+    Note.objects.filter(has_reminder=True).update(next_fire_at=F('reminder_datetime'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0003_checkbox_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='next_fire_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='próximo disparo'),
+        ),
+        migrations.RunPython(backfill_next_fire_at, migrations.RunPython.noop),
+    ]
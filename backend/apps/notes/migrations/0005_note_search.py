@@ -0,0 +1,43 @@
+# Generated by Django 4.2.8 on 2026-10-18 09:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def add_fulltext_index(apps, schema_editor):
+    """Add the FULLTEXT index used by the 'fulltext' search backend on MySQL"""
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE notes_note ADD FULLTEXT INDEX notes_note_fulltext (title, content)')
+
+
+def remove_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE notes_note DROP INDEX notes_note_fulltext')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0004_reminder_next_fire_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='termo')),
+                ('weight', models.PositiveIntegerField(verbose_name='peso')),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='notes.note', verbose_name='nota')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='usuário')),
+            ],
+            options={
+                'verbose_name': 'termo de busca',
+                'verbose_name_plural': 'termos de busca',
+                'indexes': [models.Index(fields=['user', 'term'], name='notes_searc_user_id_6dd931_idx')],
+            },
+        ),
+        migrations.RunPython(add_fulltext_index, remove_fulltext_index),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.8 on 2026-10-18 09:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_connection_user(apps, schema_editor):
+    """Copy the owner of each connection from its source note"""
+    Note = apps.get_model('notes', 'Note')
+    Connection = apps.get_model('notes', 'Connection')
+    
+    Connection.objects.update(
+        user=Subquery(Note.objects.filter(pk=OuterRef('source')).values('user')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0005_note_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connection',
+            name='user',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='connections', to=settings.AUTH_USER_MODEL, verbose_name='usuário'),
+        ),
+        migrations.RunPython(backfill_connection_user, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='connection',
+            name='user',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='connections', to=settings.AUTH_USER_MODEL, verbose_name='usuário'),
+        ),
+        migrations.AddIndex(
+            model_name='connection',
+            index=models.Index(fields=['user', 'source'], name='notes_conne_user_id_3a8e2f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='connection',
+            index=models.Index(fields=['user', 'target'], name='notes_conne_user_id_e36f91_idx'),
+        ),
+    ]
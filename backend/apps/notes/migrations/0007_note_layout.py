@@ -0,0 +1,28 @@
+# Generated by Django 4.2.8 on 2026-10-18 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0006_connection_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='layout_stale',
+            field=models.BooleanField(default=False, editable=False, verbose_name='posição desatualizada'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='layout_x',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='posição x no mapa'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='layout_y',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='posição y no mapa'),
+        ),
+    ]
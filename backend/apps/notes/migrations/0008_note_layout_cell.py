@@ -0,0 +1,44 @@
+# Generated by Django 4.2.8 on 2026-10-18 09:23
+
+import math
+
+from django.db import migrations, models
+
+# Grid of apps.notes.viewport at the time of this migration
+CELL_SIZE = 1000.0
+CELL_SPAN = 1 << 20
+
+
+def backfill_layout_cell(apps, schema_editor):
+    """Index the notes that already have a mind map position"""
+    Note = apps.get_model('notes', 'Note')
+    
+    notes = Note.objects.filter(layout_x__isnull=False, layout_y__isnull=False).only('layout_x', 'layout_y')
+    batch = []
+    for note in notes.iterator(chunk_size=2000):
+        note.layout_cell = math.floor(note.layout_x / CELL_SIZE) * CELL_SPAN + math.floor(note.layout_y / CELL_SIZE)
+        batch.append(note)
+        if len(batch) == 2000:
+            Note.objects.bulk_update(batch, ['layout_cell'])
+            batch = []
+    Note.objects.bulk_update(batch, ['layout_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0007_note_layout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='layout_cell',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='célula do mapa'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'layout_cell'], name='notes_note_user_id_1adb70_idx'),
+        ),
+        migrations.RunPython(backfill_layout_cell, migrations.RunPython.noop),
+    ]
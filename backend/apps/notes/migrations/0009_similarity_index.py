@@ -0,0 +1,28 @@
+# Generated by Django 4.2.8 on 2026-10-18 09:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('notes', '0008_note_layout_cell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityIndex',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='usuário')),
+                ('data', models.BinaryField(default=b'', verbose_name='dados')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='atualizado em')),
+            ],
+            options={
+                'verbose_name': 'índice de similaridade',
+                'verbose_name_plural': 'índices de similaridade',
+            },
+        ),
+    ]
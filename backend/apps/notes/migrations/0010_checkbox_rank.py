@@ -0,0 +1,53 @@
+# Generated by Django 4.2.8 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+# Ranks of apps.notes.ranking at the time of this migration
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+ORDER_WIDTH = 6
+
+
+def rank_for_order(order):
+    value, digits = min(order, len(DIGITS) ** ORDER_WIDTH - 2) + 1, []
+    for _ in range(ORDER_WIDTH):
+        value, digit = divmod(value, len(DIGITS))
+        digits.append(DIGITS[digit])
+    return ''.join(reversed(digits)).rstrip('0')
+
+
+def backfill_rank(apps, schema_editor):
+    """Rank the existing checkboxes by their order"""
+    Checkbox = apps.get_model('notes', 'Checkbox')
+    
+    batch = []
+    for checkbox in Checkbox.objects.only('order').order_by('pk').iterator(chunk_size=2000):
+        checkbox.rank = rank_for_order(checkbox.order)
+        batch.append(checkbox)
+        if len(batch) == 2000:
+            Checkbox.objects.bulk_update(batch, ['rank'])
+            batch = []
+    Checkbox.objects.bulk_update(batch, ['rank'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0009_similarity_index'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='checkbox',
+            name='rank',
+            field=models.CharField(blank=True, editable=False, max_length=32, verbose_name='posição'),
+        ),
+        migrations.AlterModelOptions(
+            name='checkbox',
+            options={'ordering': ['rank', 'id'], 'verbose_name': 'checkbox', 'verbose_name_plural': 'checkboxes'},
+        ),
+        migrations.RunPython(backfill_rank, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='checkbox',
+            index=models.Index(fields=['note', 'rank'], name='notes_check_note_id_33d181_idx'),
+        ),
+    ]
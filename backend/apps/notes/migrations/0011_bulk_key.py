@@ -0,0 +1,23 @@
+# Generated by Django 4.2.8 on 2026-10-18 10:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0010_checkbox_rank'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='checkbox',
+            name='bulk_key',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True, verbose_name='chave de inserção'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='bulk_key',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True, verbose_name='chave de inserção'),
+        ),
+    ]
@@ -1,6 +1,13 @@
+from collections import defaultdict
 from django.db import models
+from django.db.models import Count, ExpressionWrapper, F, Q
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from .cache import invalidate_mindmap
+from .ranking import MAX_LENGTH, rank_between, rank_for_order, spread_ranks
+from ufranotes.events import publish
+from ufranotes.response_cache import invalidate_user
 
 User = get_user_model()
 
@@ -25,31 +32,158 @@ class Note(models.Model):
     has_reminder = models.BooleanField(_('possui lembrete'), default=False)
     reminder_datetime = models.DateTimeField(_('data e hora do lembrete'), null=True, blank=True)
     reminder_frequency = models.CharField(_('frequência do lembrete'), max_length=10, choices=REMINDER_FREQUENCY_CHOICES, default='none')
+    next_fire_at = models.DateTimeField(_('próximo disparo'), null=True, blank=True, editable=False, db_index=True)
     
     # Checkbox features
     has_checkboxes = models.BooleanField(_('possui checkboxes'), default=False)
     all_checked = models.BooleanField(_('todos marcados'), default=False)
+    checkbox_count = models.PositiveIntegerField(_('total de checkboxes'), default=0, editable=False)
+    checked_count = models.PositiveIntegerField(_('checkboxes marcados'), default=0, editable=False)
     
     # RPG features
     xp_value = models.PositiveIntegerField(_('valor de XP'), default=5, help_text=_('Valor de XP entre 1 e 10'))
     activities = models.ManyToManyField('activities.Activity', verbose_name=_('atividades'), blank=True)
     
+    # Mind map layout, computed on the server (see layout.py)
+    layout_x = models.FloatField(_('posição x no mapa'), null=True, blank=True, editable=False)
+    layout_y = models.FloatField(_('posição y no mapa'), null=True, blank=True, editable=False)
+    layout_stale = models.BooleanField(_('posição desatualizada'), default=False, editable=False)
+    layout_cell = models.BigIntegerField(_('célula do mapa'), null=True, blank=True, editable=False)
+    
+    # Set by bulk inserts to read the keys back on MySQL (see bulk.py)
+    bulk_key = models.UUIDField(_('chave de inserção'), null=True, blank=True, unique=True, editable=False)
+    
     class Meta:
         verbose_name = _('nota')
         verbose_name_plural = _('notas')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['user', 'layout_cell']),
+        ]
         
     def __str__(self):
         return self.title
     
-    def save(self, *args, **kwargs):
-        """Override save to enforce XP limit"""
+    REMINDER_FIELDS = ('has_reminder', 'reminder_datetime', 'reminder_frequency')
+    BULK_KEY = ('bulk_key',)
+    TEXT_FIELDS = ('title', 'content')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the stored reminder settings used to schedule next_fire_at and the stored text"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_reminder = tuple(instance.__dict__.get(name) for name in cls.REMINDER_FIELDS)
+        instance._loaded_text = {name: instance.__dict__[name] for name in cls.TEXT_FIELDS if name in instance.__dict__}
+        return instance
+    
+    def text_changed(self):
+        """
+        Return True when the title or content differ from the stored ones,
+        or the note was not loaded from the database; deferred fields that
+        were never set count as unchanged
+        """
+        loaded = getattr(self, '_loaded_text', None)
+        if loaded is None:
+            return True
+        return any(
+            name in self.__dict__ and self.__dict__[name] != loaded.get(name) for name in self.TEXT_FIELDS
+        )
+    
+    def normalize(self):
+        """
+        Enforce the XP limit and schedule the next reminder, as save() does;
+        bulk inserts, which skip save(), call it directly
+        """
         if self.xp_value > 10:
             self.xp_value = 10
         elif self.xp_value < 1:
             self.xp_value = 1
+        
+        reminder = tuple(getattr(self, name) for name in self.REMINDER_FIELDS)
+        if not self.has_reminder or self.reminder_datetime is None:
+            self.next_fire_at = None
+        elif reminder != getattr(self, '_loaded_reminder', None):
+            # Reminder settings changed: the next occurrence is the new anchor
+            self.next_fire_at = self.reminder_datetime
+        return reminder
+    
+    def save(self, *args, **kwargs):
+        """Override save to enforce XP limit and schedule the next reminder"""
+        reminder = self.normalize()
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.REMINDER_FIELDS):
+            kwargs['update_fields'] = set(update_fields) | {'next_fire_at'}
             
         super().save(*args, **kwargs)
+        self._loaded_reminder = reminder
+        self._loaded_text = {name: self.__dict__[name] for name in self.TEXT_FIELDS if name in self.__dict__}
+    
+    @classmethod
+    def update_checkbox_counts(cls, note_id, total_delta=0, checked_delta=0):
+        """
+        Atomically apply checkbox counter deltas to a note and derive its
+        all_checked status from the counters
+        """
+        notes = cls.objects.filter(pk=note_id)
+        notes.update(
+            checkbox_count=F('checkbox_count') + total_delta,
+            checked_count=F('checked_count') + checked_delta,
+        )
+        cls.derive_all_checked(notes)
+    
+    @classmethod
+    def derive_all_checked(cls, notes):
+        """
+        Set all_checked from the counters of the given notes; notes without
+        checkboxes keep their current status
+        """
+        all_checked = ExpressionWrapper(Q(checked_count=F('checkbox_count')), output_field=models.BooleanField())
+        changed = notes.filter(checkbox_count__gt=0).exclude(all_checked=all_checked)
+        if changed.update(all_checked=all_checked, updated_at=timezone.now()):
+            for user_id in set(notes.values_list('user_id', flat=True)):
+                invalidate_mindmap(user_id)
+                invalidate_user(user_id)
+    
+    def recount_checkboxes(self):
+        """
+        Recompute the checkbox counters of the note from its checkboxes
+        """
+        counts = self.checkboxes.aggregate(
+            total=Count('id'),
+            checked=Count('id', filter=Q(is_checked=True)),
+        )
+        notes = Note.objects.filter(pk=self.pk)
+        notes.update(checkbox_count=counts['total'], checked_count=counts['checked'])
+        Note.derive_all_checked(notes)
+    
+    def check_all(self):
+        """
+        Mark every checkbox of the note as checked with a constant number
+        of queries
+        """
+        now = timezone.now()
+        total = self.checkboxes.update(is_checked=True, updated_at=now)
+        self.checkbox_count = total
+        self.checked_count = total
+        self.all_checked = True
+        self.save(update_fields=['checkbox_count', 'checked_count', 'all_checked', 'updated_at'])
+    
+    @classmethod
+    def check_all_many(cls, note_ids):
+        """
+        Mark every checkbox of the given notes as checked and the notes as
+        completed, with one UPDATE for each table
+        """
+        now = timezone.now()
+        Checkbox.objects.filter(note_id__in=note_ids).update(is_checked=True, updated_at=now)
+        notes = cls.objects.filter(pk__in=note_ids)
+        notes.update(checked_count=F('checkbox_count'), all_checked=True, updated_at=now)
+        for user_id in set(notes.values_list('user_id', flat=True)):
+            invalidate_mindmap(user_id)
+            invalidate_user(user_id)
+            publish(user_id, 'sync', 'changed', {})
 
 
 class Checkbox(models.Model):
@@ -60,40 +194,206 @@ class Checkbox(models.Model):
     text = models.CharField(_('texto'), max_length=255)
     is_checked = models.BooleanField(_('marcado'), default=False)
     order = models.PositiveIntegerField(_('ordem'), default=0)
+    rank = models.CharField(_('posição'), max_length=32, blank=True, editable=False)
+    updated_at = models.DateTimeField(_('atualizado em'), auto_now=True)
+    bulk_key = models.UUIDField(_('chave de inserção'), null=True, blank=True, unique=True, editable=False)
+    
+    BULK_KEY = ('bulk_key',)
     
     class Meta:
         verbose_name = _('checkbox')
         verbose_name_plural = _('checkboxes')
-        ordering = ['order']
+        ordering = ['rank', 'id']
+        indexes = [
+            models.Index(fields=['note', 'rank']),
+        ]
         
     def __str__(self):
         return f"{self.text} ({'✓' if self.is_checked else '✗'})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the stored state used to update the note's counters"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_state = (instance.__dict__.get('note_id'), instance.__dict__.get('is_checked'))
+        instance._loaded_order = instance.__dict__.get('order')
+        return instance
+    
     def save(self, *args, **kwargs):
-        """Override save to update note's all_checked status"""
+        """
+        Override save to place the checkbox by its order when it is new or
+        its order changed, and to update note's checkbox counters and
+        all_checked status
+        """
+        adding = self._state.adding
+        loaded_note_id, loaded_is_checked = getattr(self, '_loaded_state', (None, None))
+        
+        if not self.rank or self.order != getattr(self, '_loaded_order', self.order):
+            if adding or self.rank:
+                Checkbox.place([self])
+            else:
+                # Existing checkbox saved before ranks existed
+                self.rank = rank_for_order(self.order)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'rank'}
+        
         super().save(*args, **kwargs)
+        self._loaded_order = self.order
+        
+        if adding:
+            Note.update_checkbox_counts(self.note_id, total_delta=1, checked_delta=int(self.is_checked))
+        elif loaded_note_id != self.note_id or loaded_is_checked is None:
+            # State unknown or moved to another note: recount instead of guessing
+            self.note.recount_checkboxes()
+            if loaded_note_id is not None and loaded_note_id != self.note_id:
+                Note(pk=loaded_note_id).recount_checkboxes()
+        elif loaded_is_checked != self.is_checked:
+            Note.update_checkbox_counts(self.note_id, checked_delta=1 if self.is_checked else -1)
         
-        # Update the note's all_checked status
-        note = self.note
-        all_checkboxes = note.checkboxes.all()
-        if all_checkboxes:
-            note.all_checked = all(checkbox.is_checked for checkbox in all_checkboxes)
-            note.save(update_fields=['all_checked'])
+        self._loaded_state = (self.note_id, self.is_checked)
+    
+    @classmethod
+    def place(cls, checkboxes):
+        """
+        Rank new or moved checkboxes, in turn, right after the checkbox at
+        position `order` among the other checkboxes of their note, with one
+        query. Stored orders aren't kept positional, so the other checkboxes
+        are placed by their position in rank order. The rank derived from
+        the order is kept when it fits there; a note whose ranks would grow
+        too long is ranked again evenly.
+        """
+        placed = {id(checkbox) for checkbox in checkboxes}
+        siblings = defaultdict(list)
+        rows = (
+            cls.objects.filter(note_id__in={checkbox.note_id for checkbox in checkboxes})
+            .exclude(pk__in=[checkbox.pk for checkbox in checkboxes if checkbox.pk is not None])
+            .order_by('rank', 'id').values_list('note_id', 'pk', 'rank')
+        )
+        for note_id, pk, rank in rows:
+            ranked = siblings[note_id]
+            ranked.append((len(ranked), cls(pk=pk, note_id=note_id, rank=rank)))
+        
+        respread = set()
+        for checkbox in checkboxes:
+            ranked = siblings[checkbox.note_id]
+            position = next((i for i, (order, _) in enumerate(ranked) if order > checkbox.order), len(ranked))
+            before = ranked[position - 1][1].rank or None if position else None
+            after = next((other.rank for _, other in ranked[position:] if other.rank > (before or '')), None)
+            rank = rank_for_order(checkbox.order)
+            if (before is not None and rank <= before) or (after is not None and rank >= after):
+                rank = rank_between(before, after)
+            checkbox.rank = rank
+            ranked.insert(position, (checkbox.order, checkbox))
+            if len(rank) > MAX_LENGTH:
+                respread.add(checkbox.note_id)
+        
+        stale, now = [], timezone.now()
+        for note_id in respread:
+            ranked = siblings[note_id]
+            for (_, other), rank in zip(ranked, spread_ranks(len(ranked))):
+                if other.rank != rank:
+                    other.rank, other.updated_at = rank, now
+                    if id(other) not in placed:
+                        stale.append(other)
+        if stale:
+            cls.objects.bulk_update(stale, ['rank', 'updated_at'])
 
 
 class Connection(models.Model):
     """
     Model for connections between notes (for the mental map feature)
     """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='connections', editable=False, verbose_name=_('usuário'))
     source = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='outgoing_connections', verbose_name=_('origem'))
     target = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='incoming_connections', verbose_name=_('destino'))
     label = models.CharField(_('rótulo'), max_length=100, blank=True)
     created_at = models.DateTimeField(_('criado em'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('atualizado em'), auto_now=True)
+    
+    BULK_KEY = ('source_id', 'target_id')
     
     class Meta:
         verbose_name = _('conexão')
         verbose_name_plural = _('conexões')
         unique_together = ('source', 'target')
+        indexes = [
+            models.Index(fields=['user', 'source']),
+            models.Index(fields=['user', 'target']),
+        ]
+        
+    def __str__(self):
+        return f"{self.source.title} → {self.target.title}"
+    
+    def save(self, *args, **kwargs):
+        """
+        Take the owner from the source note when it is not given explicitly
+        """
+        if self.user_id is None:
+            self.user_id = self.source.user_id
+        super().save(*args, **kwargs)
+
+
+class DeletedObject(models.Model):
+    """
+    Tombstone kept for deleted notes, checkboxes and connections so that
+    clients can remove them when synchronizing
+    """
+    MODEL_CHOICES = [
+        ('note', _('Nota')),
+        ('checkbox', _('Checkbox')),
+        ('connection', _('Conexão')),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='deleted_objects', verbose_name=_('usuário'))
+    model_name = models.CharField(_('modelo'), max_length=20, choices=MODEL_CHOICES)
+    object_id = models.PositiveBigIntegerField(_('id do objeto'))
+    deleted_at = models.DateTimeField(_('excluído em'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('objeto excluído')
+        verbose_name_plural = _('objetos excluídos')
+        indexes = [
+            models.Index(fields=['user', 'deleted_at']),
+        ]
+        
+    def __str__(self):
+        return f"{self.model_name} #{self.object_id}"
+
+
+class SearchTerm(models.Model):
+    """
+    Posting of the inverted index used to search notes: the weight of a
+    term in a note (see apps.notes.search)
+    """
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='search_terms', verbose_name=_('nota'))
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', verbose_name=_('usuário'))
+    term = models.CharField(_('termo'), max_length=64)
+    weight = models.PositiveIntegerField(_('peso'))
+    
+    class Meta:
+        verbose_name = _('termo de busca')
+        verbose_name_plural = _('termos de busca')
+        indexes = [
+            models.Index(fields=['user', 'term']),
+        ]
+        
+    def __str__(self):
+        return f"{self.term} ({self.weight})"
+
+
+class SimilarityIndex(models.Model):
+    """
+    Term matrix of a user's notes used to suggest connections (see
+    apps.notes.similarity), kept up to date by a Celery task
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='+', verbose_name=_('usuário'))
+    data = models.BinaryField(_('dados'), default=b'')
+    updated_at = models.DateTimeField(_('atualizado em'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('índice de similaridade')
+        verbose_name_plural = _('índices de similaridade')
         
     def __str__(self):
-        return f"{self.source.title} → {self.target.title}" 
\ No newline at end of file
+        return f"{self.user} ({self.updated_at})"
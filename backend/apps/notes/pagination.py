@@ -0,0 +1,11 @@
+from rest_framework.pagination import CursorPagination
+
+
+class NoteCursorPagination(CursorPagination):
+    """
+    Keyset pagination for notes, following the Note.Meta ordering
+    """
+    ordering = '-created_at'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
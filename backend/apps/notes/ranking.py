@@ -0,0 +1,147 @@
+"""
+Fractional rank keys ordering the checkboxes of a note.
+
+A rank is a string of base 36 digits compared lexicographically, read as
+the fraction 0.<digits>: there is always another rank between two
+different ones, so moving or inserting a checkbox only writes its own
+rank. Ranks never end with a '0', which would leave no room below them.
+Repeated insertions at the same spot make ranks longer; past MAX_LENGTH
+the ranks of the whole note are spread evenly again.
+
+Only digits and lowercase letters are used, which sort the same way in
+Python and under MySQL's case-insensitive collations.
+"""
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+MAX_LENGTH = 24
+# Digits of the ranks derived from the integer `order` field
+ORDER_WIDTH = 6
+
+
+def to_digits(value, width):
+    """
+    Return the base 36 digits of a fraction numerator, without trailing zeros
+    """
+    digits = []
+    for _ in range(width):
+        value, digit = divmod(value, BASE)
+        digits.append(DIGITS[digit])
+    return ''.join(reversed(digits)).rstrip('0')
+
+
+def rank_for_order(order):
+    """
+    Return the rank of a checkbox placed by its integer order
+    """
+    return to_digits(min(order, BASE ** ORDER_WIDTH - 2) + 1, ORDER_WIDTH)
+
+
+def is_valid_rank(rank):
+    return isinstance(rank, str) and 0 < len(rank) <= MAX_LENGTH and rank[-1] != '0' and all(
+        digit in DIGITS for digit in rank
+    )
+
+
+def rank_between(before, after):
+    """
+    Return a rank sorting strictly after `before` and before `after`; either
+    may be None for an open end
+    """
+    before = before or ''
+    if after is not None:
+        # Keep the common prefix, reading a missing digit of `before` as 0
+        length = 0
+        while length < len(after) and (before[length] if length < len(before) else '0') == after[length]:
+            length += 1
+        if length:
+            return after[:length] + rank_between(before[length:], after[length:])
+    
+    low = DIGITS.index(before[0]) if before else 0
+    high = DIGITS.index(after[0]) if after is not None else BASE
+    if high - low > 1:
+        return DIGITS[(low + high) // 2]
+    if after is not None and len(after) > 1:
+        return after[0]
+    return DIGITS[low] + rank_between(before[1:], None)
+
+
+def ranks_between(before, after, count):
+    """
+    Return `count` increasing ranks between `before` and `after`, splitting
+    the interval in halves so their length grows with log(count)
+    """
+    if count == 0:
+        return []
+    middle = rank_between(before, after)
+    half = count // 2
+    return ranks_between(before, middle, half) + [middle] + ranks_between(middle, after, count - half - 1)
+
+
+def spread_ranks(count):
+    """
+    Return `count` short increasing ranks spread evenly over the whole range
+    """
+    width = 1
+    while BASE ** width <= count:
+        width += 1
+    return [to_digits((index + 1) * BASE ** width // (count + 1), width) for index in range(count)]
+
+
+def longest_increasing(ranks):
+    """
+    Return the positions of a longest strictly increasing subsequence of
+    ranks
+    """
+    tails, tail_positions, previous = [], [], [None] * len(ranks)
+    for position, rank in enumerate(ranks):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if tails[middle] < rank:
+                low = middle + 1
+            else:
+                high = middle
+        previous[position] = tail_positions[low - 1] if low else None
+        if low == len(tails):
+            tails.append(rank)
+            tail_positions.append(position)
+        else:
+            tails[low] = rank
+            tail_positions[low] = position
+    
+    positions = []
+    position = tail_positions[-1] if tail_positions else None
+    while position is not None:
+        positions.append(position)
+        position = previous[position]
+    return positions[::-1]
+
+
+def reorder_ranks(ranks):
+    """
+    Return the new ranks that put items in the given order, as
+    {position: rank} for the positions whose rank must change
+    
+    The longest run of items already in increasing order keeps its ranks
+    and only the others get a rank between their new neighbors, so moving
+    one item changes one rank. When that would make a rank too long, every
+    item gets a new, evenly spread, rank. Blank ranks are all replaced.
+    """
+    kept = longest_increasing(ranks) if all(ranks) else []
+    changes = {}
+    bounds = [-1] + kept + [len(ranks)]
+    for start, end in zip(bounds, bounds[1:]):
+        moved = range(start + 1, end)
+        if moved:
+            before = ranks[start] if start >= 0 else None
+            after = ranks[end] if end < len(ranks) else None
+            changes.update(zip(moved, ranks_between(before, after, len(moved))))
+    
+    if any(len(rank) > MAX_LENGTH for rank in changes.values()):
+        changes = {
+            position: rank
+            for position, rank in enumerate(spread_ranks(len(ranks)))
+            if ranks[position] != rank
+        }
+    return changes
@@ -0,0 +1,71 @@
+"""
+Calendar-aware recurrence of note reminders.
+
+Occurrences are computed from the reminder anchor (reminder_datetime) in
+the project's local time, so a reminder keeps its wall-clock time and a
+monthly reminder set on the 31st fires on the last day of shorter months
+without drifting: Jan 31, Feb 28, Mar 31, ...
+"""
+
+import calendar
+import datetime
+from django.utils import timezone
+
+
+def add_months(moment, months):
+    """
+    Return the naive moment shifted by whole calendar months, clamping the
+    day to the length of the target month
+    """
+    month_index = moment.month - 1 + months
+    year = moment.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(moment.day, calendar.monthrange(year, month)[1])
+    return moment.replace(year=year, month=month, day=day)
+
+
+def occurrence(anchor, frequency, index):
+    """
+    Return the index-th occurrence of a reminder (index 0 is the anchor)
+    """
+    tz = timezone.get_default_timezone()
+    local = timezone.localtime(anchor, tz).replace(tzinfo=None)
+    
+    if frequency == 'daily':
+        local += datetime.timedelta(days=index)
+    elif frequency == 'weekly':
+        local += datetime.timedelta(weeks=index)
+    elif frequency == 'monthly':
+        local = add_months(local, index)
+    else:
+        raise ValueError(f'Reminder frequency {frequency!r} does not repeat')
+    
+    return timezone.make_aware(local, tz)
+
+
+def next_occurrence(anchor, frequency, after):
+    """
+    Return the first occurrence of a repeating reminder strictly after the
+    given moment, or None for reminders that do not repeat
+    """
+    if frequency not in ('daily', 'weekly', 'monthly'):
+        return None
+    
+    tz = timezone.get_default_timezone()
+    start = timezone.localtime(anchor, tz)
+    end = timezone.localtime(after, tz)
+    
+    # Estimate the index from the elapsed time, then correct it by a step
+    if frequency == 'daily':
+        index = (end.date() - start.date()).days
+    elif frequency == 'weekly':
+        index = (end.date() - start.date()).days // 7
+    else:
+        index = (end.year - start.year) * 12 + end.month - start.month
+    index = max(index, 1)
+    
+    while index > 1 and occurrence(anchor, frequency, index - 1) > after:
+        index -= 1
+    while occurrence(anchor, frequency, index) <= after:
+        index += 1
+    return occurrence(anchor, frequency, index)
@@ -0,0 +1,219 @@
+"""
+Full-text search over a user's notes.
+
+Two engines are available, chosen by the NOTES_SEARCH_BACKEND setting:
+
+- 'index': an inverted index kept in the SearchTerm table, one posting per
+  (note, term), maintained when a note is saved. Text is tokenized with
+  Portuguese stopwords, accent folding and light plural stemming, and
+  results are ranked with a BM25-style saturated term weight times the
+  inverse document frequency within the user's notes.
+- 'fulltext': MySQL's FULLTEXT index on (title, content), ranked by
+  MATCH ... AGAINST; the accent-insensitive utf8mb4 collation folds accents.
+
+'auto' (the default) uses 'fulltext' on MySQL and 'index' elsewhere.
+"""
+
+import math
+import re
+import unicodedata
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+TITLE_WEIGHT = 3
+SATURATION = 1.2
+SNIPPET_LENGTH = 160
+MAX_TERM_LENGTH = 64
+
+STOPWORDS = frozenset('''
+    a ao aos as ate com como da das de del dela delas dele deles depois do dos
+    e ela elas ele eles em entre era eram essa essas esse esses esta estas este
+    estes eu foi foram ha isso isto ja la lhe lhes mais mas me mesmo meu meus
+    minha minhas muito na nas nem no nos nossa nossas nosso nossos num numa o
+    os ou para pela pelas pelo pelos por qual quando que quem se sem ser seu
+    seus so sua suas tambem te tem tu tua tuas um uma umas uns voce voces
+'''.split())
+
+PLURAL_SUFFIXES = [
+    ('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ois', 'ol'),
+    ('uis', 'ul'), ('res', 'r'), ('zes', 'z'), ('ses', 's'), ('ns', 'm'),
+]
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def fold(text):
+    """
+    Lowercase the text and strip accents, one character for each character
+    of the input so positions can be mapped back to the original text
+    """
+    return ''.join(unicodedata.normalize('NFKD', char)[:1] for char in text.lower())
+
+
+def stem(token):
+    """
+    Reduce Portuguese plurals to their singular form (notas -> nota,
+    licoes -> licao)
+    """
+    if len(token) <= 3:
+        return token
+    for suffix, replacement in PLURAL_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            return token[:-len(suffix)] + replacement
+    if token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """
+    Return the search terms of a text
+    """
+    return [
+        stem(token)[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(fold(text))
+        if token not in STOPWORDS and len(token) > 1
+    ]
+
+
+def term_weights(note):
+    """
+    Return the weight of each term of a note, counting title terms more
+    """
+    weights = {}
+    for term in tokenize(note.title):
+        weights[term] = weights.get(term, 0) + TITLE_WEIGHT
+    for term in tokenize(note.content):
+        weights[term] = weights.get(term, 0) + 1
+    return weights
+
+
+def get_backend():
+    backend = settings.NOTES_SEARCH_BACKEND
+    if backend == 'auto':
+        return 'fulltext' if connection.vendor == 'mysql' else 'index'
+    return backend
+
+
+def index_notes(notes, batch_size=1000):
+    """
+    Rebuild the postings of the given notes in the inverted index
+    """
+    from .models import SearchTerm
+    
+    if get_backend() != 'index':
+        return
+    
+    notes = list(notes)
+    SearchTerm.objects.filter(note__in=[note.pk for note in notes]).delete()
+    SearchTerm.objects.bulk_create(
+        [
+            SearchTerm(note_id=note.pk, user_id=note.user_id, term=term, weight=weight)
+            for note in notes
+            for term, weight in term_weights(note).items()
+        ],
+        batch_size=batch_size,
+    )
+
+
+def rank_with_index(notes, user, terms, limit):
+    """
+    Return (note id, score) pairs ranked with the inverted index
+    """
+    from .models import SearchTerm
+    
+    postings = SearchTerm.objects.filter(user=user, term__in=terms)
+    document_count = notes.count()
+    frequencies = dict(postings.values_list('term').annotate(df=Count('id')).order_by())
+    if not frequencies:
+        return []
+    
+    saturated = F('weight') * Value(SATURATION + 1) / (F('weight') + Value(SATURATION))
+    score = Sum(Case(
+        *[
+            When(term=term, then=saturated * Value(math.log(1 + document_count / frequency)))
+            for term, frequency in frequencies.items()
+        ],
+        output_field=FloatField(),
+    ))
+    return list(
+        postings.filter(note__in=notes)
+        .values('note_id').annotate(score=score)
+        .order_by('-score', '-note_id')
+        .values_list('note_id', 'score')[:limit]
+    )
+
+
+def rank_with_fulltext(notes, query, limit):
+    """
+    Return (note id, score) pairs ranked by MySQL's FULLTEXT index
+    """
+    relevance = RawSQL(
+        'MATCH (notes_note.title, notes_note.content) AGAINST (%s IN NATURAL LANGUAGE MODE)',
+        (query,),
+        output_field=FloatField(),
+    )
+    return list(
+        notes.annotate(score=relevance).filter(score__gt=0)
+        .order_by('-score', '-id')
+        .values_list('id', 'score')[:limit]
+    )
+
+
+def highlight(text, terms):
+    """
+    Return an HTML-escaped snippet of the text around the first matching
+    term, with the matching words wrapped in <mark>
+    """
+    folded = fold(text)
+    matches = [
+        match for match in TOKEN_RE.finditer(folded)
+        if stem(match.group())[:MAX_TERM_LENGTH] in terms
+    ]
+    if not matches:
+        return escape(text[:SNIPPET_LENGTH])
+    
+    start = max(0, matches[0].start() - SNIPPET_LENGTH // 4)
+    end = min(len(text), start + SNIPPET_LENGTH)
+    parts = ['...' if start > 0 else '']
+    position = start
+    for match in matches:
+        if match.start() < start or match.end() > end:
+            continue
+        parts.append(escape(text[position:match.start()]))
+        parts.append(f'<mark>{escape(text[match.start():match.end()])}</mark>')
+        position = match.end()
+    parts.append(escape(text[position:end]))
+    parts.append('...' if end < len(text) else '')
+    return ''.join(parts)
+
+
+def search_notes(notes, user, query, limit):
+    """
+    Search the given notes of a user and return the best matches, each
+    with its score and highlighted snippet
+    """
+    terms = set(tokenize(query))
+    if not terms:
+        return []
+    
+    if get_backend() == 'fulltext':
+        ranking = rank_with_fulltext(notes, query, limit)
+    else:
+        ranking = rank_with_index(notes, user, terms, limit)
+    
+    found = notes.only('id', 'title', 'content').in_bulk([note_id for note_id, _ in ranking])
+    results = []
+    for note_id, score in ranking:
+        note = found[note_id]
+        results.append({
+            'id': note.id,
+            'title': note.title,
+            'score': round(score, 4),
+            'title_highlight': highlight(note.title, terms),
+            'snippet': highlight(note.content, terms),
+        })
+    return results
@@ -1,9 +1,48 @@
 from rest_framework import serializers
 from .models import Note, Checkbox, Connection
 from apps.activities.models import Activity
+from ufranotes.values import ValuesSerializerMixin
 
 
-class ActivitySerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Mixin that lets the request choose the serialized fields through the
+    `fields` and `exclude` query parameters (comma separated field names)
+    """
+    
+    @classmethod
+    def get_requested_fields(cls, request):
+        """
+        Return the field names selected by the request, in Meta.fields order
+        """
+        field_names = list(cls.Meta.fields)
+        if request is None:
+            return field_names
+        
+        fields = request.query_params.get('fields')
+        exclude = request.query_params.get('exclude')
+        if fields:
+            selected = {name.strip() for name in fields.split(',')}
+            field_names = [name for name in field_names if name in selected]
+        if exclude:
+            excluded = {name.strip() for name in exclude.split(',')}
+            field_names = [name for name in field_names if name not in excluded]
+        return field_names
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        
+        requested = set(self.get_requested_fields(request))
+        for name in list(self.fields):
+            if name not in requested:
+                self.fields.pop(name)
+
+
+class ActivitySerializer(ValuesSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Activity model
     """
@@ -12,16 +51,26 @@ class ActivitySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'activity_type', 'icon']
 
 
-class CheckboxSerializer(serializers.ModelSerializer):
+class CheckboxSerializer(ValuesSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Checkbox model
     """
     class Meta:
         model = Checkbox
-        fields = ['id', 'text', 'is_checked', 'order']
+        fields = ['id', 'text', 'is_checked', 'order', 'rank']
+
+
+class SyncCheckboxSerializer(CheckboxSerializer):
+    """
+    Serializer for Checkbox model including the parent note, used when
+    checkboxes are synchronized on their own
+    """
+    class Meta(CheckboxSerializer.Meta):
+        fields = CheckboxSerializer.Meta.fields + ['note', 'updated_at']
+        read_only_fields = ['note', 'updated_at']
 
 
-class ConnectionSerializer(serializers.ModelSerializer):
+class ConnectionSerializer(ValuesSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Connection model
     """
@@ -33,21 +82,40 @@ class ConnectionSerializer(serializers.ModelSerializer):
         fields = ['id', 'source', 'target', 'source_title', 'target_title', 'label', 'created_at']
 
 
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(ValuesSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for Note model
     """
+    PREVIEW_LENGTH = 200
+    
     checkboxes = CheckboxSerializer(many=True, read_only=True)
     activities = ActivitySerializer(many=True, read_only=True)
+    preview = serializers.SerializerMethodField()
+    values_methods = {'preview': ('content', 'preview_content')}
     
     class Meta:
         model = Note
         fields = [
-            'id', 'title', 'content', 'user', 'created_at', 'updated_at',
-            'has_reminder', 'reminder_datetime', 'reminder_frequency',
+            'id', 'title', 'content', 'preview', 'user', 'created_at', 'updated_at',
+            'has_reminder', 'reminder_datetime', 'reminder_frequency', 'next_fire_at',
             'has_checkboxes', 'all_checked', 'xp_value', 'activities', 'checkboxes'
         ]
-        read_only_fields = ['user', 'created_at', 'updated_at', 'all_checked']
+        read_only_fields = ['user', 'created_at', 'updated_at', 'all_checked', 'next_fire_at']
+    
+    def get_preview(self, obj):
+        """
+        Return the beginning of the note content
+        """
+        return self.preview_content(obj.content)
+    
+    def preview_content(self, content):
+        """
+        Return the first PREVIEW_LENGTH characters of the content, with '...'
+        appended when it is longer
+        """
+        if len(content) > self.PREVIEW_LENGTH:
+            return content[:self.PREVIEW_LENGTH] + '...'
+        return content
     
     def create(self, validated_data):
         """
@@ -66,4 +134,95 @@ class NoteDetailSerializer(NoteSerializer):
     incoming_connections = ConnectionSerializer(many=True, read_only=True)
     
     class Meta(NoteSerializer.Meta):
-        fields = NoteSerializer.Meta.fields + ['outgoing_connections', 'incoming_connections'] 
\ No newline at end of file
+        fields = NoteSerializer.Meta.fields + ['outgoing_connections', 'incoming_connections']
+
+
+class CompleteBulkSerializer(serializers.Serializer):
+    """
+    Serializer for the list of notes completed at once
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=500)
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    """
+    Serializer for one operation of a batch; `id` and the note references
+    in `data` may be the client_id of an object created earlier in the batch
+    """
+    METHODS = ['create', 'update', 'delete']
+    RESOURCES = ['notes', 'checkboxes', 'connections']
+    
+    method = serializers.ChoiceField(choices=METHODS)
+    resource = serializers.ChoiceField(choices=RESOURCES)
+    id = serializers.JSONField(required=False)
+    client_id = serializers.CharField(required=False, max_length=100)
+    data = serializers.DictField(required=False, default=dict)
+    
+    def validate(self, attrs):
+        if attrs['method'] == 'create':
+            attrs.pop('id', None)
+        elif type(attrs.get('id')) not in (int, str):
+            raise serializers.ValidationError({'id': 'An id or client_id is required.'})
+        return attrs
+
+
+class BatchSerializer(serializers.Serializer):
+    """
+    Serializer for a batch of operations executed in order
+    """
+    operations = serializers.ListField(child=BatchOperationSerializer(), allow_empty=False, max_length=500)
+
+
+class CheckboxReorderSerializer(serializers.Serializer):
+    """
+    Serializer for the new order of all the checkboxes of a note
+    """
+    note = serializers.IntegerField()
+    checkboxes = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    
+    def validate_checkboxes(self, value):
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError('Each checkbox must appear once.')
+        return value
+
+
+class SyncDeletedSerializer(serializers.Serializer):
+    """
+    Serializer for the ids of the objects deleted by a sync push
+    """
+    notes = serializers.ListField(child=serializers.IntegerField(), required=False)
+    checkboxes = serializers.ListField(child=serializers.IntegerField(), required=False)
+    connections = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+
+class SyncPushSerializer(serializers.Serializer):
+    """
+    Serializer for the shape of the changes pushed by a sync; each entry is
+    validated by the model serializers when it is applied. Entries update
+    the object with their integer `id` or create one, named by their
+    `client_id`, and may refer to notes by id or client_id.
+    """
+    NOTE_REFERENCES = {'notes': [], 'checkboxes': ['note'], 'connections': ['source', 'target']}
+    
+    notes = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    checkboxes = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    connections = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    deleted = SyncDeletedSerializer(required=False, default=dict)
+    
+    def validate(self, attrs):
+        errors = {}
+        for name, references in self.NOTE_REFERENCES.items():
+            for index, entry in enumerate(attrs[name]):
+                entry_errors = {}
+                if entry.get('id') is not None and type(entry['id']) is not int:
+                    entry_errors['id'] = 'An integer id is required.'
+                if entry.get('client_id') is not None and not isinstance(entry['client_id'], str):
+                    entry_errors['client_id'] = 'The client_id must be a string.'
+                for field in references:
+                    if field in entry and type(entry[field]) not in (int, str):
+                        entry_errors[field] = 'A note id or client_id is required.'
+                if entry_errors:
+                    errors.setdefault(name, {})[index] = entry_errors
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
@@ -0,0 +1,281 @@
+from django.db.models import Q, QuerySet
+from django.db.models.signals import m2m_changed, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .cache import invalidate_mindmap
+from .search import index_notes
+from .tasks import queue_similarity_update
+from ufranotes.events import publish
+from ufranotes.response_cache import ACTIVITIES, invalidate, invalidate_user
+from .models import Note, Checkbox, Connection, DeletedObject
+
+# Fields sent in the live events of saved objects
+NOTE_EVENT_FIELDS = [
+    'id', 'title', 'content', 'has_reminder', 'reminder_datetime', 'reminder_frequency',
+    'has_checkboxes', 'all_checked', 'updated_at',
+]
+CHECKBOX_EVENT_FIELDS = ['id', 'note_id', 'text', 'is_checked', 'rank', 'updated_at']
+CONNECTION_EVENT_FIELDS = ['id', 'source_id', 'target_id', 'label', 'updated_at']
+
+
+def is_direct_delete(instance, origin):
+    """
+    Return True when the instance itself was deleted, as opposed to being
+    removed by the cascade of a parent note or user
+    """
+    if isinstance(origin, QuerySet):
+        return origin.model is type(instance)
+    return origin is instance
+
+
+@receiver(post_delete, sender=Note)
+def record_note_deletion(sender, instance, origin=None, **kwargs):
+    """
+    Signal to keep a tombstone for deleted notes; their checkboxes and
+    connections are removed along with them on the client
+    """
+    if is_direct_delete(instance, origin):
+        DeletedObject.objects.create(user_id=instance.user_id, model_name='note', object_id=instance.pk)
+
+
+@receiver(post_delete, sender=Checkbox)
+def record_checkbox_deletion(sender, instance, origin=None, **kwargs):
+    """
+    Signal to keep a tombstone for deleted checkboxes
+    """
+    if is_direct_delete(instance, origin):
+        DeletedObject.objects.create(user_id=instance.note.user_id, model_name='checkbox', object_id=instance.pk)
+
+
+@receiver(post_delete, sender=Checkbox)
+def update_counts_for_deleted_checkbox(sender, instance, origin=None, **kwargs):
+    """
+    Signal to keep the note's checkbox counters in sync when a checkbox is
+    deleted on its own
+    """
+    if is_direct_delete(instance, origin):
+        Note.update_checkbox_counts(instance.note_id, total_delta=-1, checked_delta=-int(instance.is_checked))
+
+
+@receiver(post_delete, sender=Connection)
+def record_connection_deletion(sender, instance, origin=None, **kwargs):
+    """
+    Signal to keep a tombstone for deleted connections
+    """
+    if is_direct_delete(instance, origin):
+        DeletedObject.objects.create(user_id=instance.user_id, model_name='connection', object_id=instance.pk)
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def invalidate_mindmap_for_note(sender, instance, **kwargs):
+    """
+    Signal to invalidate the cached mind map when a note changes
+    """
+    invalidate_mindmap(instance.user_id)
+
+
+@receiver(post_save, sender=Connection)
+def invalidate_mindmap_for_saved_connection(sender, instance, **kwargs):
+    """
+    Signal to invalidate the cached mind map when a connection is saved
+    """
+    invalidate_mindmap(instance.user_id)
+
+
+@receiver(post_delete, sender=Connection)
+def invalidate_mindmap_for_deleted_connection(sender, instance, origin=None, **kwargs):
+    """
+    Signal to invalidate the cached mind map when a connection is deleted;
+    connections removed with their note are covered by the note signal
+    """
+    if is_direct_delete(instance, origin):
+        invalidate_mindmap(instance.user_id)
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def invalidate_responses_for_note(sender, instance, **kwargs):
+    """
+    Signal to invalidate the cached API responses of the note's owner
+    """
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=Checkbox)
+@receiver(post_delete, sender=Checkbox)
+def invalidate_responses_for_checkbox(sender, instance, origin=None, **kwargs):
+    """
+    Signal to invalidate the cached API responses showing a checkbox;
+    checkboxes removed with their note are covered by the note signal
+    """
+    if origin is None or is_direct_delete(instance, origin):
+        invalidate_user(instance.note.user_id)
+
+
+@receiver(post_save, sender=Connection)
+@receiver(post_delete, sender=Connection)
+def invalidate_responses_for_connection(sender, instance, origin=None, **kwargs):
+    """
+    Signal to invalidate the cached API responses showing a connection;
+    connections removed with their note are covered by the note signal
+    """
+    if origin is None or is_direct_delete(instance, origin):
+        invalidate_user(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Note.activities.through)
+def invalidate_responses_for_note_activities(sender, instance, **kwargs):
+    """
+    Signal to invalidate the cached API responses when the activities of a
+    note change, from either side of the relation
+    """
+    if isinstance(instance, Note):
+        invalidate_user(instance.user_id)
+    else:
+        invalidate(ACTIVITIES)
+
+
+@receiver(m2m_changed, sender=Note.activities.through)
+def touch_notes_for_changed_activities(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Signal to bump updated_at on the notes whose activities changed, so
+    their validators and the delta sync see the change; the notes an
+    activity is cleared from are collected before the clear
+    """
+    if action == 'pre_clear' and reverse:
+        instance._cleared_note_ids = list(sender.objects.filter(activity=instance).values_list('note_id', flat=True))
+    if action not in ['post_add', 'post_remove', 'post_clear'] or pk_set == set():
+        return
+    
+    now = timezone.now()
+    if not reverse:
+        Note.objects.filter(pk=instance.pk).update(updated_at=now)
+        instance.updated_at = now
+    else:
+        note_ids = instance.__dict__.pop('_cleared_note_ids', []) if action == 'post_clear' else pk_set
+        Note.objects.filter(pk__in=note_ids).update(updated_at=now)
+
+
+@receiver(pre_delete, sender=Note)
+def mark_layout_stale_for_deleted_note(sender, instance, origin=None, **kwargs):
+    """
+    Signal to relax the mind map layout around a deleted note, flagging
+    its neighbors before the cascade removes their connections
+    """
+    if is_direct_delete(instance, origin):
+        Note.objects.filter(
+            Q(pk__in=Connection.objects.filter(source=instance).values('target'))
+            | Q(pk__in=Connection.objects.filter(target=instance).values('source'))
+        ).update(layout_stale=True)
+
+
+@receiver(post_save, sender=Connection)
+def mark_layout_stale_for_saved_connection(sender, instance, **kwargs):
+    """
+    Signal to relax the mind map layout around a saved connection
+    """
+    Note.objects.filter(pk__in=[instance.source_id, instance.target_id]).update(layout_stale=True)
+
+
+@receiver(post_delete, sender=Connection)
+def mark_layout_stale_for_deleted_connection(sender, instance, origin=None, **kwargs):
+    """
+    Signal to relax the mind map layout around a deleted connection;
+    connections removed with their note are covered by the note signal
+    """
+    if is_direct_delete(instance, origin):
+        Note.objects.filter(pk__in=[instance.source_id, instance.target_id]).update(layout_stale=True)
+
+
+@receiver(post_save, sender=Note)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal to reindex a note when its title or content changed
+    """
+    if (update_fields is None or {'title', 'content'} & set(update_fields)) and instance.text_changed():
+        index_notes([instance])
+
+
+@receiver(post_save, sender=Note)
+def schedule_similarity_update(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal to update the user's term matrix once a note's title or content
+    changed
+    """
+    if (update_fields is None or {'title', 'content'} & set(update_fields)) and instance.text_changed():
+        queue_similarity_update(instance.user_id)
+
+
+@receiver(post_delete, sender=Note)
+def schedule_similarity_removal(sender, instance, origin=None, **kwargs):
+    """
+    Signal to drop a deleted note from the user's term matrix
+    """
+    if is_direct_delete(instance, origin):
+        queue_similarity_update(instance.user_id)
+
+
+def event_data(instance, fields):
+    """
+    Return the fields of an object for a live event, foreign keys by name
+    """
+    return {field[:-3] if field.endswith('_id') else field: getattr(instance, field) for field in fields}
+
+
+@receiver(post_save, sender=Note)
+def publish_saved_note(sender, instance, created, **kwargs):
+    """
+    Signal to push a saved note to the owner's live streams
+    """
+    publish(instance.user_id, 'note', 'created' if created else 'updated', event_data(instance, NOTE_EVENT_FIELDS))
+
+
+@receiver(post_save, sender=Checkbox)
+def publish_saved_checkbox(sender, instance, created, **kwargs):
+    """
+    Signal to push a saved checkbox to the owner's live streams
+    """
+    publish(
+        instance.note.user_id, 'checkbox', 'created' if created else 'updated',
+        event_data(instance, CHECKBOX_EVENT_FIELDS),
+    )
+
+
+@receiver(post_save, sender=Connection)
+def publish_saved_connection(sender, instance, created, **kwargs):
+    """
+    Signal to push a saved connection to the owner's live streams
+    """
+    publish(
+        instance.user_id, 'connection', 'created' if created else 'updated',
+        event_data(instance, CONNECTION_EVENT_FIELDS),
+    )
+
+
+@receiver(post_delete, sender=Note)
+def publish_deleted_note(sender, instance, origin=None, **kwargs):
+    """
+    Signal to push a note deletion to the owner's live streams; like the
+    tombstones, it stands for its checkboxes and connections too
+    """
+    if is_direct_delete(instance, origin):
+        publish(instance.user_id, 'note', 'deleted', {'id': instance.pk})
+
+
+@receiver(post_delete, sender=Checkbox)
+def publish_deleted_checkbox(sender, instance, origin=None, **kwargs):
+    """
+    Signal to push a checkbox deletion to the owner's live streams
+    """
+    if is_direct_delete(instance, origin):
+        publish(instance.note.user_id, 'checkbox', 'deleted', {'id': instance.pk, 'note': instance.note_id})
+
+
+@receiver(post_delete, sender=Connection)
+def publish_deleted_connection(sender, instance, origin=None, **kwargs):
+    """
+    Signal to push a connection deletion to the owner's live streams
+    """
+    if is_direct_delete(instance, origin):
+        publish(instance.user_id, 'connection', 'deleted', {'id': instance.pk})
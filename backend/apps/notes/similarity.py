@@ -0,0 +1,140 @@
+"""
+Content similarity between a user's notes, used to suggest connections.
+
+Each user has a term matrix: one row per note with the weights of its
+terms (the same tokenization and title weighting as the search index),
+stored as a SciPy sparse matrix in SimilarityIndex. The matrix is updated
+incrementally: only the rows of notes changed since they were last
+indexed are re-tokenized and replaced. TF-IDF weights are derived from
+the stored term weights at query time, in one pass over the matrix, so
+document frequencies never go stale.
+"""
+
+import io
+import numpy as np
+from scipy import sparse
+from .search import term_weights
+
+# Drop unused vocabulary columns when they are more than this share
+COMPACT_RATIO = 0.5
+
+
+def timestamp(value):
+    return int(value.timestamp() * 1_000_000)
+
+
+class TermMatrix:
+    """
+    Sparse note x term weight matrix of a user, with the modification time
+    each row was built from
+    """
+    
+    def __init__(self, note_ids, versions, terms, weights):
+        self.note_ids = note_ids
+        self.versions = versions
+        self.terms = terms
+        self.weights = weights
+    
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), [],
+            sparse.csr_matrix((0, 0), dtype=np.float32),
+        )
+    
+    @classmethod
+    def load(cls, data):
+        """
+        Read a matrix written by dump(), or return an empty one
+        """
+        if not data:
+            return cls.empty()
+        arrays = np.load(io.BytesIO(bytes(data)), allow_pickle=False)
+        shape = (len(arrays['note_ids']), len(arrays['terms']))
+        weights = sparse.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=shape)
+        return cls(arrays['note_ids'], arrays['versions'], arrays['terms'].tolist(), weights)
+    
+    def dump(self):
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            note_ids=self.note_ids, versions=self.versions, terms=np.array(self.terms, dtype=str),
+            data=self.weights.data, indices=self.weights.indices, indptr=self.weights.indptr,
+        )
+        return buffer.getvalue()
+    
+    def stale_notes(self, current):
+        """
+        Compare with the current {note id: updated_at} of the user's notes
+        and return the ids of notes to (re)index and of notes to remove
+        """
+        indexed = dict(zip(self.note_ids.tolist(), self.versions.tolist()))
+        changed = [note_id for note_id, updated_at in current.items() if indexed.get(note_id) != timestamp(updated_at)]
+        removed = [note_id for note_id in indexed if note_id not in current]
+        return changed, removed
+    
+    def update(self, notes, removed=()):
+        """
+        Replace the rows of the given notes and drop the removed ones
+        """
+        vocabulary = {term: column for column, term in enumerate(self.terms)}
+        rows, columns, values = [], [], []
+        for row, note in enumerate(notes):
+            for term, weight in term_weights(note).items():
+                rows.append(row)
+                columns.append(vocabulary.setdefault(term, len(vocabulary)))
+                values.append(weight)
+        self.terms = list(vocabulary)
+        
+        replaced = [note.pk for note in notes] + list(removed)
+        keep = ~np.isin(self.note_ids, replaced)
+        kept = self.weights[keep]
+        kept.resize(kept.shape[0], len(self.terms))
+        added = sparse.csr_matrix((values, (rows, columns)), shape=(len(notes), len(self.terms)), dtype=np.float32)
+        
+        self.weights = sparse.vstack([kept, added], format='csr')
+        self.note_ids = np.concatenate([self.note_ids[keep], np.array([note.pk for note in notes], dtype=np.int64)])
+        self.versions = np.concatenate([
+            self.versions[keep], np.array([timestamp(note.updated_at) for note in notes], dtype=np.int64)
+        ])
+        self.compact()
+    
+    def compact(self):
+        """
+        Drop vocabulary columns no note uses any more
+        """
+        used = np.bincount(self.weights.indices, minlength=len(self.terms)) > 0
+        if len(self.terms) and used.sum() < len(self.terms) * COMPACT_RATIO:
+            self.weights = self.weights[:, used]
+            self.terms = [term for term, in_use in zip(self.terms, used) if in_use]
+    
+    def tfidf(self):
+        """
+        Return the rows weighted by inverse document frequency and
+        normalized to unit length
+        """
+        document_frequency = np.bincount(self.weights.indices, minlength=len(self.terms))
+        idf = np.log((1 + len(self.note_ids)) / (1 + document_frequency)) + 1
+        matrix = self.weights.astype(np.float32)
+        matrix.data *= idf[matrix.indices]
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms) @ matrix
+    
+    def similar(self, note_id, limit, exclude=()):
+        """
+        Return (note id, cosine similarity) pairs of the notes most similar
+        to the given one, best first
+        """
+        rows = np.flatnonzero(self.note_ids == note_id)
+        if not len(rows):
+            return []
+        matrix = self.tfidf()
+        scores = (matrix @ matrix[rows[0]].T).toarray().ravel()
+        scores[np.isin(self.note_ids, [note_id, *exclude])] = 0
+        
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.lexsort((self.note_ids[candidates], -scores[candidates]))]
+        return [(int(self.note_ids[row]), float(scores[row])) for row in candidates]
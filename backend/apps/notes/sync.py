@@ -0,0 +1,181 @@
+"""
+Delta synchronization of a user's notes, checkboxes and connections
+"""
+
+import datetime
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from .models import Note, Checkbox, Connection, DeletedObject
+from .serializers import NoteSerializer, SyncCheckboxSerializer, ConnectionSerializer
+
+SYNC_MODELS = ['notes', 'checkboxes', 'connections']
+
+
+def issue_token(moment):
+    """
+    Return the sync token for the given moment (microseconds since epoch)
+    """
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def parse_token(token):
+    """
+    Return the moment encoded by a sync token, or None for an empty token
+    """
+    if not token:
+        return None
+    try:
+        return datetime.datetime.fromtimestamp(int(token) / 1_000_000, tz=datetime.timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise serializers.ValidationError({'since': 'Invalid sync token.'})
+
+
+def tombstone_cutoff():
+    """
+    Return the moment before which deletion tombstones are pruned
+    """
+    return timezone.now() - datetime.timedelta(days=settings.SYNC_TOMBSTONE_RETENTION)
+
+
+def collect_changes(request, since):
+    """
+    Return everything changed for the current user since the given moment,
+    or a full snapshot when since is None.
+    
+    Tokens older than SYNC_TOMBSTONE_RETENTION days may have missed pruned
+    tombstones, so they get a full snapshot flagged with 'reset' instead:
+    the client should drop the objects it has that aren't in it.
+    
+    Rows are stamped with updated_at when they are written, not when their
+    transaction commits, so the token is issued SYNC_SAFETY_WINDOW seconds
+    before the snapshot: rows committed after it by a transaction shorter
+    than the window are sent on the next sync. Rows changed within the
+    window are sent again.
+    """
+    user = request.user
+    token = issue_token(timezone.now() - datetime.timedelta(seconds=settings.SYNC_SAFETY_WINDOW))
+    reset = since is not None and since < tombstone_cutoff()
+    if reset:
+        since = None
+    
+    notes = Note.objects.filter(user=user).prefetch_related('checkboxes', 'activities')
+    checkboxes = Checkbox.objects.filter(note__user=user)
+    connections = Connection.objects.filter(user=user).select_related('source', 'target')
+    deleted = {name: [] for name in SYNC_MODELS}
+    
+    if since is not None:
+        notes = notes.filter(updated_at__gte=since)
+        checkboxes = checkboxes.filter(updated_at__gte=since)
+        connections = connections.filter(updated_at__gte=since)
+        tombstones = DeletedObject.objects.filter(user=user, deleted_at__gte=since)
+        plural = {'note': 'notes', 'checkbox': 'checkboxes', 'connection': 'connections'}
+        for model_name, object_id in tombstones.values_list('model_name', 'object_id'):
+            deleted[plural[model_name]].append(object_id)
+    
+    context = {'request': request}
+    return {
+        'token': token,
+        'full': since is None,
+        'reset': reset,
+        'notes': NoteSerializer(notes, many=True, context=context).data,
+        'checkboxes': SyncCheckboxSerializer(checkboxes, many=True, context=context).data,
+        'connections': ConnectionSerializer(connections, many=True, context=context).data,
+        'deleted': deleted,
+    }
+
+
+def apply_changes(request, payload):
+    """
+    Apply a batch of client changes in one transaction and return the
+    server ids given to created objects, keyed by their client_id.
+    
+    Entries with an `id` are partial updates, entries without one are
+    created. Checkboxes and connections may reference notes created in the
+    same batch by their client_id. Any invalid entry rolls back the batch.
+    """
+    user = request.user
+    context = {'request': request}
+    created = {name: {} for name in SYNC_MODELS}
+    errors = {}
+    
+    def resolve_note(value):
+        return created['notes'].get(value, value) if isinstance(value, str) else value
+    
+    def save(name, index, serializer, **kwargs):
+        if not serializer.is_valid():
+            errors.setdefault(name, {})[index] = serializer.errors
+            return None
+        return serializer.save(**kwargs)
+    
+    def existing(queryset, entries):
+        ids = [entry['id'] for entry in entries if entry.get('id') is not None]
+        return queryset.in_bulk(ids)
+    
+    with transaction.atomic():
+        entries = payload.get('notes', [])
+        notes = existing(Note.objects.filter(user=user), entries)
+        for index, entry in enumerate(entries):
+            if entry.get('id') is None:
+                note = save('notes', index, NoteSerializer(data=entry, context=context))
+                if note and entry.get('client_id'):
+                    created['notes'][entry['client_id']] = note.id
+            elif entry['id'] in notes:
+                save('notes', index, NoteSerializer(notes[entry['id']], data=entry, partial=True, context=context))
+            else:
+                errors.setdefault('notes', {})[index] = {'id': 'Note not found.'}
+        
+        entries = payload.get('checkboxes', [])
+        checkboxes = existing(Checkbox.objects.filter(note__user=user), entries)
+        owned_notes = set(Note.objects.filter(user=user).values_list('id', flat=True)) if entries else set()
+        for index, entry in enumerate(entries):
+            if entry.get('id') is None:
+                note_id = resolve_note(entry.get('note'))
+                if note_id not in owned_notes:
+                    errors.setdefault('checkboxes', {})[index] = {'note': "This note doesn't belong to you."}
+                    continue
+                checkbox = save('checkboxes', index, SyncCheckboxSerializer(data=entry), note_id=note_id)
+                if checkbox and entry.get('client_id'):
+                    created['checkboxes'][entry['client_id']] = checkbox.id
+            elif entry['id'] in checkboxes:
+                save('checkboxes', index, SyncCheckboxSerializer(checkboxes[entry['id']], data=entry, partial=True))
+            else:
+                errors.setdefault('checkboxes', {})[index] = {'id': 'Checkbox not found.'}
+        
+        entries = payload.get('connections', [])
+        connections = existing(Connection.objects.filter(user=user), entries)
+        for index, entry in enumerate(entries):
+            data = dict(entry)
+            for field in ['source', 'target']:
+                if field in data:
+                    data[field] = resolve_note(data[field])
+            if entry.get('id') is None:
+                serializer = ConnectionSerializer(data=data, context=context)
+            elif entry['id'] in connections:
+                serializer = ConnectionSerializer(connections[entry['id']], data=data, partial=True, context=context)
+            else:
+                errors.setdefault('connections', {})[index] = {'id': 'Connection not found.'}
+                continue
+            if serializer.is_valid():
+                source = serializer.validated_data.get('source', getattr(serializer.instance, 'source', None))
+                target = serializer.validated_data.get('target', getattr(serializer.instance, 'target', None))
+                if source.user_id != user.id or target.user_id != user.id:
+                    errors.setdefault('connections', {})[index] = {'non_field_errors': ['Both notes must belong to you.']}
+                    continue
+            connection = save('connections', index, serializer, user=user)
+            if connection and entry.get('id') is None and entry.get('client_id'):
+                created['connections'][entry['client_id']] = connection.id
+        
+        if errors:
+            raise serializers.ValidationError(errors)
+        
+        deleted = payload.get('deleted', {})
+        if deleted.get('connections'):
+            Connection.objects.filter(source__user=user, id__in=deleted['connections']).delete()
+        if deleted.get('checkboxes'):
+            Checkbox.objects.filter(note__user=user, id__in=deleted['checkboxes']).delete()
+        if deleted.get('notes'):
+            Note.objects.filter(user=user, id__in=deleted['notes']).delete()
+    
+    return created
@@ -1,55 +1,199 @@
-from celery import shared_task
+import datetime
+import logging
+from celery import group, shared_task
+from django.db import transaction
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
-import datetime
-from .models import Note
+from django.core.cache import cache
+from ufranotes.response_cache import invalidate_user
+from .models import Note, DeletedObject, SimilarityIndex
+from .recurrence import next_occurrence
+from .similarity import TermMatrix
+from .sync import tombstone_cutoff
 
+logger = logging.getLogger(__name__)
 
-@shared_task
-def send_reminder_notifications():
+
+def build_reminder_digest(user, notes):
     """
-    Task to send reminder notifications for notes
+    Build a single reminder email with all the due notes of a user
     """
-    now = timezone.now()
+    if len(notes) == 1:
+        subject = f'Lembrete: {notes[0].title}'
+        intro = f'Este é um lembrete para a sua nota: {notes[0].title}'
+    else:
+        subject = f'Lembretes: {len(notes)} notas'
+        intro = f'Estes são os lembretes das suas {len(notes)} notas:'
     
-    # Find notes with reminders due now
-    due_reminders = Note.objects.filter(
-        has_reminder=True,
-        reminder_datetime__lte=now
-    )
-    
-    for note in due_reminders:
-        # Send email notification
-        send_mail(
-            subject=f'Lembrete: {note.title}',
-            message=f'''
-            Olá {note.user.first_name or note.user.username},
-            
-            Este é um lembrete para a sua nota: {note.title}
-            
-            Conteúdo:
+    sections = '\n'.join(
+        f'''
+            {note.title}
             {note.content[:200]}{'...' if len(note.content) > 200 else ''}
+            '''
+        for note in notes
+    )
+    return EmailMessage(
+        subject=subject,
+        body=f'''
+            Olá {user.first_name or user.username},
             
+            {intro}
+            {sections}
             Acesse o UFRA Notes para mais detalhes.
             ''',
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[note.user.email],
-            fail_silently=True,
-        )
-        
-        # Update reminder based on frequency
-        if note.reminder_frequency == 'daily':
-            note.reminder_datetime = now + datetime.timedelta(days=1)
-        elif note.reminder_frequency == 'weekly':
-            note.reminder_datetime = now + datetime.timedelta(weeks=1)
-        elif note.reminder_frequency == 'monthly':
-            note.reminder_datetime = now + datetime.timedelta(days=30)
+        from_email=settings.EMAIL_HOST_USER,
+        to=[user.email],
+    )
+
+
+def reschedule_reminders(notes, now):
+    """
+    Move repeating reminders to their next occurrence and disable the ones
+    that do not repeat. Missed occurrences are either skipped, firing a
+    single reminder for all of them (REMINDER_CATCH_UP = 'skip'), or
+    replayed one per run (REMINDER_CATCH_UP = 'all').
+    """
+    repeating = []
+    finished = []
+    for note in notes:
+        after = now if settings.REMINDER_CATCH_UP == 'skip' else note.next_fire_at
+        note.next_fire_at = next_occurrence(note.reminder_datetime, note.reminder_frequency, after)
+        note.updated_at = now
+        if note.next_fire_at is None:
+            finished.append(note.pk)
         else:
-            # If no repeat, disable reminder
-            note.has_reminder = False
-            note.reminder_datetime = None
+            repeating.append(note)
+    
+    if repeating:
+        Note.objects.bulk_update(repeating, ['next_fire_at', 'updated_at'])
+    if finished:
+        # If no repeat, disable reminder
+        Note.objects.filter(pk__in=finished).update(
+            has_reminder=False, reminder_datetime=None, next_fire_at=None, updated_at=now
+        )
+    for user_id in {note.user_id for note in notes}:
+        invalidate_user(user_id)
+
+
+@shared_task
+def send_reminder_digests(digests, now):
+    """
+    Task to deliver the reminders of a partition of users, one digest email
+    per user through a single email connection.
+    
+    The due notes are locked and rescheduled before sending, so a note
+    queued twice by overlapping scans is only sent once.
+    """
+    now = datetime.datetime.fromisoformat(now)
+    note_ids = [note_id for _, user_note_ids in digests for note_id in user_note_ids]
+    
+    with transaction.atomic():
+        notes = list(
+            Note.objects.filter(pk__in=note_ids, next_fire_at__lte=now)
+            .select_for_update(of=('self',))
+            .select_related('user')
+            .only(
+                'title', 'content', 'reminder_datetime', 'reminder_frequency', 'next_fire_at',
+                'user__first_name', 'user__username', 'user__email',
+            )
+            .order_by('next_fire_at')
+        )
+        by_user = {}
+        for note in notes:
+            by_user.setdefault(note.user_id, []).append(note)
+        messages = [build_reminder_digest(user_notes[0].user, user_notes) for user_notes in by_user.values()]
+        reschedule_reminders(notes, now)
+    
+    connection = get_connection(fail_silently=True)
+    connection.send_messages(messages)
+    return len(notes)
+
+
+@shared_task
+def send_reminder_notifications():
+    """
+    Task to find due reminders and fan their delivery out to workers,
+    partitioned by user
+    """
+    now = timezone.now()
+    batch_size = settings.REMINDER_BATCH_SIZE
+    
+    # Find notes with reminders due now, through a range scan of the
+    # next_fire_at index (rows without reminders have it NULL)
+    due_reminders = Note.objects.filter(
+        next_fire_at__lte=now
+    ).order_by('next_fire_at').values_list('user_id', 'id')
+    
+    by_user = {}
+    for user_id, note_id in due_reminders.iterator(chunk_size=2000):
+        by_user.setdefault(user_id, []).append(note_id)
+    
+    digests = list(by_user.items())
+    partitions = [digests[i:i + batch_size] for i in range(0, len(digests), batch_size)]
+    if partitions:
+        group(send_reminder_digests.s(partition, now.isoformat()) for partition in partitions).apply_async()
+    
+    due = sum(len(note_ids) for note_ids in by_user.values())
+    return f"Queued {due} reminders in {len(digests)} digests"
+
+
+@shared_task(ignore_result=True)
+def update_similarity_index(user_id, batch_size=1000):
+    """
+    Task to bring a user's term matrix up to date, re-tokenizing only the
+    notes changed since they were last indexed
+    """
+    with transaction.atomic():
+        index, _ = SimilarityIndex.objects.select_for_update().get_or_create(user_id=user_id)
+        matrix = TermMatrix.load(index.data)
+        current = dict(Note.objects.filter(user_id=user_id).values_list('id', 'updated_at'))
+        changed, removed = matrix.stale_notes(current)
+        if not changed and not removed:
+            return 0
         
-        note.save()
+        notes = []
+        for start in range(0, len(changed), batch_size):
+            notes.extend(Note.objects.filter(pk__in=changed[start:start + batch_size]).only('title', 'content', 'updated_at'))
+        matrix.update(notes, removed)
+        index.data = matrix.dump()
+        index.save()
+    return len(notes) + len(removed)
+
+
+def queue_similarity_update(user_id):
+    """
+    Queue update_similarity_index for a user once the current transaction
+    commits. The changes are saved by then, so an unreachable broker, or any
+    other error queuing the task, is logged, without retrying, instead of
+    failing the request; the matrix catches up with the next update of the
+    user.
+    """
+    def enqueue():
+        try:
+            update_similarity_index.apply_async((user_id,), retry=False)
+        except Exception:
+            logger.exception('Could not queue the similarity update of user %s', user_id)
+    transaction.on_commit(enqueue)
+
+
+@shared_task(ignore_result=True)
+def flush_checkbox_toggles(user_id):
+    """
+    Task to write the checkbox toggles buffered for a user to the database
+    """
+    from .toggles import flush_toggles, toggle_key
     
-    return f"Sent {due_reminders.count()} reminders" 
\ No newline at end of file
+    # Toggles buffered from now on schedule another flush
+    cache.delete(toggle_key(user_id, 'scheduled'))
+    return flush_toggles(user_id)
+
+
+@shared_task(ignore_result=True)
+def prune_deleted_objects():
+    """
+    Task to delete the tombstones older than SYNC_TOMBSTONE_RETENTION days;
+    clients syncing from before then get a full snapshot instead
+    """
+    deleted, _ = DeletedObject.objects.filter(deleted_at__lt=tombstone_cutoff()).delete()
+    return deleted
@@ -1,9 +1,45 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import itertools
+import tempfile
+import threading
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from kombu.exceptions import OperationalError
+from django.core import mail
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections, transaction
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from rest_framework.mixins import ListModelMixin
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase, force_authenticate
 from rest_framework import status
-from .models import Note, Checkbox, Connection
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import Note, Checkbox, Connection, DeletedObject, SimilarityIndex
+from .recurrence import next_occurrence
+from .search import index_notes, tokenize, highlight
+from .similarity import TermMatrix
+from . import ranking, viewport
+from .viewport import cell_key
+from .tasks import (
+    send_reminder_notifications, send_reminder_digests, update_similarity_index, flush_checkbox_toggles,
+    prune_deleted_objects,
+)
+from .bulk import bulk_insert
+from .cache import get_cached_mindmap
+from .toggles import toggle_key, has_pending_toggles
+from .views import NoteViewSet, ConnectionViewSet
+from apps.activities.models import Activity
+from ufranotes import asyncviews, events
+from ufranotes.asyncviews import gather_queries
+from ufranotes.celery import app as celery_app
+from ufranotes.renderers import ORJSONRenderer
+from ufranotes.values import ValuesListMixin
 
 User = get_user_model()
 
@@ -89,6 +125,41 @@ class CheckboxModelTest(TestCase):
         
         self.note.refresh_from_db()
         self.assertTrue(self.note.all_checked)
+    
+    def test_checkbox_counters(self):
+        """Test that checkbox create, update and delete maintain the note counters"""
+        checkbox1 = Checkbox.objects.create(note=self.note, text='Checkbox 1', order=1, is_checked=True)
+        checkbox2 = Checkbox.objects.create(note=self.note, text='Checkbox 2', order=2)
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.checkbox_count, self.note.checked_count), (2, 1))
+        self.assertFalse(self.note.all_checked)
+        
+        checkbox2 = Checkbox.objects.get(pk=checkbox2.pk)
+        checkbox2.is_checked = True
+        checkbox2.save()
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.checkbox_count, self.note.checked_count), (2, 2))
+        self.assertTrue(self.note.all_checked)
+        
+        checkbox1.delete()
+        Checkbox.objects.create(note=self.note, text='Checkbox 3', order=3)
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.checkbox_count, self.note.checked_count), (2, 1))
+        self.assertFalse(self.note.all_checked)
+    
+    def test_check_all_query_count(self):
+        """Test that checking every checkbox takes the same queries for any size"""
+        for size in [3, 30]:
+            note = Note.objects.create(title='Note', content='Content', user=self.user, has_checkboxes=True)
+            for i in range(size):
+                Checkbox.objects.create(note=note, text=f'Checkbox {i}', order=i)
+            
+            with self.assertNumQueries(2):
+                note.check_all()
+            note.refresh_from_db()
+            self.assertEqual(note.checked_count, size)
+            self.assertTrue(note.all_checked)
+            self.assertFalse(note.checkboxes.filter(is_checked=False).exists())
 
 
 class NoteAPITest(APITestCase):
@@ -148,3 +219,2371 @@ class NoteAPITest(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Note.objects.count(), 0)
+    
+    def test_complete_note(self):
+        """Test completing a note awards XP and activity stats"""
+        self.note.has_checkboxes = True
+        self.note.save()
+        Checkbox.objects.create(note=self.note, text='Checkbox', order=1)
+        activities = Activity.objects.bulk_create([
+            Activity(name='Study', activity_type='intelligence'),
+            Activity(name='Read', activity_type='intelligence'),
+            Activity(name='Run', activity_type='health'),
+        ])
+        self.note.activities.set(activities)
+        
+        self.client.force_authenticate(user=self.user)
+        url = reverse('note-complete', kwargs={'pk': self.note.pk})
+        response = self.client.post(url)
+        
+        self.assertEqual(response.data, {'status': 'success', 'xp_gained': 5})
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.xp, self.user.intelligence, self.user.health), (5, 3, 2))
+        self.note.refresh_from_db()
+        self.assertTrue(self.note.all_checked)
+        
+        response = self.client.post(url)
+        self.assertEqual(response.data, {'status': 'already completed'})
+    
+    def test_complete_note_without_checkboxes_once(self):
+        """Test completing a note without checkboxes twice awards XP once"""
+        self.client.force_authenticate(user=self.user)
+        url = reverse('note-complete', kwargs={'pk': self.note.pk})
+        
+        self.assertEqual(self.client.post(url).data, {'status': 'success', 'xp_gained': 5})
+        self.assertEqual(self.client.post(url).data, {'status': 'already completed'})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.xp, 5)
+        self.note.refresh_from_db()
+        self.assertTrue(self.note.all_checked)
+        
+        response = self.client.post(reverse('note-complete-bulk'), {'ids': [self.note.id]}, format='json')
+        self.assertEqual(response.data['results'], [{'id': self.note.id, 'status': 'already completed'}])
+    
+    def test_complete_notes_in_bulk(self):
+        """Test completing several notes in one request"""
+        other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        other_note = Note.objects.create(title='Other', content='Other', user=other_user)
+        with_checkboxes = Note.objects.create(
+            title='Checklist', content='Content', user=self.user, has_checkboxes=True, xp_value=10
+        )
+        Checkbox.objects.create(note=with_checkboxes, text='Checkbox 1', order=1)
+        Checkbox.objects.create(note=with_checkboxes, text='Checkbox 2', order=2)
+        with_checkboxes.activities.add(Activity.objects.create(name='Run', activity_type='strength'))
+        done = Note.objects.create(title='Done', content='Content', user=self.user, all_checked=True)
+        self.user.xp = 90
+        self.user.save()
+        
+        self.client.force_authenticate(user=self.user)
+        url = reverse('note-complete-bulk')
+        ids = [self.note.id, with_checkboxes.id, done.id, other_note.id]
+        response = self.client.post(url, {'ids': ids}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['xp_gained'], 15)
+        self.assertEqual(response.data['results'], [
+            {'id': self.note.id, 'status': 'success'},
+            {'id': with_checkboxes.id, 'status': 'success'},
+            {'id': done.id, 'status': 'already completed'},
+            {'id': other_note.id, 'status': 'not found'},
+        ])
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.level, self.user.xp, self.user.strength), (2, 5, 2))
+        with_checkboxes.refresh_from_db()
+        self.assertTrue(with_checkboxes.all_checked)
+        self.assertEqual(with_checkboxes.checked_count, 2)
+        self.assertFalse(with_checkboxes.checkboxes.filter(is_checked=False).exists())
+
+
+class ConcurrentCompletionTest(APITestCase):
+    """Test cases for a note completed from two tabs at once"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.note = Note.objects.create(title='Note', content='Content', user=self.user, has_checkboxes=True, xp_value=8)
+        Checkbox.objects.create(note=self.note, text='Item')
+        self.url = reverse('note-complete', kwargs={'pk': self.note.pk})
+        self.client.force_authenticate(user=self.user)
+    
+    def test_parallel_completions_award_once(self):
+        """Test a completion that loaded the note before another one finished doesn't award the XP again"""
+        get_object = NoteViewSet.get_object
+        tabs = iter(['first', 'second'])
+        responses = {}
+        
+        def interleaved(view):
+            tab = next(tabs)
+            note = get_object(view)
+            if tab == 'first':
+                # The second tab completes the note after the first loaded it
+                responses['second'] = self.client.post(self.url)
+            return note
+        
+        with mock.patch.object(NoteViewSet, 'get_object', interleaved):
+            responses['first'] = self.client.post(self.url)
+        
+        self.assertEqual(responses['second'].data, {'status': 'success', 'xp_gained': 8})
+        self.assertEqual(responses['first'].data, {'status': 'already completed'})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.xp, 8)
+
+
+class ConnectionAPITest(APITestCase):
+    """Test cases for Connection API endpoints"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.source = Note.objects.create(title='Source', content='Content', user=self.user)
+        self.target = Note.objects.create(title='Target', content='Content', user=self.user)
+        self.other_note = Note.objects.create(title='Other', content='Content', user=self.other_user)
+        self.client.force_authenticate(user=self.user)
+    
+    def test_create_connection_sets_owner(self):
+        """Test a created connection is owned by the current user"""
+        response = self.client.post(reverse('connection-list'), {
+            'source': self.source.id, 'target': self.target.id, 'label': 'link'
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Connection.objects.get(id=response.data['id']).user, self.user)
+    
+    def test_create_connection_to_foreign_note(self):
+        """Test connecting to another user's note is forbidden"""
+        response = self.client.post(reverse('connection-list'), {
+            'source': self.source.id, 'target': self.other_note.id
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Connection.objects.exists())
+    
+    def test_update_connection_to_foreign_note(self):
+        """Test a connection can't be moved to another user's note"""
+        connection = Connection.objects.create(source=self.source, target=self.target)
+        url = reverse('connection-detail', kwargs={'pk': connection.pk})
+        response = self.client.patch(url, {'target': self.other_note.id}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        connection.refresh_from_db()
+        self.assertEqual(connection.target, self.target)
+    
+    def test_list_only_own_connections(self):
+        """Test the connection list is limited to the current user's connections"""
+        own = Connection.objects.create(source=self.source, target=self.target)
+        other_target = Note.objects.create(title='Other target', content='Content', user=self.other_user)
+        Connection.objects.create(source=self.other_note, target=other_target)
+        
+        response = self.client.get(reverse('connection-list'))
+        
+        self.assertEqual([item['id'] for item in response.data], [own.id])
+        self.assertEqual(own.user, self.user)
+
+
+class NoteQueryCountTest(APITestCase):
+    """Test that API endpoints run a fixed number of queries regardless of data size"""
+    
+    def setUp(self):
+        cache.clear()
+        self.small_user = self.create_user_with_notes('small', note_count=2)
+        self.large_user = self.create_user_with_notes('large', note_count=60)
+    
+    def create_user_with_notes(self, username, note_count):
+        """Seed a user with notes, checkboxes, activities and connections"""
+        user = User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='testpass123'
+        )
+        activities = Activity.objects.bulk_create([
+            Activity(name=f'{username} {activity_type}', activity_type=activity_type)
+            for activity_type in ['health', 'intelligence', 'strength']
+        ])
+        notes = Note.objects.bulk_create([
+            Note(
+                title=f'Note {i}', content='Content', user=user, has_checkboxes=True, checkbox_count=5,
+                layout_x=i * 200.0, layout_y=0.0,
+            )
+            for i in range(note_count)
+        ])
+        Checkbox.objects.bulk_create([
+            Checkbox(note=note, text=f'Checkbox {i}', order=i)
+            for note in notes for i in range(5)
+        ])
+        Note.activities.through.objects.bulk_create([
+            Note.activities.through(note_id=note.id, activity_id=activity.id)
+            for note in notes for activity in activities
+        ])
+        Connection.objects.bulk_create([
+            Connection(user=user, source=notes[i], target=notes[j], label='link')
+            for i in range(note_count) for j in range(i + 1, min(i + 3, note_count))
+        ])
+        return user
+    
+    def count_queries(self, user, method, url, data=None):
+        """Run a request as the given user and return the number of queries"""
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 400, response.data)
+        return len(context)
+    
+    def assert_constant_queries(self, expected, method, url_for_user, data_for_user=None):
+        """Assert the same, expected query count for the small and the large user"""
+        counts = []
+        for user in [self.small_user, self.large_user]:
+            data = data_for_user(user) if data_for_user else None
+            counts.append(self.count_queries(user, method, url_for_user(user), data))
+        self.assertEqual(counts, [expected, expected])
+    
+    def first_note(self, user):
+        """Return the first note of the given user"""
+        return Note.objects.filter(user=user).first()
+    
+    def test_note_list(self):
+        """Test note list query count"""
+        self.assert_constant_queries(4, 'get', lambda user: reverse('note-list'))
+    
+    def test_note_create(self):
+        """Test note create query count"""
+        self.assert_constant_queries(
+            5, 'post', lambda user: reverse('note-list'),
+            lambda user: {'title': 'New', 'content': 'New content'}
+        )
+    
+    def test_note_retrieve(self):
+        """Test note retrieve query count"""
+        self.assert_constant_queries(
+            6, 'get', lambda user: reverse('note-detail', kwargs={'pk': self.first_note(user).pk})
+        )
+    
+    def test_note_update(self):
+        """Test note update query count"""
+        self.assert_constant_queries(
+            13, 'patch', lambda user: reverse('note-detail', kwargs={'pk': self.first_note(user).pk}),
+            lambda user: {'title': 'Updated'}
+        )
+    
+    def test_note_delete(self):
+        """Test note delete query count"""
+        self.assert_constant_queries(
+            11, 'delete', lambda user: reverse('note-detail', kwargs={'pk': self.first_note(user).pk})
+        )
+    
+    def test_note_complete(self):
+        """Test note complete query count"""
+        # Including the locked read of the note and its transaction's savepoint
+        self.assert_constant_queries(
+            9, 'post', lambda user: reverse('note-complete', kwargs={'pk': self.first_note(user).pk})
+        )
+    
+    def test_note_complete_bulk(self):
+        """Test note complete_bulk query count"""
+        # Both users level up, which takes one extra query
+        User.objects.update(xp=95)
+        self.assert_constant_queries(
+            10, 'post', lambda user: reverse('note-complete-bulk'),
+            lambda user: {'ids': list(Note.objects.filter(user=user).values_list('id', flat=True))}
+        )
+    
+    def test_note_mindmap(self):
+        """Test note mindmap query count"""
+        self.assert_constant_queries(2, 'get', lambda user: reverse('note-mindmap'))
+    
+    def test_checkbox_list(self):
+        """Test checkbox list query count"""
+        self.assert_constant_queries(1, 'get', lambda user: reverse('checkbox-list'))
+    
+    def test_checkbox_create(self):
+        """Test checkbox create query count"""
+        # Including the ranks of the note's checkboxes, to place the new one
+        self.assert_constant_queries(
+            5, 'post', lambda user: reverse('checkbox-list'),
+            lambda user: {'note': self.first_note(user).pk, 'text': 'New checkbox'}
+        )
+    
+    def test_checkbox_update(self):
+        """Test checkbox update query count"""
+        self.assert_constant_queries(
+            4, 'patch',
+            lambda user: reverse('checkbox-detail', kwargs={
+                'pk': Checkbox.objects.filter(note__user=user).first().pk
+            }),
+            lambda user: {'is_checked': True}
+        )
+    
+    def test_checkbox_delete(self):
+        """Test checkbox delete query count"""
+        self.assert_constant_queries(
+            5, 'delete',
+            lambda user: reverse('checkbox-detail', kwargs={
+                'pk': Checkbox.objects.filter(note__user=user).first().pk
+            })
+        )
+    
+    def test_connection_list(self):
+        """Test connection list query count"""
+        self.assert_constant_queries(2, 'get', lambda user: reverse('connection-list'))
+    
+    def test_connection_retrieve(self):
+        """Test connection retrieve query count"""
+        self.assert_constant_queries(
+            2, 'get',
+            lambda user: reverse('connection-detail', kwargs={
+                'pk': Connection.objects.filter(user=user).first().pk
+            })
+        )
+    
+    def test_connection_create(self):
+        """Test connection create query count"""
+        def data_for_user(user):
+            notes = Note.objects.filter(user=user).order_by('-id')
+            return {'source': notes[0].pk, 'target': notes[len(notes) - 1].pk, 'label': 'new'}
+        self.assert_constant_queries(5, 'post', lambda user: reverse('connection-list'), data_for_user)
+    
+    def test_checkbox_retrieve(self):
+        """Test checkbox retrieve query count"""
+        self.assert_constant_queries(
+            1, 'get',
+            lambda user: reverse('checkbox-detail', kwargs={
+                'pk': Checkbox.objects.filter(note__user=user).first().pk
+            })
+        )
+    
+    def test_checkbox_rename(self):
+        """Test checkbox update of its text query count"""
+        self.assert_constant_queries(
+            2, 'patch',
+            lambda user: reverse('checkbox-detail', kwargs={
+                'pk': Checkbox.objects.filter(note__user=user).first().pk
+            }),
+            lambda user: {'text': 'Renamed'}
+        )
+    
+    def test_connection_update(self):
+        """Test connection update query count"""
+        self.assert_constant_queries(
+            4, 'patch',
+            lambda user: reverse('connection-detail', kwargs={
+                'pk': Connection.objects.filter(user=user).first().pk
+            }),
+            lambda user: {'label': 'updated'}
+        )
+    
+    def test_connection_delete(self):
+        """Test connection delete query count"""
+        self.assert_constant_queries(
+            4, 'delete',
+            lambda user: reverse('connection-detail', kwargs={
+                'pk': Connection.objects.filter(user=user).first().pk
+            })
+        )
+    
+    def test_note_search(self):
+        """Test note search query count"""
+        index_notes(list(Note.objects.all()))
+        self.assert_constant_queries(4, 'get', lambda user: f"{reverse('note-search')}?q=content")
+    
+    def test_note_sync(self):
+        """Test note sync query count, for a full snapshot and a delta"""
+        self.assert_constant_queries(5, 'get', lambda user: reverse('note-sync'))
+        # Including the tombstones deleted since the token
+        since = timezone.now() - datetime.timedelta(days=1)
+        self.assert_constant_queries(
+            6, 'get', lambda user: f"{reverse('note-sync')}?since={int(since.timestamp() * 1_000_000)}"
+        )
+    
+    def test_note_sync_push(self):
+        """Test note sync push query count"""
+        self.assert_constant_queries(
+            11, 'post', lambda user: reverse('note-sync'),
+            lambda user: {'notes': [{'id': self.first_note(user).pk, 'title': 'Pushed'}]}
+        )
+    
+    def test_note_neighborhood(self):
+        """Test note neighborhood query count"""
+        self.assert_constant_queries(
+            4, 'get', lambda user: f"{reverse('note-neighborhood', kwargs={'pk': self.first_note(user).pk})}?depth=2"
+        )
+    
+    def test_note_path(self):
+        """Test note path query count"""
+        def url_for_user(user):
+            first, second = Note.objects.filter(user=user).order_by('pk')[:2]
+            return f"{reverse('note-path')}?from={first.pk}&to={second.pk}"
+        self.assert_constant_queries(5, 'get', url_for_user)
+
+
+class NoteListPaginationTest(APITestCase):
+    """Test cases for cursor pagination and sparse fieldsets on the note list"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.notes = [
+            Note.objects.create(title=f'Note {i}', content='x' * 300, user=self.user)
+            for i in range(5)
+        ]
+        self.client.force_authenticate(user=self.user)
+    
+    def test_cursor_pagination(self):
+        """Test walking the note list page by page"""
+        url = reverse('note-list') + '?page_size=2'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(note['id'] for note in response.data['results'])
+            url = response.data['next']
+        
+        self.assertEqual(seen, [note.id for note in reversed(self.notes)])
+    
+    def test_fields_parameter(self):
+        """Test selecting only some fields of the notes"""
+        url = reverse('note-list')
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'fields': 'id,title,preview'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        note = response.data['results'][0]
+        self.assertEqual(set(note), {'id', 'title', 'preview'})
+        self.assertEqual(note['preview'], 'x' * 200 + '...')
+    
+    def test_exclude_parameter(self):
+        """Test leaving some fields out of the notes"""
+        url = reverse('note-list')
+        response = self.client.get(url, {'exclude': 'content,checkboxes,activities'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        note = response.data['results'][0]
+        self.assertNotIn('content', note)
+        self.assertNotIn('checkboxes', note)
+        self.assertIn('title', note)
+
+
+class NoteSyncAPITest(APITestCase):
+    """Test cases for the delta sync endpoint"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.note = Note.objects.create(title='Test Note', content='Test content', user=self.user)
+        self.checkbox = Checkbox.objects.create(note=self.note, text='Checkbox', order=1)
+        Note.objects.create(title='Other Note', content='Other content', user=self.other_user)
+        self.url = reverse('note-sync')
+        self.client.force_authenticate(user=self.user)
+    
+    def test_full_snapshot(self):
+        """Test syncing without a token returns all the user's data"""
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['full'])
+        self.assertEqual([note['id'] for note in response.data['notes']], [self.note.id])
+        self.assertEqual(response.data['checkboxes'][0]['note'], self.note.id)
+    
+    @override_settings(SYNC_SAFETY_WINDOW=0)
+    def test_delta_since_token(self):
+        """Test syncing with a token returns only later changes and deletions"""
+        token = self.client.get(self.url).data['token']
+        
+        response = self.client.get(self.url, {'since': token})
+        self.assertEqual(response.data['notes'], [])
+        self.assertEqual(response.data['checkboxes'], [])
+        
+        new_note = Note.objects.create(title='New Note', content='New content', user=self.user)
+        checkbox_id = self.checkbox.id
+        self.checkbox.delete()
+        
+        response = self.client.get(self.url, {'since': token})
+        self.assertFalse(response.data['full'])
+        self.assertEqual([note['id'] for note in response.data['notes']], [new_note.id])
+        self.assertEqual(response.data['deleted']['checkboxes'], [checkbox_id])
+    
+    def test_late_commits_not_skipped(self):
+        """Test rows stamped before a sync but committed after it are sent on the next sync"""
+        stamped = timezone.now() - datetime.timedelta(seconds=60)
+        token = self.client.get(self.url).data['token']
+        
+        late = Note.objects.create(title='Late Note', content='Late content', user=self.user)
+        Note.objects.filter(pk=late.pk).update(updated_at=stamped)
+        Note.objects.filter(pk=self.note.pk).update(updated_at=stamped - datetime.timedelta(seconds=600))
+        
+        response = self.client.get(self.url, {'since': token})
+        self.assertEqual([note['id'] for note in response.data['notes']], [late.id])
+    
+    def test_note_deletion_tombstone(self):
+        """Test deleting a note leaves a single note tombstone"""
+        token = self.client.get(self.url).data['token']
+        note_id = self.note.id
+        self.note.delete()
+        
+        response = self.client.get(self.url, {'since': token})
+        self.assertEqual(response.data['deleted'], {
+            'notes': [note_id], 'checkboxes': [], 'connections': []
+        })
+    
+    @override_settings(SYNC_TOMBSTONE_RETENTION=30)
+    def test_expired_token_resets(self):
+        """Test a token older than the tombstone retention gets a full snapshot"""
+        token = str(int((timezone.now() - datetime.timedelta(days=31)).timestamp() * 1_000_000))
+        
+        response = self.client.get(self.url, {'since': token})
+        self.assertTrue(response.data['full'])
+        self.assertTrue(response.data['reset'])
+        self.assertEqual([note['id'] for note in response.data['notes']], [self.note.id])
+        
+        response = self.client.get(self.url, {'since': response.data['token']})
+        self.assertFalse(response.data['reset'])
+    
+    @override_settings(SYNC_TOMBSTONE_RETENTION=30)
+    def test_prune_tombstones(self):
+        """Test the cleanup task deletes only the tombstones past the retention"""
+        Note.objects.create(title='Old Note', content='Old content', user=self.user).delete()
+        self.note.delete()
+        old, recent = DeletedObject.objects.order_by('id')
+        DeletedObject.objects.filter(pk=old.pk).update(deleted_at=timezone.now() - datetime.timedelta(days=31))
+        
+        prune_deleted_objects()
+        self.assertEqual(list(DeletedObject.objects.all()), [recent])
+    
+    def test_invalid_token(self):
+        """Test syncing with a malformed token"""
+        for token in ['abc', '99999999999999999999999', '-99999999999999999999999']:
+            with self.subTest(token=token):
+                response = self.client.get(self.url, {'since': token})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_push_changes(self):
+        """Test applying a batch of client changes"""
+        token = self.client.get(self.url).data['token']
+        data = {
+            'notes': [
+                {'client_id': 'a', 'title': 'Created', 'content': 'Created content'},
+                {'id': self.note.id, 'title': 'Renamed'},
+            ],
+            'checkboxes': [{'client_id': 'b', 'note': 'a', 'text': 'New checkbox'}],
+            'connections': [{'client_id': 'c', 'source': self.note.id, 'target': 'a'}],
+            'deleted': {'checkboxes': [self.checkbox.id]},
+        }
+        response = self.client.post(f'{self.url}?since={token}', data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        created_note = Note.objects.get(id=response.data['created']['notes']['a'])
+        self.assertEqual(created_note.user, self.user)
+        self.assertEqual(created_note.checkboxes.get().id, response.data['created']['checkboxes']['b'])
+        self.assertTrue(Connection.objects.filter(source=self.note, target=created_note).exists())
+        self.assertFalse(Checkbox.objects.filter(id=self.checkbox.id).exists())
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.title, 'Renamed')
+        self.assertEqual(response.data['deleted']['checkboxes'], [self.checkbox.id])
+    
+    def test_push_rejects_malformed_changes(self):
+        """Test a push body that isn't an object of lists of objects is rejected"""
+        for data in [
+            [], 'notes', {'notes': {'title': 'Created'}}, {'notes': ['Created']},
+            {'notes': [{'id': 'abc', 'title': 'Renamed'}]}, {'checkboxes': [{'note': [1], 'text': 'New'}]},
+            {'connections': [{'client_id': {}, 'source': 1, 'target': 2}]}, {'deleted': {'notes': ['abc']}},
+            {'deleted': []},
+        ]:
+            with self.subTest(data=data):
+                response = self.client.post(self.url, data, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Note.objects.filter(user=self.user).count(), 1)
+    
+    def test_push_rejects_foreign_notes(self):
+        """Test a batch touching another user's note is rolled back"""
+        other_note = Note.objects.get(user=self.other_user)
+        data = {
+            'notes': [{'client_id': 'a', 'title': 'Created', 'content': 'Created content'}],
+            'connections': [{'source': self.note.id, 'target': other_note.id}],
+        }
+        response = self.client.post(self.url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Note.objects.filter(title='Created').exists())
+        self.assertFalse(Connection.objects.exists())
+
+
+class MindmapCacheTest(APITestCase):
+    """Test cases for the cached mind map payload"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.source = Note.objects.create(title='Source', content='Content', user=self.user)
+        self.target = Note.objects.create(title='Target', content='Content', user=self.user)
+        self.connection = Connection.objects.create(source=self.source, target=self.target, label='link')
+        self.url = reverse('note-mindmap')
+        self.client.force_authenticate(user=self.user)
+    
+    def test_mindmap_payload(self):
+        """Test the mind map nodes and edges"""
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({node['title'] for node in response.data['nodes']}, {'Source', 'Target'})
+        self.assertEqual(response.data['edges'], [{
+            'id': self.connection.id, 'source': self.source.id,
+            'target': self.target.id, 'label': 'link'
+        }])
+    
+    def test_mindmap_cache_hit(self):
+        """Test an unchanged mind map is served without queries"""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['nodes']), 2)
+    
+    def test_mindmap_invalidated_by_note_save(self):
+        """Test saving a note invalidates the cached mind map"""
+        self.client.get(self.url)
+        self.source.title = 'Renamed'
+        self.source.save()
+        
+        response = self.client.get(self.url)
+        self.assertIn('Renamed', {node['title'] for node in response.data['nodes']})
+    
+    def test_mindmap_invalidated_by_connection_delete(self):
+        """Test deleting a connection invalidates the cached mind map"""
+        self.client.get(self.url)
+        self.connection.delete()
+        
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['edges'], [])
+    
+    def test_mindmap_invalidated_by_checkbox_completion(self):
+        """Test checking every checkbox updates the completion state"""
+        Checkbox.objects.create(note=self.source, text='Checkbox', order=1)
+        self.client.get(self.url)
+        checkbox = self.source.checkboxes.get()
+        checkbox.is_checked = True
+        checkbox.save()
+        
+        response = self.client.get(self.url)
+        node = next(node for node in response.data['nodes'] if node['id'] == self.source.id)
+        self.assertTrue(node['all_checked'])
+    
+    def test_mindmap_built_before_commit_not_served(self):
+        """Test a mind map cached while a change is being committed is invalidated by the commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.source.title = 'Renamed'
+            self.source.save()
+            # A concurrent request still reading the rows from before the commit
+            get_cached_mindmap(self.user.id, lambda: {'nodes': [], 'edges': []})
+        
+        response = self.client.get(self.url)
+        self.assertIn('Renamed', {node['title'] for node in response.data['nodes']})
+
+
+class MindmapLayoutTest(APITestCase):
+    """Test cases for the server-computed mind map layout"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        # a - b - c, with d on its own
+        self.notes = {
+            name: Note.objects.create(title=name, content='Content', user=self.user)
+            for name in 'abcd'
+        }
+        for source, target in ['ab', 'bc']:
+            Connection.objects.create(source=self.notes[source], target=self.notes[target])
+        self.url = reverse('note-mindmap')
+        self.client.force_authenticate(user=self.user)
+    
+    def get_positions(self):
+        """Fetch the mind map, bypassing its cache, and return the positions by title"""
+        cache.clear()
+        response = self.client.get(self.url)
+        return {node['title']: (node['x'], node['y']) for node in response.data['nodes']}
+    
+    def distance(self, positions, first, second):
+        """Return the distance between two nodes"""
+        (x0, y0), (x1, y1) = positions[first], positions[second]
+        return ((x0 - x1) ** 2 + (y0 - y1) ** 2) ** 0.5
+    
+    def test_layout_returned_and_persisted(self):
+        """Test every node gets a position that is stored on the note"""
+        positions = self.get_positions()
+        
+        self.assertEqual(set(positions), set('abcd'))
+        self.assertEqual(len(set(positions.values())), 4)
+        self.assertLess(self.distance(positions, 'a', 'b'), self.distance(positions, 'a', 'd'))
+        note = Note.objects.get(pk=self.notes['a'].pk)
+        self.assertEqual((round(note.layout_x, 1), round(note.layout_y, 1)), positions['a'])
+        self.assertFalse(Note.objects.filter(layout_stale=True).exists())
+        
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get_positions(), positions)
+    
+    def test_incremental_layout(self):
+        """Test a new connection only moves the notes around it"""
+        before = self.get_positions()
+        new_note = Note.objects.create(title='e', content='Content', user=self.user)
+        Connection.objects.create(source=self.notes['c'], target=new_note)
+        
+        after = self.get_positions()
+        self.assertEqual(after['a'], before['a'])
+        self.assertEqual(after['d'], before['d'])
+        self.assertNotEqual(after['c'], before['c'])
+        self.assertIn('e', after)
+    
+    def test_deleted_note_relaxes_neighbors(self):
+        """Test deleting a note flags its neighbors for relaxation"""
+        self.get_positions()
+        self.notes['b'].delete()
+        
+        stale = set(Note.objects.filter(layout_stale=True).values_list('title', flat=True))
+        self.assertEqual(stale, {'a', 'c'})
+        self.get_positions()
+        self.assertFalse(Note.objects.filter(layout_stale=True).exists())
+
+
+class MindmapViewportTest(APITestCase):
+    """Test cases for viewport queries on the mind map"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        # a 5 x 5 grid of notes, 300 units apart, each connected to its right neighbor
+        self.notes = {}
+        for column in range(5):
+            for row in range(5):
+                x, y = column * 300.0, row * 300.0
+                self.notes[column, row] = Note.objects.create(
+                    title=f'{column},{row}', content='Content', user=self.user,
+                    layout_x=x, layout_y=y, layout_cell=cell_key(x, y),
+                )
+        for column in range(4):
+            for row in range(5):
+                Connection.objects.create(source=self.notes[column, row], target=self.notes[column + 1, row])
+        Note.objects.update(layout_stale=False)
+        self.url = reverse('note-mindmap')
+        self.client.force_authenticate(user=self.user)
+    
+    def test_nodes_in_viewport(self):
+        """Test only the notes inside the box are returned, with the edges touching them"""
+        response = self.client.get(self.url, {'bbox': '250,250,650,350', 'zoom': 1})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['mode'], 'nodes')
+        self.assertEqual([node['title'] for node in response.data['nodes']], ['1,1', '2,1'])
+        self.assertEqual(len(response.data['edges']), 3)
+        edge = next(edge for edge in response.data['edges'] if edge['source'] == self.notes[0, 1].id)
+        self.assertEqual((edge['source_x'], edge['source_y']), (0.0, 300.0))
+    
+    def test_viewport_query_count(self):
+        """Test a viewport with a current layout is read in a constant number of queries"""
+        self.client.get(self.url, {'bbox': '0,0,100,100'})
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'bbox': '-5000,-5000,5000,5000'})
+        self.assertEqual(len(response.data['nodes']), 25)
+    
+    def test_clusters_when_zoomed_out(self):
+        """Test notes are summarized in clusters at low zoom"""
+        response = self.client.get(self.url, {'bbox': '-100,-100,1300,1300', 'zoom': 0.1})
+        
+        self.assertEqual(response.data['mode'], 'clusters')
+        self.assertEqual(sum(cluster['count'] for cluster in response.data['clusters']), 25)
+        self.assertLess(len(response.data['clusters']), 25)
+        self.assertTrue(all(edge['source'] != edge['target'] for edge in response.data['edges']))
+    
+    def test_clusters_when_crowded(self):
+        """Test a viewport holding too many notes falls back to clusters"""
+        with mock.patch.object(viewport, 'MAX_NODES', 10):
+            response = self.client.get(self.url, {'bbox': '0,0,1200,1200', 'zoom': 1})
+        self.assertEqual(response.data['mode'], 'clusters')
+    
+    def test_new_note_is_laid_out(self):
+        """Test notes created since the last layout are placed before the viewport query"""
+        self.client.get(self.url, {'bbox': '0,0,100,100'})
+        new_note = Note.objects.create(title='new', content='Content', user=self.user)
+        Connection.objects.create(source=self.notes[2, 2], target=new_note)
+        
+        response = self.client.get(self.url, {'bbox': '-5000,-5000,5000,5000'})
+        self.assertIn('new', [node['title'] for node in response.data['nodes']])
+        new_note.refresh_from_db()
+        self.assertEqual(new_note.layout_cell, cell_key(new_note.layout_x, new_note.layout_y))
+    
+    def test_viewport_positions_match_mindmap(self):
+        """Test a note gets the same rounded position from the viewport as from the full mind map"""
+        Note.objects.filter(pk=self.notes[1, 1].pk).update(layout_x=300.04321, layout_y=299.98765)
+        full = self.client.get(self.url).data
+        response = self.client.get(self.url, {'bbox': '250,250,650,350', 'zoom': 1})
+        
+        positions = {node['id']: (node['x'], node['y']) for node in full['nodes']}
+        self.assertEqual(positions[self.notes[1, 1].id], (300.0, 300.0))
+        for node in response.data['nodes']:
+            self.assertEqual((node['x'], node['y']), positions[node['id']])
+        for edge in response.data['edges']:
+            self.assertEqual((edge['source_x'], edge['source_y']), positions[edge['source']])
+            self.assertEqual((edge['target_x'], edge['target_y']), positions[edge['target']])
+    
+    def test_invalid_viewport(self):
+        """Test malformed boxes and zoom levels are rejected"""
+        for params in [{'bbox': '1,2,3'}, {'bbox': '5,0,1,1'}, {'bbox': 'a,b,c,d'}, {'bbox': '0,0,1,1', 'zoom': 0}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ReminderTaskTest(TestCase):
+    """Test cases for the reminder notification task"""
+    
+    def setUp(self):
+        always_eager = celery_app.conf.task_always_eager
+        celery_app.conf.update(CELERY_TASK_ALWAYS_EAGER=True)
+        self.addCleanup(celery_app.conf.update, CELERY_TASK_ALWAYS_EAGER=always_eager)
+        
+        self.now = timezone.now()
+        self.users = [
+            User.objects.create_user(
+                username=f'user{i}',
+                email=f'user{i}@example.com',
+                password='testpass123'
+            )
+            for i in range(3)
+        ]
+    
+    def create_reminder(self, user, frequency, delta=datetime.timedelta(minutes=-5)):
+        """Create a note with a reminder relative to now"""
+        return Note.objects.create(
+            title=f'Reminder {frequency}', content='Content', user=user,
+            has_reminder=True, reminder_datetime=self.now + delta, reminder_frequency=frequency
+        )
+    
+    @override_settings(REMINDER_BATCH_SIZE=2)
+    def test_send_due_reminders(self):
+        """Test due reminders are sent in batches and rescheduled"""
+        daily = self.create_reminder(self.users[0], 'daily')
+        once = self.create_reminder(self.users[1], 'none')
+        weekly = self.create_reminder(self.users[2], 'weekly')
+        future = self.create_reminder(self.users[0], 'daily', datetime.timedelta(days=1))
+        
+        result = send_reminder_notifications()
+        
+        self.assertEqual(result, 'Queued 3 reminders in 3 digests')
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['user0@example.com', 'user1@example.com', 'user2@example.com']
+        )
+        self.assertIn('Olá user0', next(m.body for m in mail.outbox if m.to == ['user0@example.com']))
+        
+        daily.refresh_from_db()
+        once.refresh_from_db()
+        weekly.refresh_from_db()
+        future.refresh_from_db()
+        self.assertEqual(daily.next_fire_at, daily.reminder_datetime + datetime.timedelta(days=1))
+        self.assertEqual(weekly.next_fire_at, weekly.reminder_datetime + datetime.timedelta(weeks=1))
+        self.assertFalse(once.has_reminder)
+        self.assertIsNone(once.reminder_datetime)
+        self.assertIsNone(once.next_fire_at)
+        self.assertEqual(future.next_fire_at, self.now + datetime.timedelta(days=1))
+        
+        # Rescheduled reminders are not due again
+        mail.outbox = []
+        send_reminder_notifications()
+        self.assertEqual(mail.outbox, [])
+    
+    def test_missed_occurrences_fire_once(self):
+        """Test a reminder that missed several occurrences fires once and catches up"""
+        note = self.create_reminder(self.users[0], 'daily', datetime.timedelta(days=-3, hours=-1))
+        
+        send_reminder_notifications()
+        
+        self.assertEqual(len(mail.outbox), 1)
+        note.refresh_from_db()
+        self.assertEqual(note.next_fire_at, note.reminder_datetime + datetime.timedelta(days=4))
+    
+    @override_settings(REMINDER_CATCH_UP='all')
+    def test_missed_occurrences_replayed(self):
+        """Test the 'all' catch-up policy replays each missed occurrence"""
+        note = self.create_reminder(self.users[0], 'daily', datetime.timedelta(days=-3, hours=-1))
+        
+        send_reminder_notifications()
+        
+        note.refresh_from_db()
+        self.assertEqual(note.next_fire_at, note.reminder_datetime + datetime.timedelta(days=1))
+    
+    def test_next_fire_at_maintained_on_save(self):
+        """Test next_fire_at follows reminder changes but not other edits"""
+        note = self.create_reminder(self.users[0], 'daily')
+        self.assertEqual(note.next_fire_at, note.reminder_datetime)
+        
+        send_reminder_notifications()
+        note.refresh_from_db()
+        scheduled = note.next_fire_at
+        note.title = 'Renamed'
+        note.save()
+        self.assertEqual(note.next_fire_at, scheduled)
+        
+        note.reminder_datetime = self.now + datetime.timedelta(hours=2)
+        note.save()
+        self.assertEqual(note.next_fire_at, self.now + datetime.timedelta(hours=2))
+        
+        note.has_reminder = False
+        note.save(update_fields=['has_reminder'])
+        note.refresh_from_db()
+        self.assertIsNone(note.next_fire_at)
+    
+    def test_query_count_does_not_grow_with_reminders(self):
+        """Test reminders are read in one query and rescheduled in bulk"""
+        for user in self.users:
+            for _ in range(5):
+                self.create_reminder(user, 'daily')
+        
+        with CaptureQueriesContext(connection) as context:
+            send_reminder_notifications()
+        
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertLessEqual(len(context), 6)
+    
+    @override_settings(REMINDER_BATCH_SIZE=1)
+    def test_one_digest_per_user(self):
+        """Test all the due reminders of a user are sent in a single email"""
+        for i in range(3):
+            self.create_reminder(self.users[0], 'daily')
+        self.create_reminder(self.users[1], 'weekly')
+        
+        result = send_reminder_notifications()
+        
+        self.assertEqual(result, 'Queued 4 reminders in 2 digests')
+        self.assertEqual(len(mail.outbox), 2)
+        digest = next(message for message in mail.outbox if message.to == ['user0@example.com'])
+        self.assertEqual(digest.subject, 'Lembretes: 3 notas')
+        self.assertEqual(digest.body.count('Reminder daily'), 3)
+    
+    def test_digest_skips_already_sent_reminders(self):
+        """Test a partition queued twice only sends its reminders once"""
+        note = self.create_reminder(self.users[0], 'daily')
+        digests = [[self.users[0].id, [note.id]]]
+        
+        self.assertEqual(send_reminder_digests(digests, self.now.isoformat()), 1)
+        self.assertEqual(send_reminder_digests(digests, self.now.isoformat()), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class ReminderRecurrenceTest(TestCase):
+    """Test cases for calendar-aware reminder recurrence"""
+    
+    def local(self, *args):
+        """Return an aware datetime in the project's time zone"""
+        return timezone.make_aware(datetime.datetime(*args), timezone.get_default_timezone())
+    
+    def test_monthly_keeps_day_of_month(self):
+        """Test monthly reminders clamp to short months without drifting"""
+        anchor = self.local(2025, 1, 31, 8, 0)
+        
+        february = next_occurrence(anchor, 'monthly', anchor)
+        self.assertEqual(february, self.local(2025, 2, 28, 8, 0))
+        self.assertEqual(next_occurrence(anchor, 'monthly', february), self.local(2025, 3, 31, 8, 0))
+        self.assertEqual(next_occurrence(anchor, 'monthly', self.local(2025, 12, 31, 9, 0)), self.local(2026, 1, 31, 8, 0))
+    
+    def test_daily_and_weekly(self):
+        """Test daily and weekly reminders keep their time of day"""
+        anchor = self.local(2025, 3, 10, 7, 30)
+        
+        self.assertEqual(next_occurrence(anchor, 'daily', self.local(2025, 3, 12, 7, 30)), self.local(2025, 3, 13, 7, 30))
+        self.assertEqual(next_occurrence(anchor, 'daily', self.local(2025, 3, 12, 7, 0)), self.local(2025, 3, 12, 7, 30))
+        self.assertEqual(next_occurrence(anchor, 'weekly', self.local(2025, 3, 20, 0, 0)), self.local(2025, 3, 24, 7, 30))
+    
+    def test_no_repeat(self):
+        """Test reminders without frequency have no next occurrence"""
+        self.assertIsNone(next_occurrence(self.local(2025, 1, 1, 0, 0), 'none', self.local(2025, 1, 2, 0, 0)))
+
+
+class NoteSearchTest(APITestCase):
+    """Test cases for the note search endpoint"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.title_match = Note.objects.create(
+            title='Lições de Cálculo', content='Derivadas e integrais para a prova.', user=self.user
+        )
+        self.content_match = Note.objects.create(
+            title='Semana de provas', content='Revisar a lição de cálculo antes da prova.', user=self.user
+        )
+        Note.objects.create(title='Receita', content='Bolo de cenoura', user=self.user)
+        Note.objects.create(title='Cálculo', content='Nota de outro usuário', user=self.other_user)
+        self.url = reverse('note-search')
+        self.client.force_authenticate(user=self.user)
+    
+    def test_tokenize(self):
+        """Test accents are folded, stopwords dropped and plurals stemmed"""
+        self.assertEqual(tokenize('As Lições de Cálculo'), ['licao', 'calculo'])
+        self.assertEqual(tokenize('notas e provas'), ['nota', 'prova'])
+    
+    def test_search_ranking(self):
+        """Test matches in the title rank above matches in the content"""
+        response = self.client.get(self.url, {'q': 'licao calculo'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [result['id'] for result in response.data['results']]
+        self.assertEqual(ids, [self.title_match.id, self.content_match.id])
+        self.assertEqual(response.data['results'][0]['title_highlight'], '<mark>Lições</mark> de <mark>Cálculo</mark>')
+    
+    def test_search_snippet(self):
+        """Test the snippet highlights the matching words"""
+        response = self.client.get(self.url, {'q': 'provas'})
+        
+        snippets = {result['id']: result['snippet'] for result in response.data['results']}
+        self.assertEqual(
+            snippets[self.content_match.id],
+            'Revisar a lição de cálculo antes da <mark>prova</mark>.'
+        )
+    
+    def test_highlight_escapes_html(self):
+        """Test snippets are HTML-escaped around the marks"""
+        self.assertEqual(highlight('<b>nota</b>', {'nota'}), '&lt;b&gt;<mark>nota</mark>&lt;/b&gt;')
+    
+    def test_index_updated_on_save_and_delete(self):
+        """Test the index follows note edits and deletions"""
+        self.title_match.title = 'Álgebra linear'
+        self.title_match.save()
+        
+        response = self.client.get(self.url, {'q': 'algebra'})
+        self.assertEqual([result['id'] for result in response.data['results']], [self.title_match.id])
+        
+        self.title_match.delete()
+        response = self.client.get(self.url, {'q': 'algebra'})
+        self.assertEqual(response.data['results'], [])
+    
+    def test_search_requires_query(self):
+        """Test searching without a query"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_search_rejects_invalid_limit(self):
+        """Test a limit below 1 is rejected"""
+        for limit in ['0', '-1']:
+            with self.subTest(limit=limit):
+                response = self.client.get(self.url, {'q': 'calculo', 'limit': limit})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class NoteGraphTest(APITestCase):
+    """Test cases for the neighborhood and path endpoints"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        # a → b → c ← d → e, plus f on its own
+        self.notes = {
+            name: Note.objects.create(title=name, content='Content', user=self.user)
+            for name in 'abcdef'
+        }
+        for source, target in ['ab', 'bc', 'dc', 'de']:
+            Connection.objects.create(source=self.notes[source], target=self.notes[target])
+        self.other_note = Note.objects.create(title='Other', content='Content', user=self.other_user)
+        self.client.force_authenticate(user=self.user)
+    
+    def get_neighborhood(self, name, **params):
+        """Request the neighborhood of one of the fixture notes"""
+        url = reverse('note-neighborhood', kwargs={'pk': self.notes[name].pk})
+        return self.client.get(url, params)
+    
+    def titles(self, nodes):
+        """Return the titles of the given nodes"""
+        return {node['title'] for node in nodes}
+    
+    def test_neighborhood(self):
+        """Test the neighborhood follows connections in both directions up to the depth"""
+        for backend in ['cte', 'bfs']:
+            with self.subTest(backend=backend), override_settings(NOTES_GRAPH_BACKEND=backend):
+                response = self.get_neighborhood('c', depth=1)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(self.titles(response.data['nodes']), {'b', 'c', 'd'})
+                self.assertEqual(len(response.data['edges']), 2)
+                
+                response = self.get_neighborhood('a', depth=3)
+                depths = {node['title']: node['depth'] for node in response.data['nodes']}
+                self.assertEqual(depths, {'a': 0, 'b': 1, 'c': 2, 'd': 3})
+                self.assertEqual(len(response.data['edges']), 3)
+    
+    def test_neighborhood_query_count(self):
+        """Test the recursive CTE fetches the neighborhood in a constant number of queries"""
+        with override_settings(NOTES_GRAPH_BACKEND='cte'), self.assertNumQueries(4):
+            response = self.get_neighborhood('a', depth=5)
+        self.assertEqual(len(response.data['nodes']), 5)
+    
+    def test_neighborhood_validation(self):
+        """Test invalid depths and other users' notes are rejected"""
+        self.assertEqual(self.get_neighborhood('a', depth=99).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get_neighborhood('a', depth='x').status_code, status.HTTP_400_BAD_REQUEST)
+        url = reverse('note-neighborhood', kwargs={'pk': self.other_note.pk})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_shortest_path(self):
+        """Test the path endpoint returns the notes and connections of a shortest path"""
+        response = self.client.get(reverse('note-path'), {'from': self.notes['a'].pk, 'to': self.notes['e'].pk})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['length'], 4)
+        self.assertEqual([node['title'] for node in response.data['nodes']], list('abcde'))
+        self.assertEqual(len(response.data['edges']), 4)
+    
+    def test_shortest_path_prefers_fewer_connections(self):
+        """Test a shortcut connection is taken over the longer chain"""
+        Connection.objects.create(source=self.notes['e'], target=self.notes['b'])
+        response = self.client.get(reverse('note-path'), {'from': self.notes['a'].pk, 'to': self.notes['e'].pk})
+        
+        self.assertEqual([node['title'] for node in response.data['nodes']], list('abe'))
+    
+    def test_no_path(self):
+        """Test unconnected notes have no path"""
+        response = self.client.get(reverse('note-path'), {'from': self.notes['a'].pk, 'to': self.notes['f'].pk})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['length'])
+        self.assertEqual(response.data['nodes'], [])
+    
+    def test_path_validation(self):
+        """Test missing parameters and other users' notes are rejected"""
+        url = reverse('note-path')
+        self.assertEqual(self.client.get(url, {'from': self.notes['a'].pk}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {'from': self.notes['a'].pk, 'to': self.other_note.pk})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SuggestedConnectionsTest(APITestCase):
+    """Test cases for content-based connection suggestions"""
+    
+    def setUp(self):
+        always_eager = celery_app.conf.task_always_eager
+        celery_app.conf.update(CELERY_TASK_ALWAYS_EAGER=True)
+        self.addCleanup(celery_app.conf.update, CELERY_TASK_ALWAYS_EAGER=always_eager)
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.calculus = Note.objects.create(
+            title='Cálculo', content='Derivadas e integrais de funções', user=self.user
+        )
+        self.exam = Note.objects.create(
+            title='Prova de cálculo', content='Revisar derivadas e integrais', user=self.user
+        )
+        self.limits = Note.objects.create(
+            title='Limites', content='Limites de funções antes das derivadas', user=self.user
+        )
+        self.recipe = Note.objects.create(title='Receita', content='Bolo de cenoura', user=self.user)
+        Note.objects.create(title='Cálculo', content='Derivadas e integrais', user=self.other_user)
+        self.url = reverse('note-suggested-connections', kwargs={'pk': self.calculus.pk})
+        self.client.force_authenticate(user=self.user)
+    
+    def test_suggestions_ranked_by_similarity(self):
+        """Test similar notes are suggested best first and unrelated ones left out"""
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data], [self.exam.id, self.limits.id])
+        self.assertGreater(response.data[0]['score'], response.data[1]['score'])
+    
+    def test_connected_notes_not_suggested(self):
+        """Test notes already connected in either direction are excluded"""
+        Connection.objects.create(source=self.exam, target=self.calculus)
+        response = self.client.get(self.url)
+        
+        self.assertEqual([item['id'] for item in response.data], [self.limits.id])
+    
+    def test_incremental_update(self):
+        """Test only changed notes are re-indexed, and edits and deletions are picked up"""
+        self.client.get(self.url)
+        self.assertEqual(update_similarity_index(self.user.id), 0)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.content = 'Integrais e derivadas de funções para a prova de cálculo'
+            self.recipe.save()
+            self.exam.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data[0]['id'], self.recipe.id)
+        self.assertNotIn(self.exam.id, [item['id'] for item in response.data])
+        self.assertEqual(update_similarity_index(self.user.id), 0)
+    
+    def test_only_text_changes_queue_updates(self):
+        """Test saves leaving the title and content unchanged don't queue a matrix update"""
+        url = reverse('note-detail', kwargs={'pk': self.recipe.pk})
+        with mock.patch('apps.notes.tasks.update_similarity_index.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(url, {'has_reminder': True, 'reminder_datetime': timezone.now()}, format='json')
+                self.client.put(url, {'title': 'Receita', 'content': 'Bolo de cenoura', 'xp_value': 3}, format='json')
+            apply_async.assert_not_called()
+            
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(url, {'content': 'Bolo de chocolate'}, format='json')
+            apply_async.assert_called_once_with((self.user.id,), retry=False)
+    
+    def test_broker_errors_are_logged(self):
+        """Test an unreachable broker is logged without failing the saved change"""
+        url = reverse('note-detail', kwargs={'pk': self.recipe.pk})
+        with mock.patch('apps.notes.tasks.update_similarity_index.apply_async', side_effect=OperationalError):
+            with self.assertLogs('apps.notes.tasks', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(url, {'content': 'Bolo de chocolate'}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.content, 'Bolo de chocolate')
+    
+    def test_queue_errors_are_logged(self):
+        """Test other errors queuing the update, like an unreachable result store, don't fail the saved note"""
+        error = RuntimeError('Retry limit exceeded while trying to reconnect to the Celery result store')
+        with mock.patch('apps.notes.tasks.update_similarity_index.apply_async', side_effect=error):
+            with self.assertLogs('apps.notes.tasks', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('note-list'), {'title': 'Prova', 'content': 'Cálculo'}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Note.objects.filter(pk=response.data['id']).exists())
+    
+    def test_term_matrix_round_trip(self):
+        """Test the stored term matrix loads back unchanged"""
+        update_similarity_index(self.user.id)
+        matrix = TermMatrix.load(SimilarityIndex.objects.get(user=self.user).data)
+        
+        self.assertEqual(sorted(matrix.note_ids.tolist()), sorted([
+            self.calculus.id, self.exam.id, self.limits.id, self.recipe.id
+        ]))
+        self.assertIn('derivada', matrix.terms)
+        self.assertEqual(matrix.similar(self.calculus.id, 1)[0][0], self.exam.id)
+    
+    def test_other_users_note(self):
+        """Test suggestions for another user's note are not found"""
+        other_note = Note.objects.get(user=self.other_user)
+        url = reverse('note-suggested-connections', kwargs={'pk': other_note.pk})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_invalid_limit(self):
+        """Test a limit below 1 is rejected"""
+        for limit in ['0', '-3']:
+            with self.subTest(limit=limit):
+                self.assertEqual(self.client.get(self.url, {'limit': limit}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConditionalRequestTest(APITestCase):
+    """Test cases for ETag and Last-Modified handling of notes and connections"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.note = Note.objects.create(title='Note', content='Content', user=self.user)
+        self.other = Note.objects.create(title='Other', content='Content', user=self.user)
+        self.connection = Connection.objects.create(source=self.note, target=self.other)
+        self.checkbox = Checkbox.objects.create(note=self.note, text='Item')
+        self.client.force_authenticate(user=self.user)
+    
+    def etag(self, url):
+        """Return the ETag of a GET of the url"""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response['ETag']
+    
+    def test_not_modified_before_serializing(self):
+        """Test a matching If-None-Match is answered with 304 from one query"""
+        url = reverse('note-list')
+        response = self.client.get(url)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+    
+    def test_if_modified_since(self):
+        """Test If-Modified-Since at the Last-Modified time is answered with 304"""
+        url = reverse('note-detail', kwargs={'pk': self.note.pk})
+        last_modified = self.client.get(url)['Last-Modified']
+        
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_list_etag_changes(self):
+        """Test the list ETag changes with notes, checkboxes and deletions"""
+        url = reverse('note-list')
+        etags = [self.etag(url)]
+        
+        self.checkbox.text = 'Changed'
+        self.checkbox.save()
+        etags.append(self.etag(url))
+        
+        self.checkbox.delete()
+        etags.append(self.etag(url))
+        
+        self.other.delete()
+        etags.append(self.etag(url))
+        
+        self.assertEqual(len(set(etags)), 4)
+        self.assertEqual(etags[-1], self.etag(url))
+    
+    def test_detail_etag_follows_connected_notes(self):
+        """Test renaming a connected note changes the ETag of the note"""
+        url = reverse('note-detail', kwargs={'pk': self.note.pk})
+        etag = self.etag(url)
+        
+        self.other.title = 'Renamed'
+        self.other.save()
+        self.assertNotEqual(self.etag(url), etag)
+    
+    def test_etag_depends_on_query(self):
+        """Test different representations of the list get different ETags"""
+        url = reverse('note-list')
+        self.assertNotEqual(self.etag(url), self.etag(url + '?fields=id,title'))
+    
+    def test_if_match_update(self):
+        """Test an update with a stale If-Match fails and one with the current ETag succeeds"""
+        url = reverse('note-detail', kwargs={'pk': self.note.pk})
+        etag = self.etag(url)
+        
+        response = self.client.patch(url, {'title': 'First'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], self.etag(url))
+        
+        response = self.client.patch(url, {'title': 'Second'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.title, 'First')
+    
+    def test_if_match_delete(self):
+        """Test a delete with a stale If-Match is refused"""
+        url = reverse('note-detail', kwargs={'pk': self.note.pk})
+        response = self.client.delete(url, HTTP_IF_MATCH='"stale"')
+        
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(Note.objects.filter(pk=self.note.pk).exists())
+    
+    def test_if_match_other_users_note(self):
+        """Test preconditions on another user's note are not found"""
+        other_user = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        other_note = Note.objects.create(title='Theirs', content='Content', user=other_user)
+        url = reverse('note-detail', kwargs={'pk': other_note.pk})
+        
+        response = self.client.patch(url, {'title': 'Mine'}, format='json', HTTP_IF_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_connection_etag_follows_note_titles(self):
+        """Test renaming a note changes the ETag of the connections showing its title"""
+        url = reverse('connection-detail', kwargs={'pk': self.connection.pk})
+        etag = self.etag(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        self.other.title = 'Renamed'
+        self.other.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+    
+    
+    def test_etag_follows_note_activities(self):
+        """Test adding or removing an activity, from either side, changes the ETag of the notes"""
+        activity = Activity.objects.create(name='Study', activity_type='intelligence')
+        for url in [reverse('note-list'), reverse('note-detail', kwargs={'pk': self.note.pk})]:
+            for change in [
+                lambda: self.note.activities.add(activity),
+                lambda: activity.note_set.remove(self.note),
+                lambda: activity.note_set.add(self.note),
+                lambda: activity.note_set.clear(),
+            ]:
+                etag = self.etag(url)
+                change()
+                cache.clear()
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+
+class ResponseCacheTest(APITestCase):
+    """Test cases for the versioned cache of read responses"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.note = Note.objects.create(title='Note', content='Content', user=self.user, has_checkboxes=True)
+        self.checkbox = Checkbox.objects.create(note=self.note, text='Item')
+        self.client.force_authenticate(user=self.user)
+    
+    def test_repeated_read_without_queries(self):
+        """Test a repeated read is served from the cache with its validators"""
+        url = reverse('note-detail', kwargs={'pk': self.note.pk})
+        first = self.client.get(url)
+        
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_invalidated_by_changes(self):
+        """Test checkbox, connection and activity changes invalidate the cached notes"""
+        url = reverse('note-detail', kwargs={'pk': self.note.pk})
+        self.client.get(url)
+        
+        self.client.patch(reverse('checkbox-detail', kwargs={'pk': self.checkbox.pk}), {'text': 'Changed'})
+        self.assertEqual(self.client.get(url).json()['checkboxes'][0]['text'], 'Changed')
+        
+        other = Note.objects.create(title='Other', content='Content', user=self.user)
+        Connection.objects.create(source=self.note, target=other)
+        self.assertEqual(len(self.client.get(url).json()['outgoing_connections']), 1)
+        
+        activity = Activity.objects.create(name='Leitura', activity_type='intelligence')
+        self.note.activities.add(activity)
+        self.assertEqual(self.client.get(url).json()['activities'][0]['name'], 'Leitura')
+        activity.name = 'Estudo'
+        activity.save()
+        self.assertEqual(self.client.get(url).json()['activities'][0]['name'], 'Estudo')
+    
+    def test_invalidated_by_bulk_completion(self):
+        """Test completing notes in bulk invalidates the cached list"""
+        url = reverse('note-list')
+        self.assertFalse(self.client.get(url).json()['results'][0]['all_checked'])
+        
+        self.client.post(reverse('note-complete-bulk'), {'ids': [self.note.pk]}, format='json')
+        self.assertTrue(self.client.get(url).json()['results'][0]['all_checked'])
+    
+    def test_kept_per_user(self):
+        """Test users never read each other's cached responses"""
+        url = reverse('note-list')
+        self.client.get(url)
+        
+        other_user = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.client.force_authenticate(user=other_user)
+        self.assertEqual(self.client.get(url).json()['results'], [])
+    
+    def test_file_based_backend(self):
+        """Test the cache works on the file-based backend"""
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        }}):
+            url = reverse('note-list')
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).json()['results'][0]['title'], 'Note')
+            
+            self.note.title = 'Renamed'
+            self.note.save()
+            self.assertEqual(self.client.get(url).json()['results'][0]['title'], 'Renamed')
+    
+    def test_stats(self):
+        """Test the hit and miss counters are reported to staff only"""
+        url = reverse('note-list')
+        self.client.get(url)
+        self.client.get(url)
+        
+        stats_url = reverse('response-cache-stats')
+        self.assertEqual(self.client.get(stats_url).status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(url)
+        response = self.client.get(stats_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'hits': 1, 'misses': 2, 'hit_ratio': 1 / 3})
+
+
+class ValuesSerializationTest(APITestCase):
+    """Differential tests of the .values() list fast path and the orjson renderer"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        reminder = timezone.make_aware(datetime.datetime(2026, 3, 1, 8, 30, 15, 123456), datetime.timezone.utc)
+        activities = [
+            Activity.objects.create(name='Corrida 🏃', activity_type='agility', icon='🏃'),
+            Activity.objects.create(name='Leitura', description='Livros técnicos', activity_type='intelligence'),
+        ]
+        for i in range(7):
+            note = Note.objects.create(
+                title=f'Nota {i} "citação" \\ ção', content='x' * (150 + i * 20), user=self.user,
+                has_reminder=i % 2 == 0, reminder_datetime=reminder if i % 2 == 0 else None,
+                reminder_frequency='weekly' if i % 3 == 0 else 'none', has_checkboxes=i % 2 == 1,
+            )
+            note.activities.set(activities[:i % 3])
+            for order in range(i % 4):
+                Checkbox.objects.create(note=note, text=f'Item {order}\t\x01', order=order, is_checked=order % 2 == 0)
+        notes = list(Note.objects.filter(user=self.user).order_by('id'))
+        for source, target in zip(notes, notes[1:]):
+            Connection.objects.create(source=source, target=target, label='próxima')
+        self.client.force_authenticate(user=self.user)
+    
+    def assert_same_output(self, url, params=None):
+        """Test the fast path output is byte for byte the one of DRF's serializers and renderer"""
+        cache.clear()
+        fast = self.client.get(url, params)
+        cache.clear()
+        with mock.patch.object(ValuesListMixin, 'list', ListModelMixin.list), \
+                mock.patch.object(ORJSONRenderer, 'render', JSONRenderer.render):
+            slow = self.client.get(url, params)
+        
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.content, slow.content)
+        return fast
+    
+    def test_note_list(self):
+        """Test the note list, paginated and with sparse fieldsets"""
+        response = self.assert_same_output(reverse('note-list'), {'page_size': 3})
+        self.assert_same_output(response.data['next'])
+        self.assert_same_output(reverse('note-list'), {'fields': 'id,title,preview,activities'})
+        self.assert_same_output(reverse('note-list'), {'exclude': 'checkboxes,content'})
+    
+    def test_other_lists(self):
+        """Test the checkbox, connection and activity lists"""
+        for name in ['checkbox-list', 'connection-list', 'activity-list']:
+            with self.subTest(name):
+                self.assert_same_output(reverse(name))
+        self.assert_same_output('/api/activities/')
+    
+    def test_list_queries(self):
+        """Test the note list is built with one query per table"""
+        with self.assertNumQueries(4):
+            self.client.get(reverse('note-list'))
+    
+    def test_renderer(self):
+        """Test the renderer output on values orjson writes differently"""
+        data = {
+            'floats': [0.1, 1e16, 1.5e-7, -0.0], 'int': 2 ** 70, 'text': 'a\u2028b\u2029c',
+            'date': datetime.datetime(2026, 3, 1, 8, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2026, 3, 1), 'lazy': _('Nota'), 'nested': ({'a': None}, True),
+        }
+        for value in [data, {1: 'int key'}, {'only': 'strings', 'ok': [1, 2.5]}]:
+            with self.subTest(value=value):
+                self.assertEqual(ORJSONRenderer().render(value), JSONRenderer().render(value))
+        self.assertEqual(
+            ORJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'),
+        )
+
+
+class NoteBackupTest(APITestCase):
+    """Test cases for the NDJSON export and import"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.other_user = User.objects.create_user(username='otheruser', email='other@example.com', password='testpass123')
+        self.activity = Activity.objects.create(name='Estudo', activity_type='intelligence')
+        self.notes = [
+            Note.objects.create(
+                title=f'Note {i}', content=f'Content {i}', user=self.user, has_checkboxes=True, xp_value=i + 1,
+                has_reminder=i == 0, reminder_datetime=timezone.now() + datetime.timedelta(days=1) if i == 0 else None,
+            )
+            for i in range(3)
+        ]
+        Checkbox.objects.create(note=self.notes[0], text='First', is_checked=True, order=1)
+        Checkbox.objects.create(note=self.notes[0], text='Second', order=2)
+        Checkbox.objects.create(note=self.notes[1], text='Only', is_checked=True)
+        self.notes[1].activities.add(self.activity)
+        Connection.objects.create(source=self.notes[0], target=self.notes[1], label='leads to')
+        Connection.objects.create(source=self.notes[2], target=self.notes[0])
+        Note.objects.create(title='Other Note', content='Other content', user=self.other_user)
+    
+    def export(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('note-export'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+    
+    def import_export(self, content, user=None):
+        self.client.force_authenticate(user=user or self.other_user)
+        return self.client.generic('POST', reverse('note-import'), content, content_type='application/x-ndjson')
+    
+    def snapshot(self, user):
+        """Return the user's notes with their checkboxes, activities and connections, by title"""
+        notes = Note.objects.filter(user=user).exclude(title='Other Note').order_by('title')
+        return [
+            (
+                note.title, note.content, note.xp_value, note.next_fire_at, note.all_checked,
+                note.checkbox_count, note.checked_count,
+                [(c.text, c.is_checked, c.order) for c in note.checkboxes.all()],
+                [a.id for a in note.activities.all()],
+                sorted((c.target.title, c.label) for c in note.outgoing_connections.all()),
+            )
+            for note in notes
+        ]
+    
+    def test_export_lines(self):
+        """Test the export has one typed object per line, notes first"""
+        lines = self.export().splitlines()
+        types = [line.split(b'"type":"')[1].split(b'"')[0] for line in lines]
+        
+        self.assertEqual(types, [b'note'] * 3 + [b'checkbox'] * 3 + [b'activity'] + [b'connection'] * 2)
+        self.assertNotIn(b'Other Note', b''.join(lines))
+    
+    def test_round_trip(self):
+        """Test importing an export recreates the notes with remapped references"""
+        response = self.import_export(self.export())
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'notes': 3, 'checkboxes': 3, 'activities': 1, 'connections': 2})
+        self.assertEqual(self.snapshot(self.other_user), self.snapshot(self.user))
+        imported = set(Note.objects.filter(user=self.other_user).values_list('id', flat=True))
+        self.assertTrue(all(
+            {source, target} <= imported
+            for source, target in Connection.objects.filter(user=self.other_user).values_list('source', 'target')
+        ))
+    
+    def test_round_trip_without_bulk_returning(self):
+        """Test notes get their ids on backends that can't return them from bulk inserts"""
+        content = self.export()
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            response = self.import_export(content)
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.snapshot(self.other_user), self.snapshot(self.user))
+    
+    def test_bulk_insert_reads_keys_back(self):
+        """Test objects inserted without bulk returning get their keys from one query per batch"""
+        notes = [Note(title=f'Note {i}', content='Content', user=self.other_user) for i in range(5)]
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            with self.assertNumQueries(4):
+                bulk_insert(notes, batch_size=3)
+            connections = [Connection(user=self.other_user, source=notes[i], target=notes[i + 1]) for i in range(4)]
+            with self.assertNumQueries(2):
+                bulk_insert(connections)
+        
+        self.assertEqual([note.title for note in Note.objects.filter(pk__in=[note.pk for note in notes])], [
+            f'Note {i}' for i in reversed(range(5))
+        ])
+        self.assertEqual(
+            [(connection.source_id, connection.target_id) for connection in connections],
+            list(Connection.objects.filter(pk__in=[c.pk for c in connections]).order_by('pk').values_list('source', 'target')),
+        )
+    
+    def test_duplicate_lines_not_counted(self):
+        """Test repeated activity and connection lines are imported and counted once"""
+        lines = self.export().splitlines(keepends=True)
+        content = b''.join(lines + [line for line in lines if b'"type":"activity"' in line or b'"type":"connection"' in line])
+        
+        response = self.import_export(content)
+        self.assertEqual(response.data, {'notes': 3, 'checkboxes': 3, 'activities': 1, 'connections': 2})
+        self.assertEqual(self.snapshot(self.other_user), self.snapshot(self.user))
+    
+    def test_export_reads_in_chunks(self):
+        """Test the export pages through the rows instead of loading them at once"""
+        with mock.patch('apps.notes.backup.CHUNK_SIZE', 2):
+            content = self.export()
+        
+        with mock.patch('apps.notes.backup.BATCH_SIZE', 2):
+            response = self.import_export(content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(content.splitlines()), 9)
+        self.assertEqual(self.snapshot(self.other_user), self.snapshot(self.user))
+    
+    def test_export_streams_async_under_asgi(self):
+        """Test the export served over ASGI is an async stream read a chunk at a time"""
+        request = AsyncRequestFactory().get(reverse('note-export'))
+        force_authenticate(request, user=self.user)
+        response = NoteViewSet.as_view({'get': 'export'})(request)
+        self.assertTrue(response.is_async)
+        
+        async def read():
+            return [chunk async for chunk in response.streaming_content]
+        with mock.patch('apps.notes.backup.CHUNK_SIZE', 2):
+            chunks = async_to_sync(read)()
+        self.assertEqual(len(chunks), 6)
+        self.assertEqual(b''.join(chunks), self.export())
+    
+    def test_import_memory_is_bounded(self):
+        """Test references and duplicates spanning batches are resolved without state kept across batches"""
+        lines = self.export().splitlines(keepends=True)
+        content = b''.join(lines + [line for line in lines if b'"type":"activity"' in line or b'"type":"connection"' in line])
+        with mock.patch('apps.notes.backup.BATCH_SIZE', 1):
+            response = self.import_export(content)
+        
+        self.assertEqual(response.data, {'notes': 3, 'checkboxes': 3, 'activities': 1, 'connections': 2})
+        self.assertEqual(self.snapshot(self.other_user), self.snapshot(self.user))
+        
+        repeated = lines[0] + lines[1] + lines[0]
+        with mock.patch('apps.notes.backup.BATCH_SIZE', 1):
+            response = self.import_export(repeated)
+        self.assertEqual((response.status_code, response.data['line']), (status.HTTP_400_BAD_REQUEST, '3'))
+    
+    def test_invalid_line_rolls_back(self):
+        """Test an invalid line rejects the whole import and reports its number"""
+        content = self.export() + b'{"type":"checkbox","note":999,"text":"Orphan"}\n'
+        
+        response = self.import_export(content)
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['line'], '10')
+        self.assertFalse(Note.objects.filter(user=self.other_user).exclude(title='Other Note').exists())
+        
+        for line in [b'not json', b'{"type":"note","id":1}', b'{"type":"folder"}']:
+            with self.subTest(line=line):
+                self.assertEqual(self.import_export(line).status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_import_invalidates_caches(self):
+        """Test the imported notes show up in a previously cached note list"""
+        self.client.force_authenticate(user=self.other_user)
+        self.assertEqual(self.client.get(reverse('note-list')).json()['results'][0]['title'], 'Other Note')
+        
+        self.import_export(self.export())
+        
+        self.client.force_authenticate(user=self.other_user)
+        self.assertEqual(len(self.client.get(reverse('note-list')).json()['results']), 4)
+
+
+class BatchAPITest(APITestCase):
+    """Test cases for the batch endpoint"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.other_user = User.objects.create_user(username='otheruser', email='other@example.com', password='testpass123')
+        self.note = Note.objects.create(title='Existing', content='Existing content', user=self.user, has_checkboxes=True)
+        self.checkbox = Checkbox.objects.create(note=self.note, text='Existing checkbox')
+        self.other_note = Note.objects.create(title='Other Note', content='Other content', user=self.other_user)
+        self.url = reverse('batch')
+        self.client.force_authenticate(user=self.user)
+    
+    def post(self, operations):
+        return self.client.post(self.url, {'operations': operations}, format='json')
+    
+    def test_create_with_references(self):
+        """Test a note with checkboxes and connections is created in one round trip"""
+        operations = [
+            {'method': 'create', 'resource': 'notes', 'client_id': 'a', 'data': {'title': 'Plan', 'content': 'Study plan', 'has_checkboxes': True}},
+            {'method': 'create', 'resource': 'notes', 'client_id': 'b', 'data': {'title': 'Exam', 'content': 'Exam day'}},
+        ]
+        operations += [
+            {'method': 'create', 'resource': 'checkboxes', 'data': {'note': 'a', 'text': f'Step {i}', 'order': i, 'is_checked': i < 4}}
+            for i in range(10)
+        ]
+        operations += [
+            {'method': 'create', 'resource': 'connections', 'client_id': 'c', 'data': {'source': 'a', 'target': 'b', 'label': 'before'}},
+            {'method': 'create', 'resource': 'connections', 'data': {'source': 'b', 'target': self.note.id}},
+            {'method': 'create', 'resource': 'connections', 'data': {'source': self.note.id, 'target': 'a'}},
+        ]
+        
+        response = self.post(operations)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['status'] for result in response.data['results']], [201] * 15)
+        plan = Note.objects.get(pk=response.data['results'][0]['id'])
+        exam = Note.objects.get(pk=response.data['results'][1]['id'])
+        self.assertEqual((plan.user, plan.checkbox_count, plan.checked_count, plan.all_checked), (self.user, 10, 4, False))
+        self.assertEqual(list(plan.checkboxes.values_list('text', flat=True)), [f'Step {i}' for i in range(10)])
+        connection = Connection.objects.get(pk=response.data['results'][12]['id'])
+        self.assertEqual((connection.source, connection.target, connection.user), (plan, exam, self.user))
+        self.assertEqual(response.data['results'][12]['client_id'], 'c')
+        self.assertEqual(Connection.objects.filter(user=self.user).count(), 3)
+        self.assertLessEqual(response.data['queries'], 15)
+    
+    def test_queries_counted_without_logging(self):
+        """Test the batch reports the queries it ran without keeping them in the query log"""
+        operations = [{'method': 'create', 'resource': 'notes', 'data': {'title': 'Plan', 'content': 'Steps'}}]
+        logged = len(connection.queries_log)
+        response = self.post(operations)
+        
+        self.assertGreater(response.data['queries'], 0)
+        self.assertEqual(len(connection.queries_log), logged)
+    
+    def test_created_notes_are_searchable(self):
+        """Test notes created and renamed in a batch are indexed for search"""
+        self.post([
+            {'method': 'create', 'resource': 'notes', 'data': {'title': 'Quantum', 'content': 'Physics'}},
+            {'method': 'update', 'resource': 'notes', 'id': self.note.id, 'data': {'title': 'Chemistry'}},
+        ])
+        
+        response = self.client.get(reverse('note-search'), {'q': 'quantum'})
+        self.assertEqual([result['title'] for result in response.data['results']], ['Quantum'])
+        response = self.client.get(reverse('note-search'), {'q': 'chemistry'})
+        self.assertEqual([result['id'] for result in response.data['results']], [self.note.id])
+    
+    def test_update_and_delete(self):
+        """Test updates and deletions, including of objects created in the same batch"""
+        response = self.post([
+            {'method': 'create', 'resource': 'checkboxes', 'client_id': 'x', 'data': {'note': self.note.id, 'text': 'Temporary'}},
+            {'method': 'update', 'resource': 'notes', 'id': self.note.id, 'data': {'xp_value': 50, 'content': 'Changed'}},
+            {'method': 'update', 'resource': 'checkboxes', 'id': self.checkbox.id, 'data': {'is_checked': True}},
+            {'method': 'delete', 'resource': 'checkboxes', 'id': 'x'},
+        ])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 200, 200, 204])
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.content, self.note.xp_value), ('Changed', 10))
+        self.assertEqual((self.note.checkbox_count, self.note.checked_count, self.note.all_checked), (1, 1, True))
+        self.assertFalse(Checkbox.objects.filter(text='Temporary').exists())
+        
+        response = self.post([{'method': 'delete', 'resource': 'notes', 'id': self.note.id}])
+        self.assertEqual(response.data['results'], [{'status': 204, 'id': self.note.id}])
+        self.assertFalse(Note.objects.filter(pk=self.note.id).exists())
+    
+    def test_failure_rolls_back(self):
+        """Test a failed operation rolls back the batch and is reported with its errors"""
+        response = self.post([
+            {'method': 'create', 'resource': 'notes', 'client_id': 'a', 'data': {'title': 'New', 'content': 'New content'}},
+            {'method': 'create', 'resource': 'checkboxes', 'data': {'note': self.other_note.id, 'text': 'Intruder'}},
+            {'method': 'update', 'resource': 'notes', 'id': self.other_note.id, 'data': {'title': 'Stolen'}},
+            {'method': 'create', 'resource': 'connections', 'data': {'source': 'a', 'target': self.note.id}},
+            {'method': 'create', 'resource': 'connections', 'data': {'source': 'missing', 'target': self.note.id}},
+        ])
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([result['status'] for result in response.data['results']], [424, 400, 404, 424, 400])
+        self.assertIn('note', response.data['results'][1]['errors'])
+        self.assertFalse(Note.objects.filter(title='New').exists())
+        self.assertFalse(Connection.objects.exists())
+        self.other_note.refresh_from_db()
+        self.assertEqual(self.other_note.title, 'Other Note')
+    
+    def test_invalid_operations(self):
+        """Test malformed operations are rejected before anything runs"""
+        for operations in [[], [{'method': 'rename', 'resource': 'notes'}], [{'method': 'update', 'resource': 'notes'}]]:
+            with self.subTest(operations=operations):
+                self.assertEqual(self.post(operations).status_code, status.HTTP_400_BAD_REQUEST)
+        
+        response = self.post([{'method': 'create', 'resource': 'notes', 'data': {'title': 'No content'}}])
+        self.assertEqual(response.data['results'][0]['errors']['content'][0].code, 'required')
+
+
+class CheckboxRankTest(APITestCase):
+    """Test cases for the fractional ranks ordering checkboxes"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.other_user = User.objects.create_user(username='otheruser', email='other@example.com', password='testpass123')
+        self.note = Note.objects.create(title='Test Note', content='Test content', user=self.user, has_checkboxes=True)
+        self.checkboxes = [Checkbox.objects.create(note=self.note, text=f'Item {i}', order=i) for i in range(10)]
+        self.url = reverse('checkbox-reorder')
+        self.client.force_authenticate(user=self.user)
+    
+    def ids(self):
+        return list(self.note.checkboxes.values_list('id', flat=True))
+    
+    def test_rank_between(self):
+        """Test ranks can always be generated between two others"""
+        low, high = ranking.rank_for_order(0), ranking.rank_for_order(1)
+        for _ in range(40):
+            middle = ranking.rank_between(low, high)
+            self.assertTrue(low < middle < high and ranking.is_valid_rank(middle))
+            high = middle
+        self.assertTrue(ranking.rank_between(None, low) < low < ranking.rank_between(low, None))
+        self.assertEqual(ranking.spread_ranks(3), ['9', 'i', 'r'])
+    
+    def test_reorder_ranks(self):
+        """Test every permutation gets increasing ranks, moving as few items as possible"""
+        ranks = [ranking.rank_for_order(i) for i in range(8)]
+        for permutation in itertools.islice(itertools.permutations(ranks), 0, None, 97):
+            changes = ranking.reorder_ranks(list(permutation))
+            new = [changes.get(position, rank) for position, rank in enumerate(permutation)]
+            self.assertEqual(new, sorted(new))
+            self.assertEqual(len(set(new)), len(new))
+            self.assertEqual(len(changes), len(permutation) - len(ranking.longest_increasing(list(permutation))))
+        
+        # Inserting again and again at the same spot ends up spreading the ranks
+        ranks = ['1', '2']
+        for _ in range(200):
+            changes = ranking.reorder_ranks([ranks[0], ranks[-1], *ranks[1:-1]])
+            ranks = [changes.get(position, rank) for position, rank in enumerate([ranks[0], ranks[-1], *ranks[1:-1]])]
+            self.assertEqual(ranks, sorted(ranks))
+            self.assertTrue(all(len(rank) <= ranking.MAX_LENGTH for rank in ranks))
+    
+    def test_move_writes_one_row(self):
+        """Test moving one checkbox updates only that checkbox"""
+        ids = self.ids()
+        ranks = dict(Checkbox.objects.values_list('id', 'rank'))
+        new_order = ids[:2] + ids[3:8] + [ids[2]] + ids[8:]
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'note': self.note.id, 'checkboxes': new_order}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([checkbox['id'] for checkbox in response.data], new_order)
+        self.assertEqual(self.ids(), new_order)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        stored = Checkbox.objects.filter(note=self.note)
+        self.assertEqual([checkbox_id for checkbox_id, rank in stored.values_list('id', 'rank') if rank != ranks[checkbox_id]], [ids[2]])
+        self.assertEqual(stored.filter(updated_at__gt=self.checkboxes[-1].updated_at).count(), 1)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.checkbox_count, 10)
+    
+    def test_reverse(self):
+        """Test reversing the whole list"""
+        new_order = self.ids()[::-1]
+        response = self.client.post(self.url, {'note': self.note.id, 'checkboxes': new_order}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ids(), new_order)
+        response = self.client.get(reverse('note-detail', args=[self.note.id]))
+        self.assertEqual([checkbox['id'] for checkbox in response.data['checkboxes']], new_order)
+    
+    def test_order_still_places_checkboxes(self):
+        """Test the integer order still places new and updated checkboxes"""
+        Checkbox.objects.create(note=self.note, text='Between', order=4)
+        checkbox = self.checkboxes[0]
+        checkbox.order = 20
+        checkbox.save(update_fields=['order'])
+        
+        texts = list(self.note.checkboxes.values_list('text', flat=True))
+        self.assertEqual(texts[-1], 'Item 0')
+        self.assertEqual(texts.index('Between'), texts.index('Item 4') + 1)
+    
+    def test_order_places_checkboxes_after_reorder(self):
+        """Test checkboxes created or moved by order after a reorder land at that position"""
+        new_order = self.ids()[::-1]
+        self.client.post(self.url, {'note': self.note.id, 'checkboxes': new_order}, format='json')
+        
+        response = self.client.post(reverse('checkbox-list'), {'note': self.note.id, 'text': 'New', 'order': 3}, format='json')
+        self.assertEqual(self.ids(), new_order[:4] + [response.data['id']] + new_order[4:])
+        
+        moved = new_order[8]
+        self.client.patch(reverse('checkbox-detail', args=[moved]), {'order': 0}, format='json')
+        self.assertEqual(self.ids()[:3], [new_order[0], moved, new_order[1]])
+        
+        self.client.post(reverse('batch'), {'operations': [
+            {'method': 'create', 'resource': 'checkboxes', 'data': {'note': self.note.id, 'text': f'Batch {i}', 'order': 1}}
+            for i in range(2)
+        ]}, format='json')
+        texts = list(self.note.checkboxes.values_list('text', flat=True))
+        self.assertEqual(texts[1:5], ['Item 1', 'Batch 0', 'Batch 1', 'Item 8'])
+    
+    def test_invalid_reorder(self):
+        """Test the new order must list exactly the checkboxes of an owned note"""
+        ids = self.ids()
+        other_note = Note.objects.create(title='Other', content='Other', user=self.other_user)
+        for data, expected in [
+            ({'note': self.note.id, 'checkboxes': ids[1:]}, status.HTTP_400_BAD_REQUEST),
+            ({'note': self.note.id, 'checkboxes': ids + ids[:1]}, status.HTTP_400_BAD_REQUEST),
+            ({'note': other_note.id, 'checkboxes': ids}, status.HTTP_403_FORBIDDEN),
+        ]:
+            with self.subTest(data=data):
+                self.assertEqual(self.client.post(self.url, data, format='json').status_code, expected)
+        self.assertEqual(self.ids(), ids)
+
+
+@override_settings(CHECKBOX_WRITE_BEHIND=True)
+class CheckboxWriteBehindTest(APITestCase):
+    """Test cases for the write-behind buffer of checkbox toggles"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.note = Note.objects.create(title='Test Note', content='Test content', user=self.user, has_checkboxes=True)
+        self.checkboxes = [Checkbox.objects.create(note=self.note, text=f'Item {i}', order=i) for i in range(3)]
+        self.client.force_authenticate(user=self.user)
+        patcher = mock.patch('apps.notes.tasks.flush_checkbox_toggles.apply_async')
+        self.schedule = patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def toggle(self, checkbox, is_checked):
+        return self.client.patch(reverse('checkbox-detail', args=[checkbox.id]), {'is_checked': is_checked}, format='json')
+    
+    def stored_states(self):
+        return list(Checkbox.objects.filter(note=self.note).values_list('is_checked', flat=True))
+    
+    def test_toggles_are_buffered(self):
+        """Test toggles answer with the new state without writing it, scheduling one flush"""
+        for checkbox in self.checkboxes:
+            with self.assertNumQueries(1):
+                response = self.toggle(checkbox, True)
+            self.assertTrue(response.data['is_checked'])
+        
+        self.assertEqual(self.stored_states(), [False, False, False])
+        self.schedule.assert_called_once_with((self.user.id,), countdown=5, retry=False)
+    
+    def test_read_your_writes(self):
+        """Test the user's next request reads the buffered toggles"""
+        for checkbox in self.checkboxes:
+            self.toggle(checkbox, True)
+        self.toggle(self.checkboxes[1], False)
+        self.toggle(self.checkboxes[1], True)
+        
+        response = self.client.get(reverse('note-detail', args=[self.note.id]))
+        
+        self.assertEqual([checkbox['is_checked'] for checkbox in response.data['checkboxes']], [True, True, True])
+        self.assertTrue(response.data['all_checked'])
+        self.assertEqual(self.stored_states(), [True, True, True])
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.checkbox_count, self.note.checked_count), (3, 3))
+    
+    def test_schedule_errors_keep_toggles(self):
+        """Test a flush that can't be scheduled leaves the toggle buffered and is tried again"""
+        self.schedule.side_effect = RuntimeError('Retry limit exceeded while trying to reconnect to the Celery result store')
+        with self.assertLogs('apps.notes.toggles', 'ERROR'):
+            response = self.toggle(self.checkboxes[0], True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        self.schedule.side_effect = None
+        self.toggle(self.checkboxes[1], True)
+        self.assertEqual(self.schedule.call_count, 2)
+        self.client.get(reverse('note-detail', args=[self.note.id]))
+        self.assertEqual(self.stored_states(), [True, True, False])
+    
+    def flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return flush_checkbox_toggles(self.user.id)
+    
+    def test_flush_task(self):
+        """Test the flush task writes the last toggle of each checkbox with a constant number of queries"""
+        for size in [3, 30]:
+            for i in range(size):
+                self.toggle(self.checkboxes[i % 3], i % 2 == 0)
+            
+            with self.assertNumQueries(7):
+                self.assertEqual(self.flush(), size)
+        self.assertEqual(self.stored_states(), [False, True, False])
+        self.assertEqual(self.flush(), 0)
+        self.assertEqual(self.schedule.call_count, 2)
+    
+    def test_other_writes_follow_toggles(self):
+        """Test a full update after a toggle is applied on top of it"""
+        self.toggle(self.checkboxes[0], True)
+        response = self.client.patch(
+            reverse('checkbox-detail', args=[self.checkboxes[0].id]), {'text': 'Renamed'}, format='json'
+        )
+        
+        self.assertEqual((response.data['text'], response.data['is_checked']), ('Renamed', True))
+        self.assertEqual(self.stored_states(), [True, False, False])
+    
+    def test_lost_entry_is_skipped(self):
+        """Test a toggle evicted from the cache stops one flush and is skipped by the next"""
+        for checkbox in self.checkboxes:
+            self.toggle(checkbox, True)
+        cache.delete(toggle_key(self.user.id, 2))
+        
+        self.assertEqual(self.flush(), 1)
+        self.assertEqual(self.stored_states(), [True, False, False])
+        self.assertEqual(self.flush(), 2)
+        self.assertEqual(self.stored_states(), [True, False, True])
+    
+    def test_consecutive_lost_entries_are_skipped(self):
+        """Test toggles evicted one after the other are skipped together and later toggles still flushed"""
+        for checkbox in self.checkboxes:
+            self.toggle(checkbox, True)
+        self.toggle(self.checkboxes[0], False)
+        cache.delete_many([toggle_key(self.user.id, 2), toggle_key(self.user.id, 3)])
+        
+        self.assertEqual(self.flush(), 1)
+        self.assertEqual(self.flush(), 3)
+        self.assertEqual(self.stored_states(), [False, False, False])
+        self.assertEqual(self.flush(), 0)
+        self.assertFalse(has_pending_toggles(self.user.id))
+        
+        self.toggle(self.checkboxes[1], True)
+        cache.delete(toggle_key(self.user.id, 5))
+        self.assertEqual(self.flush(), 0)
+        self.assertEqual(self.flush(), 1)
+        self.assertFalse(has_pending_toggles(self.user.id))
+
+
+class NoteEventsTest(TestCase):
+    """Test cases for the live change events"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.start = events.next_event_id(self.user.id)
+        patcher = mock.patch('apps.notes.tasks.update_similarity_index.apply_async')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def published(self):
+        return events.replay(self.user.id, self.start)
+    
+    async def read(self, stream):
+        return await asyncio.wait_for(anext(stream), 1)
+    
+    def test_changes_published_on_commit(self):
+        """Test saved and deleted objects are published once committed"""
+        with self.captureOnCommitCallbacks(execute=True):
+            note = Note.objects.create(title='Live', content='Content', user=self.user)
+            checkbox = Checkbox.objects.create(note=note, text='Item')
+            self.assertEqual(self.published(), [])
+        checkbox_id = checkbox.id
+        with self.captureOnCommitCallbacks(execute=True):
+            checkbox.delete()
+        
+        published = [(event['type'], event['action'], event['data']['id']) for event in self.published()]
+        self.assertEqual(published, [
+            ('note', 'created', note.id), ('checkbox', 'created', checkbox_id), ('checkbox', 'deleted', checkbox_id),
+        ])
+        self.assertEqual(self.published()[1]['data']['note'], note.id)
+    
+    def test_publish_errors_are_logged(self):
+        """Test a broker error after the commit is logged without failing the saved write"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with mock.patch('ufranotes.events.get_broker', side_effect=ConnectionError('Redis is down')):
+            with self.assertLogs('ufranotes.events', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+                response = client.post(reverse('note-list'), {'title': 'Saved', 'content': 'Content'}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Note.objects.filter(title='Saved').exists())
+    
+    def test_cascade_publishes_note_only(self):
+        """Test deleting a note publishes one event for its checkboxes and connections"""
+        note = Note.objects.create(title='Source', content='Content', user=self.user)
+        other = Note.objects.create(title='Target', content='Content', user=self.user)
+        Checkbox.objects.create(note=note, text='Item')
+        Connection.objects.create(user=self.user, source=note, target=other)
+        self.start = events.next_event_id(self.user.id)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            note.delete()
+        self.assertEqual([(e['type'], e['action']) for e in self.published()], [('note', 'deleted')])
+    
+    def test_bulk_writes_publish_sync(self):
+        """Test bulk completions and checkbox reorders, which skip the signals, publish a sync event"""
+        note = Note.objects.create(title='Plan', content='Steps', user=self.user, has_checkboxes=True)
+        first, second = [Checkbox.objects.create(note=note, text=f'Item {i}', order=i) for i in range(2)]
+        self.start = events.next_event_id(self.user.id)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('checkbox-reorder'), {'note': note.id, 'checkboxes': [second.id, first.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(e['type'], e['action']) for e in self.published()], [('sync', 'changed')])
+        
+        self.start = events.next_event_id(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('note-complete-bulk'), {'ids': [note.id]}, format='json')
+        self.assertEqual(response.data['results'], [{'id': note.id, 'status': 'success'}])
+        self.assertIn(('sync', 'changed'), [(e['type'], e['action']) for e in self.published()])
+    
+    def test_xp_published(self):
+        """Test XP awards publish the user's level and XP"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.add_xp(150)
+        
+        self.assertEqual(self.published()[-1]['data'], {'level': 2, 'xp': 50})
+    
+    @override_settings(NOTES_EVENTS_BUFFER_SIZE=3)
+    def test_replay_window(self):
+        """Test only the events still in the ring buffer are replayed"""
+        sent = [events.send(self.user.id, 'note', 'updated', {'id': i}) for i in range(5)]
+        
+        self.assertEqual(events.replay(self.user.id, sent[1]['id']), sent[2:])
+        self.assertIsNone(events.replay(self.user.id, sent[0]['id']))
+        self.assertIsNone(events.replay(self.user.id, sent[-1]['id'] + 1))
+        self.assertEqual(events.replay(self.user.id, sent[-1]['id']), [])
+    
+    async def test_stream_resumes_and_follows(self):
+        """Test a stream replays the missed events, then sends new ones"""
+        missed = await sync_to_async(events.send)(self.user.id, 'note', 'updated', {'id': 1})
+        stream = events.event_stream(self.user.id, self.start)
+        try:
+            self.assertEqual(await self.read(stream), b'retry: 3000\n\n')
+            self.assertTrue((await self.read(stream)).startswith(b'id: %d\nevent: note\n' % missed['id']))
+            
+            live = await sync_to_async(events.send)(self.user.id, 'checkbox', 'deleted', {'id': 2})
+            self.assertEqual(
+                await self.read(stream),
+                b'id: %d\nevent: checkbox\ndata: {"action":"deleted","data":{"id":2}}\n\n' % live['id'],
+            )
+        finally:
+            await stream.aclose()
+        self.assertEqual(events.get_broker().subscriptions.get(self.user.id), None)
+    
+    @override_settings(NOTES_EVENTS_KEEPALIVE=0)
+    async def test_stream_reset_and_keepalive(self):
+        """Test a stream resuming from an unknown event starts with a reset"""
+        stream = events.event_stream(self.user.id, self.start + 1000)
+        try:
+            await self.read(stream)
+            self.assertEqual(await self.read(stream), b'event: reset\ndata: {}\n\n')
+            self.assertEqual(await self.read(stream), b': keep-alive\n\n')
+        finally:
+            await stream.aclose()
+    
+    @override_settings(NOTES_EVENTS_STREAM_TIMEOUT=0)
+    async def test_stream_timeout(self):
+        """Test a stream ends once its time is up, for the client to resume"""
+        frames = [frame async for frame in events.event_stream(self.user.id)]
+        
+        self.assertEqual(frames, [b'retry: 3000\n\n'])
+    
+    def test_stream_authentication(self):
+        """Test the stream requires an access token, in a header or the query string"""
+        url = reverse('note-events')
+        token = str(AccessToken.for_user(self.user))
+        
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get(url, {'token': 'invalid'}).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(url, {'token': token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_LAST_EVENT_ID='x')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(ASYNC_READS=True)
+class AsyncReadTest(TestCase):
+    """Test cases for the async read path"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.activity = Activity.objects.create(name='Study', activity_type='intelligence')
+        self.notes = [
+            Note.objects.create(title=f'Note {i}', content=f'Content {i}', user=self.user, has_checkboxes=True)
+            for i in range(3)
+        ]
+        for note in self.notes:
+            Checkbox.objects.create(note=note, text='Item')
+            note.activities.add(self.activity)
+        Connection.objects.create(user=self.user, source=self.notes[0], target=self.notes[1], label='Link')
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+    
+    async def get(self, viewset, actions, path, headers=None, **kwargs):
+        await sync_to_async(cache.clear)()
+        request = AsyncRequestFactory().get(path, headers={**self.headers, **(headers or {})})
+        response = await viewset.as_view(actions, detail='pk' in kwargs)(request, **kwargs)
+        return response.render() if hasattr(response, 'render') else response
+    
+    async def assertSameResponse(self, viewset, actions, path, **kwargs):
+        response = await self.get(viewset, actions, path, **kwargs)
+        await sync_to_async(cache.clear)()
+        expected = await sync_to_async(self.client.get)(path, headers=self.headers)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response.get('ETag'), expected.get('ETag'))
+        return response
+    
+    def test_async_views_only_when_enabled(self):
+        """Test only the listed reads get an async view, and only with ASYNC_READS"""
+        self.assertTrue(asyncio.iscoroutinefunction(NoteViewSet.as_view({'get': 'list', 'post': 'create'})))
+        self.assertFalse(asyncio.iscoroutinefunction(NoteViewSet.as_view({'post': 'complete_bulk'})))
+        with override_settings(ASYNC_READS=False):
+            self.assertFalse(asyncio.iscoroutinefunction(NoteViewSet.as_view({'get': 'list'})))
+    
+    async def test_async_reads_match_sync(self):
+        """Test the async reads answer exactly as the sync views"""
+        note = self.notes[0]
+        await self.assertSameResponse(NoteViewSet, {'get': 'list'}, reverse('note-list'))
+        await self.assertSameResponse(NoteViewSet, {'get': 'list'}, reverse('note-list') + '?fields=id,checkboxes')
+        await self.assertSameResponse(NoteViewSet, {'get': 'retrieve'}, reverse('note-detail', args=[note.id]), pk=str(note.id))
+        await self.assertSameResponse(NoteViewSet, {'get': 'mindmap'}, reverse('note-mindmap'))
+        await self.assertSameResponse(NoteViewSet, {'get': 'mindmap'}, reverse('note-mindmap') + '?bbox=-1000,-1000,1000,1000')
+        await self.assertSameResponse(ConnectionViewSet, {'get': 'list'}, reverse('connection-list'))
+    
+    async def test_async_read_errors_and_preconditions(self):
+        """Test the async reads authenticate, answer 404 and honor If-None-Match"""
+        path = reverse('note-detail', args=[self.notes[0].id])
+        response = await self.get(NoteViewSet, {'get': 'retrieve'}, path, pk=str(self.notes[0].id))
+        
+        not_modified = await self.get(
+            NoteViewSet, {'get': 'retrieve'}, path, {'If-None-Match': response['ETag']}, pk=str(self.notes[0].id)
+        )
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        missing = await self.get(NoteViewSet, {'get': 'retrieve'}, reverse('note-detail', args=[0]), pk='0')
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+        anonymous = await self.get(NoteViewSet, {'get': 'list'}, reverse('note-list'), {'Authorization': ''})
+        self.assertEqual(anonymous.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    async def test_writes_use_sync_view(self):
+        """Test requests other than the async reads go through the regular view"""
+        view = NoteViewSet.as_view({'get': 'list', 'post': 'create'})
+        request = AsyncRequestFactory().post(
+            reverse('note-list'), {'title': 'New', 'content': 'Body'}, content_type='application/json', headers=self.headers
+        )
+        with mock.patch('apps.notes.tasks.update_similarity_index.apply_async'):
+            response = await view(request)
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(await Note.objects.filter(title='New').aexists())
+
+
+class GatherQueriesTest(TransactionTestCase):
+    """Test cases for concurrent independent queries"""
+    
+    def test_queries_run_on_own_connections(self):
+        """Test independent queries run on other threads in autocommit, on the request's inside a transaction"""
+        user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        with mock.patch('apps.notes.tasks.update_similarity_index.apply_async'):
+            Note.objects.create(title='Note', content='Content', user=user)
+        
+        def titles():
+            return threading.get_ident(), list(Note.objects.values_list('title', flat=True))
+        
+        results = async_to_sync(gather_queries)(titles, titles)
+        self.assertEqual([result for _, result in results], [['Note'], ['Note']])
+        self.assertNotIn(threading.get_ident(), [thread for thread, _ in results])
+        
+        def connection_id():
+            list(Note.objects.values_list('pk'))
+            return threading.get_ident(), id(connection.connection)
+        
+        persistent = mock.patch.dict(connection.settings_dict, {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True})
+        with override_settings(ASYNC_READS_THREADS=2), mock.patch('ufranotes.asyncviews._executor', None), persistent:
+            first = dict(async_to_sync(gather_queries)(*[connection_id] * 8))
+            second = dict(async_to_sync(gather_queries)(*[connection_id] * 8))
+            asyncviews.get_executor().shutdown()
+        self.assertLessEqual(len(first), 2)
+        self.assertEqual({thread: second.get(thread, first[thread]) for thread in first}, first)
+        with transaction.atomic():
+            results = async_to_sync(gather_queries)(titles, titles)
+        self.assertEqual({thread for thread, _ in results}, {threading.get_ident()})
+    
+    def test_obsolete_connections_replaced(self):
+        """Test a pool thread's connection past CONN_MAX_AGE is closed before the next query"""
+        def expire():
+            list(Note.objects.values_list('pk'))
+            connections['default'].close_at = 0
+            return connections['default']
+        
+        persistent = mock.patch.dict(connection.settings_dict, {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True})
+        with override_settings(ASYNC_READS_THREADS=1), mock.patch('ufranotes.asyncviews._executor', None), persistent:
+            [pool_connection] = async_to_sync(gather_queries)(expire)
+            with mock.patch.object(type(pool_connection), 'close', autospec=True) as close:
+                async_to_sync(gather_queries)(expire)
+            asyncviews.get_executor().shutdown()
+        close.assert_called_once_with(pool_connection)
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+Write-behind buffer of checkbox toggles (CHECKBOX_WRITE_BEHIND).
+
+A PATCH that only changes `is_checked` is appended to a log of the owner's
+pending toggles in the cache instead of being saved: an atomic counter
+numbers the entries, so concurrent appends never overwrite each other. A
+flush writes the log to the database in one transaction, keeping the last
+toggle of each checkbox, with one UPDATE per checked state, and recomputes
+the counters and all_checked of each touched note once.
+
+The log is flushed by a Celery task a few seconds after the first pending
+toggle, and before any other request of the same user on the notes API is
+handled, so users always read their own writes. Flushes of a user are
+serialized by locking the user's row. When the flush can't be scheduled,
+the toggle stays buffered until that next request.
+"""
+
+import logging
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from ufranotes.events import publish
+from ufranotes.response_cache import invalidate_user
+from .bulk import recount_checkboxes
+from .models import Checkbox
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+def toggle_key(user_id, name):
+    return f'toggles:{user_id}:{name}'
+
+
+def increment(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        return cache.incr(key)
+
+
+def is_toggle(request):
+    """
+    Return True for the PATCH requests changing only `is_checked`
+    """
+    return request.method == 'PATCH' and set(request.data) == {'is_checked'}
+
+
+def buffer_toggle(user_id, note_id, checkbox_id, is_checked):
+    """
+    Append a toggle to the user's log and make sure a flush is scheduled
+    """
+    from .tasks import flush_checkbox_toggles
+    
+    number = increment(toggle_key(user_id, 'last'))
+    cache.set(toggle_key(user_id, number), (note_id, checkbox_id, is_checked), None)
+    if cache.add(toggle_key(user_id, 'scheduled'), True, settings.CHECKBOX_FLUSH_DELAY * 10):
+        try:
+            flush_checkbox_toggles.apply_async((user_id,), countdown=settings.CHECKBOX_FLUSH_DELAY, retry=False)
+        except Exception:
+            # The next toggle tries again
+            cache.delete(toggle_key(user_id, 'scheduled'))
+            logger.exception('Could not schedule the checkbox toggle flush of user %s', user_id)
+
+
+def has_pending_toggles(user_id):
+    values = cache.get_many([toggle_key(user_id, 'last'), toggle_key(user_id, 'flushed')])
+    return values.get(toggle_key(user_id, 'last'), 0) > values.get(toggle_key(user_id, 'flushed'), 0)
+
+
+def flush_toggles(user_id):
+    """
+    Write the user's pending toggles to the database and return the number
+    of log entries consumed
+    
+    An entry missing from the log was either still being written by a
+    concurrent request, and the flush stops before it, or lost to a cache
+    eviction: every entry numbered up to the end of the log at that point
+    and still missing at the next flush is skipped.
+    """
+    with transaction.atomic():
+        User.objects.select_for_update().filter(pk=user_id).exists()
+        first = cache.get(toggle_key(user_id, 'flushed'), 0) + 1
+        last = cache.get(toggle_key(user_id, 'last'), 0)
+        if last < first:
+            return 0
+        
+        keys = [toggle_key(user_id, number) for number in range(first, last + 1)]
+        entries = cache.get_many(keys)
+        # Entries up to `missing` were already missing from an earlier flush
+        missing = cache.get(toggle_key(user_id, 'missing'), 0)
+        toggles, flushed = {}, first - 1
+        for number, key in enumerate(keys, first):
+            if key not in entries:
+                if number > missing:
+                    cache.set(toggle_key(user_id, 'missing'), last, None)
+                    break
+                flushed = number
+                continue
+            note_id, checkbox_id, is_checked = entries[key]
+            toggles[checkbox_id] = (note_id, is_checked)
+            flushed = number
+        
+        now = timezone.now()
+        for state in [True, False]:
+            ids = [checkbox_id for checkbox_id, (_, is_checked) in toggles.items() if is_checked is state]
+            if ids:
+                Checkbox.objects.filter(pk__in=ids, note__user_id=user_id).update(is_checked=state, updated_at=now)
+        if toggles:
+            recount_checkboxes({note_id for note_id, _ in toggles.values()})
+            invalidate_user(user_id)
+            publish(user_id, 'sync', 'changed', {})
+        
+        def advance():
+            cache.set(toggle_key(user_id, 'flushed'), flushed, None)
+            cache.delete_many(keys[:flushed - first + 1])
+        transaction.on_commit(advance)
+    return flushed - first + 1
+
+
+def flush_pending_toggles(user_id):
+    """
+    Flush the user's toggles when write-behind is enabled and any is pending
+    """
+    if settings.CHECKBOX_WRITE_BEHIND and has_pending_toggles(user_id):
+        flush_toggles(user_id)
+
+
+class ToggleBufferMixin:
+    """
+    Viewset mixin flushing the user's pending checkbox toggles before each
+    request when write-behind is enabled; with buffer_toggles, toggles
+    sent to the viewset are buffered themselves
+    """
+    buffer_toggles = False
+    
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not self.is_buffered_toggle(request):
+            flush_pending_toggles(request.user.pk)
+    
+    def is_buffered_toggle(self, request):
+        return (
+            settings.CHECKBOX_WRITE_BEHIND and self.buffer_toggles
+            and self.action == 'partial_update' and is_toggle(request)
+        )
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import NoteViewSet, CheckboxViewSet, ConnectionViewSet, ActivityViewSet
+from .views import NoteViewSet, CheckboxViewSet, ConnectionViewSet, ActivityViewSet, note_events
 
 router = DefaultRouter()
 router.register('notes', NoteViewSet, basename='note')
@@ -9,5 +9,7 @@ router.register('connections', ConnectionViewSet, basename='connection')
 router.register('activities', ActivityViewSet, basename='activity')
 
 urlpatterns = [
+    # Before the router, whose note detail route would match it
+    path('notes/stream/', note_events, name='note-events'),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Viewport queries over the persisted mind map layout.
+
+Notes are indexed on a uniform grid: layout_cell packs the grid column and
+row of the note's position into one integer (column * CELL_SPAN + row),
+indexed together with the user. The cells of one grid column are
+consecutive keys, so a bounding box becomes one index range scan per
+column it spans.
+
+When zoomed out, or when the viewport holds too many notes, notes are
+summarized into clusters of a few screen pixels, so the payload size
+depends on the viewport and not on the size of the graph.
+"""
+
+import math
+from django.db.models import Avg, BigIntegerField, Count, F, Q, Value
+from django.db.models.functions import Cast, Floor
+
+CELL_SIZE = 1000.0
+CELL_SPAN = 1 << 20
+MAX_INDEX_COLUMNS = 64
+DETAIL_ZOOM = 0.5
+CLUSTER_PIXELS = 120
+MAX_CLUSTERS_PER_SIDE = 32
+MAX_NODES = 500
+
+
+def cell_key(x, y):
+    """
+    Return the grid cell of a position
+    """
+    return math.floor(x / CELL_SIZE) * CELL_SPAN + math.floor(y / CELL_SIZE)
+
+
+def bbox_filter(bbox, prefix=''):
+    """
+    Return a filter for the notes inside the bounding box, using the grid
+    index one column at a time when the box is narrow enough
+    """
+    x0, y0, x1, y1 = bbox
+    condition = Q(**{
+        f'{prefix}layout_x__range': (x0, x1),
+        f'{prefix}layout_y__range': (y0, y1),
+    })
+    first_column, last_column = math.floor(x0 / CELL_SIZE), math.floor(x1 / CELL_SIZE)
+    first_row, last_row = math.floor(y0 / CELL_SIZE), math.floor(y1 / CELL_SIZE)
+    if last_column - first_column < MAX_INDEX_COLUMNS:
+        cells = Q()
+        for column in range(first_column, last_column + 1):
+            cells |= Q(**{f'{prefix}layout_cell__range': (column * CELL_SPAN + first_row, column * CELL_SPAN + last_row)})
+        condition &= cells
+    return condition
+
+
+def cluster_size(bbox, zoom):
+    """
+    Return the side of the clusters, in layout units, for the viewport
+    """
+    x0, y0, x1, y1 = bbox
+    return max(CLUSTER_PIXELS / zoom, max(x1 - x0, y1 - y0) / MAX_CLUSTERS_PER_SIDE)
+
+
+def cluster_cell(field, size):
+    return Cast(Floor(F(field) / Value(size)), BigIntegerField())
+
+
+def visible_nodes(notes, bbox):
+    """
+    Return the nodes inside the viewport, or None when there are more than
+    MAX_NODES of them; positions are rounded as in the full mind map
+    """
+    nodes = list(
+        notes.filter(bbox_filter(bbox)).order_by('id')
+        .values('id', 'title', 'has_checkboxes', 'all_checked', x=F('layout_x'), y=F('layout_y'))[:MAX_NODES + 1]
+    )
+    if len(nodes) > MAX_NODES:
+        return None
+    for node in nodes:
+        node['x'], node['y'] = round(node['x'], 1), round(node['y'], 1)
+    return nodes
+
+
+def visible_edges(connections, nodes):
+    """
+    Return the connections touching the given nodes, with the position of
+    both ends so edges leaving the viewport can be drawn
+    """
+    note_ids = [node['id'] for node in nodes]
+    fields = dict(
+        source_x=F('source__layout_x'), source_y=F('source__layout_y'),
+        target_x=F('target__layout_x'), target_y=F('target__layout_y'),
+    )
+    edges = {}
+    for lookup in ['source__in', 'target__in']:
+        for edge in connections.filter(**{lookup: note_ids}).values('id', 'source', 'target', 'label', **fields):
+            for field in fields:
+                edge[field] = round(edge[field], 1)
+            edges[edge['id']] = edge
+    return sorted(edges.values(), key=lambda edge: edge['id'])
+
+
+def clusters(notes, connections, bbox, zoom):
+    """
+    Return the notes of the viewport grouped in clusters, and the number
+    of connections between each pair of clusters
+    """
+    size = cluster_size(bbox, zoom)
+    groups = (
+        notes.filter(bbox_filter(bbox))
+        .annotate(column=cluster_cell('layout_x', size), row=cluster_cell('layout_y', size))
+        .values('column', 'row')
+        .annotate(count=Count('id'), x=Avg('layout_x'), y=Avg('layout_y'))
+        .order_by('column', 'row')
+    )
+    links = (
+        connections.filter(bbox_filter(bbox, 'source__'), bbox_filter(bbox, 'target__'))
+        .annotate(
+            source_column=cluster_cell('source__layout_x', size), source_row=cluster_cell('source__layout_y', size),
+            target_column=cluster_cell('target__layout_x', size), target_row=cluster_cell('target__layout_y', size),
+        )
+        .values('source_column', 'source_row', 'target_column', 'target_row')
+        .annotate(count=Count('id'))
+        .order_by('source_column', 'source_row', 'target_column', 'target_row')
+    )
+    return [
+        {
+            'id': f"{group['column']}:{group['row']}", 'count': group['count'],
+            'x': round(group['x'], 1), 'y': round(group['y'], 1),
+        }
+        for group in groups
+    ], [
+        {
+            'source': f"{link['source_column']}:{link['source_row']}",
+            'target': f"{link['target_column']}:{link['target_row']}",
+            'count': link['count'],
+        }
+        for link in links
+        if (link['source_column'], link['source_row']) != (link['target_column'], link['target_row'])
+    ]
+
+
+def viewport(notes, connections, bbox, zoom):
+    """
+    Return the mind map payload for a viewport: the nodes and their edges
+    when zoomed in, or clusters when zoomed out or crowded
+    """
+    payload = {'bbox': list(bbox), 'zoom': zoom}
+    nodes = visible_nodes(notes, bbox) if zoom >= DETAIL_ZOOM else None
+    if nodes is not None:
+        payload.update(mode='nodes', nodes=nodes, edges=visible_edges(connections, nodes))
+    else:
+        cluster_nodes, cluster_edges = clusters(notes, connections, bbox, zoom)
+        payload.update(mode='clusters', clusters=cluster_nodes, edges=cluster_edges)
+    return payload
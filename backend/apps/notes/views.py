@@ -1,30 +1,74 @@
-from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action
+import math
+from functools import partial
+from rest_framework import viewsets, permissions, status, serializers
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed, NotFound, PermissionDenied
 from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
-from django.db.models import Q
-from .models import Note, Checkbox, Connection
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection, transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db.models import Count, Prefetch, Q
+from django.utils import timezone
+from .models import Note, Checkbox, Connection, DeletedObject, SimilarityIndex
+from .cache import aget_cached_mindmap, get_cached_mindmap, get_mindmap_version, is_layout_current, mark_layout_current
+from .pagination import NoteCursorPagination
+from .graph import MAX_DEPTH, MAX_PATH_LENGTH, neighborhood, shortest_path, subgraph
+from .layout import update_layout
+from .ranking import reorder_ranks
+from .viewport import cell_key, viewport
+from .search import search_notes
+from .similarity import TermMatrix
+from .sync import parse_token, collect_changes, apply_changes
+from .backup import aexport_chunks, export_chunks, import_lines
+from .batch import QueryCounter, execute_batch
+from .tasks import update_similarity_index
+from .toggles import ToggleBufferMixin, buffer_toggle, flush_pending_toggles
 from apps.activities.models import Activity
+from ufranotes.asyncviews import AsyncReadMixin, gather_queries
+from ufranotes.conditional import ConditionalRequestMixin
+from ufranotes.events import event_stream, publish
+from ufranotes.response_cache import USER, ACTIVITIES, invalidate_user
+from ufranotes.values import ValuesListMixin
 from .serializers import (
     NoteSerializer, NoteDetailSerializer, CheckboxSerializer,
-    ConnectionSerializer, ActivitySerializer
+    ConnectionSerializer, ActivitySerializer, CompleteBulkSerializer, CheckboxReorderSerializer,
+    BatchSerializer, SyncPushSerializer
 )
 
 User = get_user_model()
 
 
-class NoteViewSet(viewsets.ModelViewSet):
+class NoteViewSet(ToggleBufferMixin, ConditionalRequestMixin, ValuesListMixin, AsyncReadMixin, viewsets.ModelViewSet):
     """
     ViewSet for Note model
     """
     serializer_class = NoteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NoteCursorPagination
+    cache_scopes = [USER, ACTIVITIES]
+    async_actions = ['list', 'retrieve', 'mindmap']
     
     def get_queryset(self):
         """
-        Return notes for the current user
+        Return notes for the current user, with the relations needed by
+        the serializer of the current action prefetched; the list reads
+        only the requested columns through ValuesListMixin
         """
-        return Note.objects.filter(user=self.request.user)
+        queryset = Note.objects.filter(user=self.request.user)
+        
+        if self.action in ['retrieve', 'update', 'partial_update']:
+            connections = Connection.objects.select_related('source', 'target')
+            queryset = queryset.prefetch_related(
+                'checkboxes',
+                'activities',
+                Prefetch('outgoing_connections', queryset=connections),
+                Prefetch('incoming_connections', queryset=connections),
+            )
+        
+        return queryset
     
     def get_serializer_class(self):
         """
@@ -34,6 +78,42 @@ class NoteViewSet(viewsets.ModelViewSet):
             return NoteDetailSerializer
         return NoteSerializer
     
+    def get_version_sources(self):
+        """
+        Return the rows the list or the detail of notes is built from: the
+        notes, their checkboxes, connections and the titles of connected
+        notes, the activities, and the tombstones of what was deleted
+        """
+        user = self.request.user
+        activities = (Activity.objects.all(), 'updated_at')
+        if not self.detail:
+            return [
+                (Note.objects.filter(user=user), 'updated_at'),
+                (Checkbox.objects.filter(note__user=user), 'updated_at'),
+                (DeletedObject.objects.filter(user=user, model_name__in=['note', 'checkbox']), 'deleted_at'),
+                activities,
+            ]
+        
+        pk = self.kwargs['pk']
+        connections = Connection.objects.filter(Q(source=pk) | Q(target=pk), user=user)
+        connected = Q(pk__in=connections.values('source')) | Q(pk__in=connections.values('target'))
+        return [
+            (Note.objects.filter(user=user, pk=pk), 'updated_at'),
+            (Checkbox.objects.filter(note__user=user, note=pk), 'updated_at'),
+            (connections, 'updated_at'),
+            (Note.objects.filter(connected, user=user), 'updated_at'),
+            (DeletedObject.objects.filter(user=user, model_name__in=['checkbox', 'connection']), 'deleted_at'),
+            activities,
+        ]
+    
+    def perform_update(self, serializer):
+        """
+        Reload the updated note through get_queryset so the response is
+        serialized from fresh prefetches instead of per-row lookups
+        """
+        note = serializer.save()
+        serializer.instance = self.get_queryset().get(pk=note.pk)
+    
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
         """
@@ -42,67 +122,324 @@ class NoteViewSet(viewsets.ModelViewSet):
         note = self.get_object()
         user = request.user
         
-        # Only award XP if not already completed
-        if not note.all_checked:
-            # Add XP to user
-            user.add_xp(note.xp_value)
-            
-            # Update user stats based on activities
-            for activity in note.activities.all():
-                if activity.activity_type == 'health':
-                    user.health += 1
-                elif activity.activity_type == 'intelligence':
-                    user.intelligence += 1
-                elif activity.activity_type == 'strength':
-                    user.strength += 1
-                elif activity.activity_type == 'agility':
-                    user.agility += 1
-            
-            user.save()
-            
-            # Mark note as completed by setting all checkboxes to checked
-            if note.has_checkboxes:
-                for checkbox in note.checkboxes.all():
-                    checkbox.is_checked = True
-                    checkbox.save()
-                note.all_checked = True
-                note.save()
-            
-            return Response({'status': 'success', 'xp_gained': note.xp_value})
+        with transaction.atomic():
+            # Only award XP if not already completed, checked under a lock so
+            # parallel completions of the note award it once
+            if Note.objects.select_for_update().filter(pk=note.pk, all_checked=False).exists():
+                # Add XP and update user stats based on activities, atomically
+                stats = dict(
+                    note.activities.filter(activity_type__in=User.STAT_FIELDS)
+                    .values_list('activity_type')
+                    .annotate(count=Count('id'))
+                )
+                user.add_xp(note.xp_value, stats)
+                
+                # Mark note as completed by setting all checkboxes to checked;
+                # notes without checkboxes are marked too, so they aren't
+                # completed again
+                note.check_all()
+                
+                return Response({'status': 'success', 'xp_gained': note.xp_value})
         
         return Response({'status': 'already completed'})
     
+    @action(detail=False, methods=['post'])
+    def complete_bulk(self, request):
+        """
+        Mark several notes as completed at once, awarding the XP and stats
+        of all of them in a single update, and return per-note outcomes
+        """
+        serializer = CompleteBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        user = request.user
+        
+        with transaction.atomic():
+            notes = {
+                note.id: note for note in
+                self.get_queryset().filter(pk__in=ids).select_for_update()
+                .only('id', 'all_checked', 'has_checkboxes', 'xp_value')
+            }
+            completed = [note for note in notes.values() if not note.all_checked]
+            completed_ids = {note.id for note in completed}
+            xp_gained = sum(note.xp_value for note in completed)
+            
+            if completed:
+                stats = dict(
+                    Note.activities.through.objects
+                    .filter(note_id__in=completed_ids, activity__activity_type__in=User.STAT_FIELDS)
+                    .values_list('activity__activity_type')
+                    .annotate(count=Count('id'))
+                )
+                user.add_xp(xp_gained, stats)
+                Note.check_all_many([note.id for note in completed])
+        
+        results = []
+        for note_id in ids:
+            if note_id not in notes:
+                outcome = 'not found'
+            elif note_id in completed_ids:
+                outcome = 'success'
+            else:
+                outcome = 'already completed'
+            results.append({'id': note_id, 'status': outcome})
+        
+        return Response({'status': 'success', 'xp_gained': xp_gained, 'results': results})
+    
     @action(detail=False, methods=['get'])
     def mindmap(self, request):
         """
-        Return data for the mind map visualization
+        Return data for the mind map visualization; with `bbox=x0,y0,x1,y1`
+        (and optionally `zoom`) only the part inside the viewport is returned
+        """
+        build = partial(self.build_mindmap, request.user)
+        if 'bbox' not in request.query_params:
+            return Response(get_cached_mindmap(request.user.id, build))
+        return Response(self.mindmap_viewport(request.user, build))
+    
+    async def amindmap(self, request):
+        """
+        mindmap() of the async read path, loading the notes and connections
+        together
+        """
+        user = request.user
+        
+        async def build():
+            notes, connections = self.get_mindmap_querysets(user)
+            nodes, edges = await gather_queries(partial(list, notes), partial(list, connections))
+            return await sync_to_async(self.lay_out_mindmap)(nodes, edges)
+        
+        if 'bbox' not in request.query_params:
+            return Response(await aget_cached_mindmap(user.id, build))
+        return Response(await sync_to_async(self.mindmap_viewport)(user, partial(self.build_mindmap, user)))
+    
+    def build_mindmap(self, user):
+        notes, connections = self.get_mindmap_querysets(user)
+        return self.lay_out_mindmap(list(notes), list(connections))
+    
+    def get_mindmap_querysets(self, user):
+        """
+        Return the .values() querysets of the mind map nodes and edges
         """
-        notes = self.get_queryset()
-        connections = Connection.objects.filter(
-            Q(source__in=notes) | Q(target__in=notes)
+        notes = Note.objects.filter(user=user).order_by('id').values(
+            'id', 'title', 'has_checkboxes', 'all_checked', 'layout_x', 'layout_y', 'layout_stale'
         )
+        connections = Connection.objects.filter(user=user).values('id', 'source', 'target', 'label')
+        return notes, connections
+    
+    def lay_out_mindmap(self, nodes, edges):
+        """
+        Return the mind map payload, after storing the node positions the
+        layout changed
+        """
+        changed = update_layout(nodes, edges)
+        if changed:
+            Note.objects.bulk_update(
+                [
+                    Note(id=note_id, layout_x=x, layout_y=y, layout_cell=cell_key(x, y), layout_stale=False)
+                    for note_id, x, y in changed
+                ],
+                ['layout_x', 'layout_y', 'layout_cell', 'layout_stale'],
+                batch_size=500,
+            )
+        for node in nodes:
+            del node['layout_x'], node['layout_y'], node['layout_stale']
+        return {'nodes': nodes, 'edges': edges}
+    
+    def mindmap_viewport(self, user, build):
+        """
+        Return the part of the mind map inside the requested viewport
+        """
+        bbox = self.get_bbox_param()
+        zoom = self.get_float_param('zoom', 1.0)
+        if zoom <= 0:
+            raise serializers.ValidationError({'zoom': 'Zoom must be positive.'})
+        
+        # positions are only stored once the whole graph has been laid out
+        version = get_mindmap_version(user.id)
+        if not is_layout_current(user.id, version):
+            get_cached_mindmap(user.id, build)
+            mark_layout_current(user.id, version)
+        
+        notes = Note.objects.filter(user=user)
+        connections = Connection.objects.filter(user=user)
+        return viewport(notes, connections, bbox, zoom)
+    
+    @action(detail=True, methods=['get'])
+    def neighborhood(self, request, pk=None):
+        """
+        Return the part of the mind map within `depth` connections of a note
+        """
+        note = self.get_object()
+        depth = self.get_int_param('depth', 1)
+        if not 0 <= depth <= MAX_DEPTH:
+            raise serializers.ValidationError({'depth': f'Depth must be between 0 and {MAX_DEPTH}.'})
+        
+        distances = neighborhood(request.user, note.id, depth)
+        nodes, edges = subgraph(request.user, distances)
+        for node in nodes:
+            node['depth'] = distances[node['id']]
+        return Response({'root': note.id, 'depth': depth, 'nodes': nodes, 'edges': edges})
+    
+    @action(detail=True, methods=['get'])
+    def suggested_connections(self, request, pk=None):
+        """
+        Return the user's notes most similar in content to this one that it
+        is not connected to yet
+        """
+        note = self.get_object()
+        limit = self.get_int_param('limit', 10)
+        if limit < 1:
+            raise serializers.ValidationError({'limit': 'Limit must be at least 1.'})
+        limit = min(limit, 50)
+        
+        index = SimilarityIndex.objects.filter(user=request.user).first()
+        if index is None:
+            update_similarity_index(request.user.id)
+            index = SimilarityIndex.objects.get(user=request.user)
+        
+        connected = set()
+        for source, target in Connection.objects.filter(
+            Q(user=request.user, source=note) | Q(user=request.user, target=note)
+        ).values_list('source', 'target'):
+            connected.update([source, target])
+        
+        scores = dict(TermMatrix.load(index.data).similar(note.id, limit, exclude=connected))
+        titles = dict(Note.objects.filter(user=request.user, id__in=scores).values_list('id', 'title'))
+        return Response([
+            {'id': note_id, 'title': titles[note_id], 'score': round(score, 4)}
+            for note_id, score in scores.items() if note_id in titles
+        ])
+    
+    @action(detail=False, methods=['get'])
+    def path(self, request):
+        """
+        Return a shortest chain of connections between two notes
+        """
+        start = self.get_int_param('from')
+        end = self.get_int_param('to')
+        if self.get_queryset().filter(id__in=[start, end]).count() != len({start, end}):
+            raise NotFound('Note not found.')
+        
+        path = shortest_path(request.user, start, end, MAX_PATH_LENGTH)
+        if path is None:
+            return Response({'from': start, 'to': end, 'length': None, 'nodes': [], 'edges': []})
+        
+        nodes, edges = subgraph(request.user, path)
+        position = {note_id: index for index, note_id in enumerate(path)}
+        nodes.sort(key=lambda node: position[node['id']])
+        edges = [edge for edge in edges if abs(position[edge['source']] - position[edge['target']]) == 1]
+        return Response({'from': start, 'to': end, 'length': len(path) - 1, 'nodes': nodes, 'edges': edges})
+    
+    def get_int_param(self, name, default=None):
+        """
+        Read an integer query parameter, required when there is no default
+        """
+        value = self.request.query_params.get(name, default)
+        if value is None:
+            raise serializers.ValidationError({name: 'This parameter is required.'})
+        try:
+            return int(value)
+        except ValueError:
+            raise serializers.ValidationError({name: 'A valid integer is required.'})
+    
+    def get_float_param(self, name, default):
+        """
+        Read a finite number from the query parameters
+        """
+        try:
+            value = float(self.request.query_params.get(name, default))
+        except ValueError:
+            value = math.nan
+        if not math.isfinite(value):
+            raise serializers.ValidationError({name: 'A valid number is required.'})
+        return value
+    
+    def get_bbox_param(self):
+        """
+        Read the `bbox=x0,y0,x1,y1` viewport of the mind map
+        """
+        try:
+            bbox = [float(value) for value in self.request.query_params['bbox'].split(',')]
+        except ValueError:
+            bbox = []
+        if len(bbox) != 4 or not all(map(math.isfinite, bbox)) or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+            raise serializers.ValidationError({'bbox': 'Expected x0,y0,x1,y1 with x0 <= x1 and y0 <= y1.'})
+        return bbox
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Full-text search over the current user's notes, ranked by relevance
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise serializers.ValidationError({'q': 'A search query is required.'})
+        limit = self.get_int_param('limit', 20)
+        if limit < 1:
+            raise serializers.ValidationError({'limit': 'Limit must be at least 1.'})
+        limit = min(limit, 100)
+        
+        results = search_notes(self.get_queryset(), request.user, query, limit)
+        return Response({'query': query, 'results': results})
+    
+    @action(detail=False, methods=['get', 'post'])
+    def sync(self, request):
+        """
+        Return the notes, checkboxes and connections changed since the
+        `since` sync token, after applying the client changes sent by POST
+        """
+        since = parse_token(request.query_params.get('since'))
         
-        note_serializer = NoteSerializer(notes, many=True)
-        connection_serializer = ConnectionSerializer(connections, many=True)
+        if request.method == 'GET':
+            return Response(collect_changes(request, since))
         
-        return Response({
-            'notes': note_serializer.data,
-            'connections': connection_serializer.data
-        })
+        serializer = SyncPushSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        created = apply_changes(request, serializer.validated_data)
+        changes = collect_changes(request, since)
+        changes['created'] = created
+        return Response(changes)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream the user's notes, checkboxes, activity links and connections
+        as NDJSON, one object per line
+        """
+        if isinstance(request._request, ASGIRequest):
+            chunks = aexport_chunks(request.user)
+        else:
+            chunks = export_chunks(request.user)
+        response = StreamingHttpResponse(chunks, content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="ufranotes.ndjson"'
+        return response
+    
+    @action(detail=False, methods=['post'], url_path='import', url_name='import')
+    def import_notes(self, request):
+        """
+        Create the notes of an NDJSON export in the user's account, reading
+        the request body one line at a time
+        """
+        stream = request.stream
+        counts = import_lines(request, iter(stream.readline, b'') if stream is not None else [])
+        return Response(counts, status=status.HTTP_201_CREATED)
 
 
-class CheckboxViewSet(viewsets.ModelViewSet):
+class CheckboxViewSet(ToggleBufferMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Checkbox model
     """
     serializer_class = CheckboxSerializer
     permission_classes = [permissions.IsAuthenticated]
+    buffer_toggles = True
     
     def get_queryset(self):
         """
-        Return checkboxes for the current user's notes
+        Return checkboxes for the current user's notes, with the note the
+        signals need
         """
-        return Checkbox.objects.filter(note__user=self.request.user)
+        return Checkbox.objects.filter(note__user=self.request.user).select_related('note')
     
     def perform_create(self, serializer):
         """
@@ -114,50 +451,179 @@ class CheckboxViewSet(viewsets.ModelViewSet):
             if note:
                 serializer.save(note=note)
             else:
-                raise permissions.PermissionDenied("This note doesn't belong to you.")
+                raise PermissionDenied("This note doesn't belong to you.")
         else:
             raise serializers.ValidationError("Note ID is required.")
+    
+    def partial_update(self, request, *args, **kwargs):
+        """
+        Buffer the toggle instead of saving it when write-behind is enabled
+        """
+        if not self.is_buffered_toggle(request):
+            return super().partial_update(request, *args, **kwargs)
+        
+        checkbox = self.get_object()
+        serializer = self.get_serializer(checkbox, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        checkbox.is_checked = serializer.validated_data['is_checked']
+        buffer_toggle(request.user.pk, checkbox.note_id, checkbox.pk, checkbox.is_checked)
+        return Response(self.get_serializer(checkbox).data)
+    
+    @action(detail=False, methods=['post'])
+    def reorder(self, request):
+        """
+        Put the checkboxes of a note in the given order, changing the rank of
+        as few checkboxes as possible with one bulk update
+        """
+        serializer = CheckboxReorderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        note = Note.objects.filter(id=serializer.validated_data['note'], user=request.user).first()
+        if note is None:
+            raise PermissionDenied("This note doesn't belong to you.")
+        
+        with transaction.atomic():
+            # Locked, so concurrent reorders of the note apply one after the other
+            checkboxes = Checkbox.objects.filter(note=note).select_for_update().in_bulk()
+            ids = serializer.validated_data['checkboxes']
+            if set(ids) != set(checkboxes):
+                raise serializers.ValidationError({'checkboxes': 'All the checkboxes of the note must be listed.'})
+            
+            ordered = [checkboxes[checkbox_id] for checkbox_id in ids]
+            changes = reorder_ranks([checkbox.rank for checkbox in ordered])
+            now = timezone.now()
+            for position, rank in changes.items():
+                ordered[position].rank = rank
+                ordered[position].updated_at = now
+            if changes:
+                Checkbox.objects.bulk_update([ordered[position] for position in changes], ['rank', 'updated_at'])
+                invalidate_user(request.user.pk)
+                publish(request.user.pk, 'sync', 'changed', {})
+        return Response(self.get_serializer(ordered, many=True).data)
 
 
-class ConnectionViewSet(viewsets.ModelViewSet):
+class ConnectionViewSet(ConditionalRequestMixin, ValuesListMixin, AsyncReadMixin, viewsets.ModelViewSet):
     """
     ViewSet for Connection model
     """
     serializer_class = ConnectionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_scopes = [USER]
+    async_actions = ['list']
     
     def get_queryset(self):
         """
         Return connections for the current user's notes
         """
-        user_notes = Note.objects.filter(user=self.request.user)
-        return Connection.objects.filter(
-            Q(source__in=user_notes) | Q(target__in=user_notes)
-        )
+        return Connection.objects.filter(user=self.request.user).select_related('source', 'target')
+    
+    def get_version_sources(self):
+        """
+        Return the connections, the notes whose titles they show and the
+        tombstones of deleted connections and notes
+        """
+        connections = super().get_version_sources()
+        queryset, _ = connections[0]
+        notes = Note.objects.filter(user=self.request.user)
+        if self.detail:
+            notes = notes.filter(Q(pk__in=queryset.values('source')) | Q(pk__in=queryset.values('target')))
+        deleted = DeletedObject.objects.filter(user=self.request.user, model_name__in=['note', 'connection'])
+        return connections + [(notes, 'updated_at'), (deleted, 'deleted_at')]
+    
+    def check_notes_belong_to_user(self, serializer):
+        """
+        Ensure the connected notes belong to the current user; the serializer
+        has already loaded both notes, so this needs no further query
+        """
+        instance = serializer.instance
+        source = serializer.validated_data.get('source', getattr(instance, 'source', None))
+        target = serializer.validated_data.get('target', getattr(instance, 'target', None))
+        if source.user_id != self.request.user.id or target.user_id != self.request.user.id:
+            raise PermissionDenied("Both notes must belong to you.")
     
     def perform_create(self, serializer):
         """
         Ensure both notes belong to the current user
         """
-        source_id = self.request.data.get('source')
-        target_id = self.request.data.get('target')
-        
-        if source_id and target_id:
-            source = Note.objects.filter(id=source_id, user=self.request.user).first()
-            target = Note.objects.filter(id=target_id, user=self.request.user).first()
-            
-            if source and target:
-                serializer.save()
-            else:
-                raise permissions.PermissionDenied("Both notes must belong to you.")
-        else:
-            raise serializers.ValidationError("Source and target note IDs are required.")
+        self.check_notes_belong_to_user(serializer)
+        serializer.save(user=self.request.user)
+    
+    def perform_update(self, serializer):
+        """
+        Ensure a connection can't be moved to another user's notes
+        """
+        self.check_notes_belong_to_user(serializer)
+        serializer.save()
 
 
-class ActivityViewSet(viewsets.ModelViewSet):
+class ActivityViewSet(ConditionalRequestMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Activity model
     """
     queryset = Activity.objects.all()
     serializer_class = ActivitySerializer
-    permission_classes = [permissions.IsAuthenticated] 
\ No newline at end of file
+    permission_classes = [permissions.IsAuthenticated]
+    cache_scopes = [ACTIVITIES] 
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def batch(request):
+    """
+    Run a list of create, update and delete operations on notes,
+    checkboxes and connections in one transaction, returning the status of
+    each operation and the number of queries the batch took
+    """
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    flush_pending_toggles(request.user.pk)
+    
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        succeeded, results = execute_batch(request, serializer.validated_data['operations'])
+    return Response(
+        {'results': results, 'queries': queries.count},
+        status=status.HTTP_200_OK if succeeded else status.HTTP_400_BAD_REQUEST,
+    )
+
+
+def authenticate_stream(request):
+    """
+    Return the user of the access token sent in the Authorization header or,
+    since EventSource can't set headers, in the `token` query parameter
+    """
+    authentication = JWTAuthentication()
+    try:
+        if 'token' in request.GET:
+            return authentication.get_user(authentication.get_validated_token(request.GET['token']))
+        result = authentication.authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+async def note_events(request):
+    """
+    Server-Sent Events stream of the changes to the current user's notes,
+    checkboxes, connections and progress, resuming after the event in
+    `Last-Event-ID` (or `?last_event_id=`) when given
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    user = await sync_to_async(authenticate_stream)(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED,
+        )
+    
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    if last_id is not None:
+        try:
+            last_id = int(last_id)
+        except ValueError:
+            return JsonResponse({'last_event_id': 'Invalid event id.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    response = StreamingHttpResponse(event_stream(user.pk, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.8 on 2026-10-18 10:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='atualizado em'),
+            preserve_default=False,
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from ufranotes.events import publish
+from ufranotes.response_cache import invalidate_user
 
 
 class User(AbstractUser):
@@ -18,9 +22,14 @@ class User(AbstractUser):
     strength = models.PositiveIntegerField(_('força'), default=1)
     agility = models.PositiveIntegerField(_('agilidade'), default=1)
     
+    updated_at = models.DateTimeField(_('atualizado em'), auto_now=True)
+    
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
     
+    MAX_LEVEL = 20
+    STAT_FIELDS = ['health', 'intelligence', 'strength', 'agility']
+    
     class Meta:
         verbose_name = _('usuário')
         verbose_name_plural = _('usuários')
@@ -28,17 +37,45 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
     
-    def add_xp(self, amount):
-        """Add experience points to user and level up if needed"""
-        self.xp += amount
+    @staticmethod
+    def compute_level(level, xp):
+        """
+        Return the (level, xp) pair after applying every level up earned
+        Formula: level * 100 XP needed for next level (simple RPG progression)
+        """
+        while xp >= level * 100 and level < User.MAX_LEVEL:
+            xp -= level * 100
+            level += 1
+        return level, xp
+    
+    def add_xp(self, amount, stats=None):
+        """
+        Add experience points and attribute increments to user and level up
+        if needed. The increments are applied with a single atomic UPDATE so
+        concurrent awards are never lost; level ups are then applied with a
+        compare-and-swap on (level, xp), retried if another award won the race.
+        """
+        stats = {field: value for field, value in (stats or {}).items() if value}
+        users = User.objects.filter(pk=self.pk)
+        users.update(
+            xp=F('xp') + amount, updated_at=timezone.now(),
+            **{field: F(field) + value for field, value in stats.items()}
+        )
         
-        # Check if user should level up
-        # Formula: level * 100 XP needed for next level (simple RPG progression)
-        xp_needed = self.level * 100
+        while True:
+            current = users.values('level', 'xp', *stats).get()
+            level, xp = self.compute_level(current['level'], current['xp'])
+            if (level, xp) == (current['level'], current['xp']):
+                break
+            leveled_up = users.filter(level=current['level'], xp=current['xp']).update(
+                level=level, xp=xp, updated_at=timezone.now()
+            )
+            if leveled_up:
+                # Possible hook for special actions when user levels up
+                current.update(level=level, xp=xp)
+                break
         
-        if self.xp >= xp_needed and self.level < 20:  # Max level: 20
-            self.level += 1
-            self.xp -= xp_needed
-            # Possible hook for special actions when user levels up
-            
-        self.save() 
\ No newline at end of file
+        for field, value in current.items():
+            setattr(self, field, value)
+        invalidate_user(self.pk)
+        publish(self.pk, 'user', 'updated', {'level': self.level, 'xp': self.xp})
@@ -1,6 +1,8 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from ufranotes.events import publish
+from ufranotes.response_cache import invalidate_user
 
 User = get_user_model()
 
@@ -11,4 +13,21 @@ def create_user_profile(sender, instance, created, **kwargs):
     """
     if created:
         # Initialize user with default values or perform other actions
-        pass 
\ No newline at end of file
+        pass
+
+
+@receiver(post_save, sender=User)
+def invalidate_responses_for_user(sender, instance, **kwargs):
+    """
+    Signal to invalidate the cached responses of a user whose profile changed
+    """
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def publish_user_progress(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Signal to push a user's level and XP to their live streams
+    """
+    if not created and (update_fields is None or {'level', 'xp'} & set(update_fields)):
+        publish(instance.pk, 'user', 'updated', {'level': instance.level, 'xp': instance.xp})
@@ -1,8 +1,14 @@
-from django.test import TestCase
+import threading
+from unittest import skipIf
+import orjson
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from .views import UserViewSet
 
 User = get_user_model()
 
@@ -41,6 +47,72 @@ class UserModelTest(TestCase):
         # Test level up (level * 100 XP needed)
         user.add_xp(100)
         self.assertEqual(user.level, initial_level + 1)
+    
+    def test_add_xp_multiple_levels(self):
+        """Test a large XP award levels up several times"""
+        user = User.objects.create_user(**self.user_data)
+        
+        user.add_xp(350)
+        user.refresh_from_db()
+        self.assertEqual(user.level, 3)
+        self.assertEqual(user.xp, 50)
+    
+    def test_add_xp_with_stats(self):
+        """Test XP and attribute increments are stored together"""
+        user = User.objects.create_user(**self.user_data)
+        
+        user.add_xp(10, {'health': 2, 'agility': 1})
+        self.assertEqual((user.xp, user.health, user.agility), (10, 3, 2))
+        user.refresh_from_db()
+        self.assertEqual((user.xp, user.health, user.agility, user.strength), (10, 3, 2, 1))
+    
+    def test_add_xp_from_stale_instances(self):
+        """Test awards made through outdated copies of the user are not lost"""
+        user = User.objects.create_user(**self.user_data)
+        first_tab = User.objects.get(pk=user.pk)
+        second_tab = User.objects.get(pk=user.pk)
+        
+        first_tab.add_xp(60, {'intelligence': 1})
+        second_tab.add_xp(60, {'intelligence': 1})
+        user.refresh_from_db()
+        self.assertEqual((user.level, user.xp, user.intelligence), (2, 20, 3))
+
+
+@skipIf(connection.vendor == 'sqlite', 'SQLite locks the whole table on concurrent writes')
+class UserConcurrentXPTest(TransactionTestCase):
+    """Test cases for XP awarded from parallel requests"""
+    
+    def test_parallel_add_xp(self):
+        """Test no XP is lost when awards run in parallel"""
+        user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        awards = 20
+        barrier = threading.Barrier(awards)
+        errors = []
+        
+        def award():
+            try:
+                tab = User.objects.get(pk=user.pk)
+                barrier.wait()
+                tab.add_xp(10, {'strength': 1})
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=award) for _ in range(awards)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        user.refresh_from_db()
+        # 200 XP: 100 spent on reaching level 2, 100 left towards level 3
+        self.assertEqual((user.level, user.xp, user.strength), (2, 100, 1 + awards))
 
 
 class UserAPITest(APITestCase):
@@ -74,3 +146,55 @@ class UserAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.user.refresh_from_db()
         self.assertEqual(self.user.first_name, 'Updated Name')
+    
+    def test_profile_not_modified(self):
+        """Test the profile is answered with 304 while unchanged"""
+        self.client.force_authenticate(user=self.user)
+        url = reverse('user-me')
+        etag = self.client.get(url)['ETag']
+        
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        self.user.add_xp(10)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['xp'], 10)
+    
+    def test_profile_update_if_match(self):
+        """Test a profile update with a stale If-Match is refused"""
+        self.client.force_authenticate(user=self.user)
+        url = reverse('user-me')
+        etag = self.client.get(url)['ETag']
+        response = self.client.patch(url, {'first_name': 'First'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        response = self.client.patch(url, {'first_name': 'Second'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'First')
+
+
+@override_settings(ASYNC_READS=True)
+class AsyncProfileTest(TestCase):
+    """Test cases for the async read of the profile"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.view = UserViewSet.as_view({'get': 'me', 'put': 'me', 'patch': 'me'}, detail=False)
+    
+    async def test_async_profile(self):
+        """Test the profile is read by the async view and updated by the sync one"""
+        factory = AsyncRequestFactory()
+        response = (await self.view(factory.get('/api/users/me/', headers=self.headers))).render()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', response)
+        self.assertEqual(orjson.loads(response.content)['username'], 'testuser')
+        
+        request = factory.patch(
+            '/api/users/me/', {'first_name': 'Async'}, content_type='application/json', headers=self.headers
+        )
+        response = await self.view(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((await User.objects.aget(pk=self.user.pk)).first_name, 'Async')
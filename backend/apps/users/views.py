@@ -2,17 +2,21 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
+from ufranotes.asyncviews import AsyncReadMixin
+from ufranotes.conditional import ConditionalRequestMixin
+from ufranotes.response_cache import USER
 from .serializers import UserSerializer, UserProfileSerializer
 
 User = get_user_model()
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ConditionalRequestMixin, AsyncReadMixin, viewsets.ModelViewSet):
     """
     ViewSet for User model
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    async_actions = ['me']
     
     def get_queryset(self):
         """
@@ -30,19 +34,45 @@ class UserViewSet(viewsets.ModelViewSet):
             return UserProfileSerializer
         return UserSerializer
     
+    def get_cache_scopes(self):
+        """
+        Cache the profile only: the user list depends on other users' data
+        """
+        return [USER] if self.action == 'me' else None
+    
+    def get_version_sources(self):
+        """
+        Return the current user for the profile, the users otherwise
+        """
+        if self.action == 'me':
+            return [(User.objects.filter(pk=self.request.user.pk), 'updated_at')]
+        return super().get_version_sources()
+    
     @action(detail=False, methods=['get', 'put', 'patch'])
     def me(self, request):
         """
         Endpoint for the current user's profile
         """
-        user = request.user
-        
         if request.method == 'GET':
-            serializer = self.get_serializer(user)
-            return Response(serializer.data)
-        
-        serializer = self.get_serializer(user, data=request.data, partial=True)
+            return self.conditional_read(self.retrieve_profile, request)
+        return self.conditional_write(self.update_profile, request)
+    
+    async def ame(self, request):
+        """
+        Current user's profile, for the async read path
+        """
+        return await self.aconditional_read(self.aretrieve_profile, request)
+    
+    def retrieve_profile(self, request):
+        serializer = self.get_serializer(request.user)
+        return Response(serializer.data)
+    
+    async def aretrieve_profile(self, request):
+        return self.retrieve_profile(request)
+    
+    def update_profile(self, request):
+        serializer = self.get_serializer(request.user, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST) 
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
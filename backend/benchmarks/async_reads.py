@@ -0,0 +1,187 @@
+"""
+Load benchmark of the read endpoints under concurrent requests, with every
+query delayed to simulate a slow database: the WSGI handler served by a
+pool of threads, as by a threaded WSGI server, against the ASGI handler
+with the sync views and with the async read path (ASYNC_READS).
+
+Requests go straight to the Django handlers, without a server or network,
+and cycle over the note list and detail, the mind map, the connection list
+and the profile, authenticated with a JWT.
+
+    python -m benchmarks.async_reads --requests 200 --concurrency 8 --threads 4 --latency 20
+"""
+
+import argparse
+import asyncio
+import importlib
+import io
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import test_database, create_user
+
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from django.urls import clear_url_caches, reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.activities.models import Activity
+from apps.notes.cache import bump_mindmap_version
+from apps.notes.models import Note, Checkbox, Connection
+
+
+def slow_queries(latency):
+    """Delay every query of every connection by `latency` seconds"""
+    def delay(execute, sql, params, many, context):
+        time.sleep(latency)
+        return execute(sql, params, many, context)
+
+    def install(connection, **kwargs):
+        connection.execute_wrappers.append(delay)
+
+    install(connection)
+    connection_created.connect(install, weak=False)
+
+
+def create_data(user, notes=200, connections=150):
+    activity = Activity.objects.create(name='Leitura', activity_type='intelligence')
+    created = Note.objects.bulk_create([
+        Note(title=f'Note {i}', content=f'Content of note {i}', user=user, has_checkboxes=True)
+        for i in range(notes)
+    ])
+    Checkbox.objects.bulk_create([
+        Checkbox(note=note, text=f'Item {j}', order=j, rank=str(j + 1)) for note in created for j in range(3)
+    ])
+    Note.activities.through.objects.bulk_create([
+        Note.activities.through(note=note, activity=activity) for note in created
+    ])
+    Connection.objects.bulk_create([
+        Connection(user=user, source=created[i], target=created[(i * 7 + 1) % notes]) for i in range(connections)
+    ])
+    return created
+
+
+def request_paths(notes, count):
+    """Return the paths of `count` reads, unique so the response cache, cleared before each run, always misses"""
+    paths = itertools.cycle([
+        reverse('note-list') + '?page_size=20&n={}',
+        reverse('note-detail', args=[notes[0].id]) + '?n={}',
+        reverse('note-mindmap') + '?n={}',
+        reverse('connection-list') + '?n={}',
+        reverse('user-me') + '?n={}',
+    ])
+    return [path.format(i) for i, path in zip(range(count), paths)]
+
+
+def split(path):
+    path, _, query = path.partition('?')
+    return path, query
+
+
+def reload_urls():
+    """Rebuild the URLconf, whose views depend on ASYNC_READS"""
+    for module in ['apps.notes.urls', 'apps.users.urls', 'ufranotes.urls']:
+        importlib.reload(importlib.import_module(module))
+    clear_url_caches()
+
+
+def run_wsgi(paths, user, token, threads):
+    application = get_wsgi_application()
+    cache.clear()
+
+    def get(path):
+        if 'mindmap' in path:
+            bump_mindmap_version(user.pk)
+        path, query = split(path)
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost', 'HTTP_AUTHORIZATION': f'Bearer {token}',
+            'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+        }
+        statuses = []
+        b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+        assert statuses[0].startswith('200'), (path, statuses)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(get, paths))
+    return time.perf_counter() - start
+
+
+def run_asgi(paths, user, token, concurrency):
+    application = get_asgi_application()
+    cache.clear()
+
+    async def get(path, slots):
+        async with slots:
+            if 'mindmap' in path:
+                bump_mindmap_version(user.pk)
+            path, query = split(path)
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'query_string': query.encode(), 'root_path': '',
+                'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+                'server': ('localhost', 80), 'client': ('127.0.0.1', 50000),
+            }
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            await application(scope, receive, send)
+            assert messages[0]['status'] == 200, (path, messages[0])
+
+    async def main():
+        slots = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*[get(path, slots) for path in paths])
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8, help='requests in flight at once')
+    parser.add_argument('--threads', type=int, default=4, help='threads of the smaller WSGI pool')
+    parser.add_argument('--latency', type=float, default=20, help='milliseconds added to every query')
+    args = parser.parse_args()
+
+    with test_database():
+        user = create_user('reads')
+        notes = create_data(user)
+        token = str(AccessToken.for_user(user))
+        paths = request_paths(notes, args.requests)
+        # Lay out the mind map before the delays start
+        run_wsgi(paths[:5], user, token, 1)
+        slow_queries(args.latency / 1000)
+
+        runs = [
+            (f'WSGI, {args.threads} threads', lambda: run_wsgi(paths, user, token, args.threads)),
+            (f'WSGI, {args.concurrency} threads', lambda: run_wsgi(paths, user, token, args.concurrency)),
+            (f'ASGI, sync views, {args.concurrency} in flight', lambda: run_asgi(paths, user, token, args.concurrency)),
+        ]
+        print(f'{args.requests} reads, {args.latency:g} ms per query')
+        for label, run in runs:
+            elapsed = run()
+            print(f'{label:<48} {elapsed * 1000:10.1f} ms {args.requests / elapsed:8.1f} req/s')
+
+        with override_settings(ASYNC_READS=True):
+            reload_urls()
+            elapsed = run_asgi(paths, user, token, args.concurrency)
+            label = f'ASGI, async reads, {args.concurrency} in flight'
+            print(f'{label:<48} {elapsed * 1000:10.1f} ms {args.requests / elapsed:8.1f} req/s')
+        reload_urls()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark of checkbox toggling and note completion for notes with 10, 100
+and 1000 checkboxes, comparing the incremental counters with the previous
+full rescan of the note's checkboxes on every save.
+"""
+
+from benchmarks.utils import test_database, measure, create_user
+
+from django.db import models
+from apps.notes.models import Note, Checkbox
+
+SIZES = [10, 100, 1000]
+
+
+def create_note(user, size):
+    note = Note.objects.create(title=f'Note {size}', content='Benchmark', user=user, has_checkboxes=True)
+    for i in range(size):
+        Checkbox.objects.create(note=note, text=f'Checkbox {i}', order=i)
+    return note
+
+
+def rescan_complete(note):
+    """Previous behavior: every checkbox save reloads all the note's checkboxes"""
+    for checkbox in note.checkboxes.all():
+        checkbox.is_checked = True
+        models.Model.save(checkbox)
+        all_checkboxes = note.checkboxes.all()
+        note.all_checked = all(item.is_checked for item in all_checkboxes)
+        note.save(update_fields=['all_checked'])
+
+
+def toggle_each(note):
+    for checkbox in note.checkboxes.all():
+        checkbox.is_checked = True
+        checkbox.save()
+
+
+def main():
+    with test_database():
+        user = create_user('benchmark')
+        for size in SIZES:
+            print(f'--- {size} checkboxes')
+            note = create_note(user, size)
+            with measure('full rescan per save (previous)'):
+                rescan_complete(note)
+            
+            note = create_note(user, size)
+            with measure('incremental counters, one save per checkbox'):
+                toggle_each(note)
+            
+            note = create_note(user, size)
+            with measure('Note.check_all (bulk path)'):
+                note.check_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark of checkbox toggles through the API, comparing the synchronous
+save of every PATCH with the write-behind buffer (CHECKBOX_WRITE_BEHIND),
+whose flush, normally run by the Celery worker, is timed on its own.
+
+    python -m benchmarks.checkbox_toggles --toggles 2000
+"""
+
+import argparse
+from unittest import mock
+
+from benchmarks.utils import test_database, measure, create_user
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.notes.models import Note, Checkbox
+from apps.notes.tasks import flush_checkbox_toggles
+
+
+def create_note(user, size=20):
+    note = Note.objects.create(title='Checklist', content='Benchmark', user=user, has_checkboxes=True)
+    return note, [Checkbox.objects.create(note=note, text=f'Item {i}', order=i) for i in range(size)]
+
+
+def toggle_all(client, checkboxes, count):
+    """Send `count` toggles spread over the checkboxes, ticking and unticking them in turn"""
+    urls = [reverse('checkbox-detail', args=[checkbox.id]) for checkbox in checkboxes]
+    for i in range(count):
+        response = client.patch(urls[i % len(urls)], {'is_checked': (i // len(urls)) % 2 == 0}, format='json')
+        assert response.status_code == 200, response.content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--toggles', type=int, default=2000)
+    args = parser.parse_args()
+
+    with test_database():
+        user = create_user('toggles')
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        note, checkboxes = create_note(user)
+        with measure(f'{args.toggles} toggles, save per PATCH') as synchronous:
+            toggle_all(client, checkboxes, args.toggles)
+        expected = list(Checkbox.objects.filter(note=note).values_list('is_checked', flat=True))
+
+        cache.clear()
+        note, checkboxes = create_note(user)
+        with override_settings(CHECKBOX_WRITE_BEHIND=True), \
+                mock.patch('apps.notes.tasks.flush_checkbox_toggles.apply_async'):
+            with measure(f'{args.toggles} toggles, write-behind buffer') as buffered:
+                toggle_all(client, checkboxes, args.toggles)
+            with measure('flush of the buffer (Celery task)') as flush:
+                flush_checkbox_toggles(user.pk)
+        assert list(Checkbox.objects.filter(note=note).values_list('is_checked', flat=True)) == expected
+
+        before = args.toggles / synchronous['elapsed']
+        after = args.toggles / (buffered['elapsed'] + flush['elapsed'])
+        print(f'{before:.0f} toggles/s before, {after:.0f} toggles/s after ({after / before:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark of listing one user's connections, comparing the previous OR
+over two note subqueries with the range scan of the (user, source) index.
+
+    python -m benchmarks.connection_listing --notes 200000
+"""
+
+import argparse
+from collections import defaultdict
+
+from benchmarks.utils import test_database, measure, create_users
+
+from django.db.models import Q
+from apps.notes.models import Note, Connection
+
+
+def create_graph(count, users, batch_size=10_000):
+    """Create notes and chain each user's notes with two connections per note"""
+    for start in range(0, count, batch_size):
+        Note.objects.bulk_create([
+            Note(title=f'Note {i}', content='Benchmark', user=users[i % len(users)])
+            for i in range(start, min(start + batch_size, count))
+        ])
+
+    notes_by_user = defaultdict(list)
+    for note_id, user_id in Note.objects.order_by('id').values_list('id', 'user_id').iterator():
+        notes_by_user[user_id].append(note_id)
+
+    batch = []
+    for user_id, note_ids in notes_by_user.items():
+        for i, source_id in enumerate(note_ids):
+            for target_id in note_ids[i + 1:i + 3]:
+                batch.append(Connection(user_id=user_id, source_id=source_id, target_id=target_id))
+        if len(batch) >= batch_size:
+            Connection.objects.bulk_create(batch)
+            batch = []
+    Connection.objects.bulk_create(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--notes', type=int, default=200_000)
+    parser.add_argument('--users', type=int, default=1000)
+    args = parser.parse_args()
+
+    with test_database():
+        users = create_users('user', args.users)
+        with measure(f'seed {args.notes} notes and connections', count_queries=False):
+            create_graph(args.notes, users)
+
+        user = users[0]
+        user_notes = Note.objects.filter(user=user)
+        previous = Connection.objects.filter(Q(source__in=user_notes) | Q(target__in=user_notes))
+        indexed = Connection.objects.filter(user=user)
+
+        for label, queryset in [('previous OR filter', previous), ('user index', indexed)]:
+            with measure(f'list connections ({label})'):
+                connections = list(queryset.values_list('id', flat=True))
+            print(f'    {len(connections)} connections, plan: {queryset.explain()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark of connection suggestions: building a user's term matrix from
+scratch, updating it after one note changes, and answering a query from
+the stored matrix.
+
+    python -m benchmarks.connection_suggestions --notes 10000
+"""
+
+import argparse
+import random
+
+from benchmarks.utils import test_database, measure, create_users
+from benchmarks.note_search import VOCABULARY
+
+from django.utils import timezone
+from apps.notes.models import Note, SimilarityIndex
+from apps.notes.similarity import TermMatrix
+from apps.notes.tasks import update_similarity_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--notes', type=int, default=10_000)
+    args = parser.parse_args()
+
+    with test_database():
+        user, = create_users('user', 1)
+        rng = random.Random(42)
+        Note.objects.bulk_create([
+            Note(
+                title=' '.join(rng.choices(VOCABULARY, k=3)),
+                content=' '.join(rng.choices(VOCABULARY, k=40)),
+                user=user,
+            )
+            for _ in range(args.notes)
+        ], batch_size=5000)
+
+        with measure(f'build term matrix ({args.notes} notes)'):
+            update_similarity_index(user.id)
+
+        # edit through update() so the signal doesn't run the task before it is measured
+        note = Note.objects.filter(user=user).first()
+        Note.objects.filter(pk=note.pk).update(content=' '.join(rng.choices(VOCABULARY, k=40)), updated_at=timezone.now())
+        with measure('update term matrix after one edit'):
+            updated = update_similarity_index(user.id)
+        print(f'    {updated} notes re-indexed')
+
+        with measure('load stored matrix'):
+            matrix = TermMatrix.load(SimilarityIndex.objects.get(user=user).data)
+        with measure('top 10 suggestions from the matrix'):
+            suggestions = matrix.similar(note.id, 10)
+        print(f'    best score {suggestions[0][1]:.3f}')
+
+
+if __name__ == '__main__':
+    main()
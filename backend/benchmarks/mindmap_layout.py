@@ -0,0 +1,51 @@
+"""
+Benchmark of the mind map layout versus node count: a full layout of a
+graph without positions, and the incremental relaxation after adding one
+connected note to an already laid out graph.
+
+    python -m benchmarks.mindmap_layout --sizes 100 500 1000 2000 5000
+"""
+
+import argparse
+import random
+
+from benchmarks.utils import measure
+
+from apps.notes.layout import update_layout
+
+
+def make_graph(count, rng):
+    """Build mind map nodes and edges with about two connections per note"""
+    nodes = [
+        {'id': i, 'layout_x': None, 'layout_y': None, 'layout_stale': False}
+        for i in range(count)
+    ]
+    edges = [
+        {'source': i, 'target': rng.randrange(max(i, 1))}
+        for i in range(1, count) for _ in range(2)
+    ]
+    return nodes, edges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 1000, 2000, 5000])
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    for count in args.sizes:
+        nodes, edges = make_graph(count, rng)
+        with measure(f'full layout, {count} notes', count_queries=False):
+            changed = update_layout(nodes, edges)
+
+        for note_id, x, y in changed:
+            nodes[note_id].update(layout_x=x, layout_y=y)
+        nodes.append({'id': count, 'layout_x': None, 'layout_y': None, 'layout_stale': False})
+        edges.append({'source': count, 'target': rng.randrange(count)})
+        with measure(f'incremental layout, {count} notes', count_queries=False):
+            changed = update_layout(nodes, edges)
+        print(f'    {len(changed)} notes moved')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark of mind map viewport queries on large laid out graphs,
+comparing one user's full payload with a zoomed-in viewport and a
+zoomed-out clustered one.
+
+    python -m benchmarks.mindmap_viewport --notes 200000 --users 10
+"""
+
+import argparse
+import json
+import math
+
+from benchmarks.utils import test_database, measure, create_users, analyze
+
+from apps.notes.models import Note, Connection
+from apps.notes.viewport import bbox_filter, cell_key, viewport
+
+
+def create_graph(count, user, spacing=220.0, batch_size=10_000):
+    """Create notes on a square grid, each connected to its right neighbor"""
+    side = math.ceil(math.sqrt(count))
+    for start in range(0, count, batch_size):
+        batch = []
+        for i in range(start, min(start + batch_size, count)):
+            x, y = (i % side) * spacing, (i // side) * spacing
+            batch.append(Note(
+                title=f'Note {i}', content='Benchmark', user=user,
+                layout_x=x, layout_y=y, layout_cell=cell_key(x, y),
+            ))
+        Note.objects.bulk_create(batch)
+
+    note_ids = list(Note.objects.filter(user=user).order_by('id').values_list('id', flat=True))
+    batch = []
+    for i in range(len(note_ids) - 1):
+        if (i + 1) % side:
+            batch.append(Connection(user=user, source_id=note_ids[i], target_id=note_ids[i + 1]))
+        if len(batch) == batch_size:
+            Connection.objects.bulk_create(batch)
+            batch = []
+    Connection.objects.bulk_create(batch)
+    return side * spacing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--notes', type=int, default=200_000)
+    parser.add_argument('--users', type=int, default=10)
+    args = parser.parse_args()
+
+    with test_database():
+        users = create_users('user', args.users)
+        with measure(f'seed {args.notes} notes on grids', count_queries=False):
+            for user in users:
+                extent = create_graph(args.notes // len(users), user)
+            analyze(Note, Connection)
+
+        notes = Note.objects.filter(user=user)
+        connections = Connection.objects.filter(user=user)
+        with measure('full mind map (nodes and edges)'):
+            payload = {
+                'nodes': list(notes.values('id', 'title', 'has_checkboxes', 'all_checked', 'layout_x', 'layout_y')),
+                'edges': list(connections.values('id', 'source', 'target', 'label')),
+            }
+        print(f'    {len(json.dumps(payload)) / 1024:.0f} KiB')
+
+        centre = extent / 2
+        for label, bbox, zoom in [
+            ('zoomed-in viewport', (centre - 800, centre - 500, centre + 800, centre + 500), 1.0),
+            ('zoomed-out viewport', (0, 0, extent, extent), 0.02),
+        ]:
+            with measure(label):
+                payload = viewport(notes, connections, bbox, zoom)
+            items = len(payload.get('nodes', payload.get('clusters')))
+            print(f'    {payload["mode"]}: {items} items, {len(json.dumps(payload)) / 1024:.0f} KiB')
+            plan = notes.filter(bbox_filter(bbox)).explain().splitlines()
+            print(f'    plan: {" / ".join(plan[:3])}{" ..." if len(plan) > 3 else ""}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Benchmark of neighborhood and shortest path queries over one user's note
+graph, comparing the recursive CTE with the batched breadth-first search.
+
+    python -m benchmarks.note_graph --notes 20000 --depth 3
+"""
+
+import argparse
+
+from benchmarks.utils import test_database, measure, create_users
+from benchmarks.connection_listing import create_graph
+
+from django.test import override_settings
+from apps.notes.graph import neighborhood, shortest_path
+from apps.notes.models import Note
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--notes', type=int, default=20_000)
+    parser.add_argument('--depth', type=int, default=3)
+    args = parser.parse_args()
+
+    with test_database():
+        # a single user, so every note lives in one large graph
+        user, = create_users('user', 1)
+        with measure(f'seed {args.notes} notes and connections', count_queries=False):
+            create_graph(args.notes, [user])
+
+        notes = Note.objects.filter(user=user).order_by('id')
+        root = notes.first().id
+        for backend in ['cte', 'bfs']:
+            with override_settings(NOTES_GRAPH_BACKEND=backend):
+                with measure(f'neighborhood depth {args.depth} ({backend})'):
+                    reached = neighborhood(user, root, args.depth)
+            print(f'    {len(reached)} notes reached')
+
+        end = notes[min(args.notes, 20) - 1].id
+        with measure('shortest path (bidirectional BFS)'):
+            path = shortest_path(user, root, end)
+        print(f'    {len(path) - 1 if path else None} connections')
+
+
+if __name__ == '__main__':
+    main()
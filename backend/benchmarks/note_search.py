@@ -0,0 +1,73 @@
+"""
+Benchmark of the note search: a LIKE '%q%' scan over title and content
+(as done by the admin search) against the search engine, over a large
+notes table.
+
+    python -m benchmarks.note_search --notes 1000000
+"""
+
+import argparse
+import random
+
+from benchmarks.utils import test_database, measure, create_users
+
+from django.db.models import Q
+from apps.notes.models import Note
+from apps.notes.search import index_notes, search_notes
+
+VOCABULARY = '''
+    aula prova cálculo álgebra física química biologia história geografia
+    lição exercício trabalho seminário leitura revisão resumo projeto
+    laboratório relatório estágio monitoria matrícula disciplina professor
+    turma semestre horário biblioteca artigo pesquisa extensão campus
+    agronomia zootecnia florestal solo planta animal colheita irrigação
+'''.split()
+
+
+def create_batch(batch):
+    """Insert and index a batch of notes (re-read, as MySQL does not return ids)"""
+    Note.objects.bulk_create(batch)
+    index_notes(Note.objects.order_by('-id')[:len(batch)])
+
+
+def create_notes(count, users, batch_size=5000):
+    """Create notes with random Portuguese text, indexing them in batches"""
+    rng = random.Random(42)
+    batch = []
+    for i in range(count):
+        batch.append(Note(
+            title=' '.join(rng.choices(VOCABULARY, k=3)),
+            content=' '.join(rng.choices(VOCABULARY, k=25)),
+            user=users[i % len(users)],
+        ))
+        if len(batch) == batch_size:
+            create_batch(batch)
+            batch = []
+    if batch:
+        create_batch(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--notes', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--query', default='revisão de cálculo')
+    args = parser.parse_args()
+    
+    with test_database():
+        users = create_users('user', args.users)
+        with measure(f'seed and index {args.notes} notes', count_queries=False):
+            create_notes(args.notes, users)
+        
+        user = users[0]
+        notes = Note.objects.filter(user=user)
+        word = args.query.split()[0]
+        with measure(f'LIKE scan for {word!r} (user notes, unranked)'):
+            like = list(notes.filter(Q(title__icontains=word) | Q(content__icontains=word)).values_list('id', flat=True))
+        with measure(f'search {args.query!r} (user notes, ranked)'):
+            results = search_notes(notes, user, args.query, 20)
+        print(f'    LIKE: {len(like)} rows, search: {len(results)} ranked results')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark of serializing one user's notes, comparing DRF's ModelSerializer
+and JSONRenderer with the .values() fast path and the orjson renderer.
+
+    python -m benchmarks.note_serialization --notes 10000
+"""
+
+import argparse
+
+from benchmarks.utils import test_database, measure, create_user
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from apps.activities.models import Activity
+from apps.notes.models import Note, Checkbox
+from apps.notes.serializers import NoteSerializer
+from ufranotes.renderers import ORJSONRenderer
+
+
+def create_notes(user, count, batch_size=5000):
+    """Create notes with three checkboxes and one activity each"""
+    activity = Activity.objects.create(name='Leitura', activity_type='intelligence')
+    for start in range(0, count, batch_size):
+        Note.objects.bulk_create([
+            Note(title=f'Note {i}', content='Benchmark content ' * 20, user=user, has_checkboxes=True)
+            for i in range(start, min(start + batch_size, count))
+        ])
+    note_ids = list(Note.objects.filter(user=user).values_list('id', flat=True))
+    Checkbox.objects.bulk_create(
+        [Checkbox(note_id=note_id, text=f'Item {order}', order=order) for note_id in note_ids for order in range(3)],
+        batch_size=batch_size,
+    )
+    Note.activities.through.objects.bulk_create(
+        [Note.activities.through(note_id=note_id, activity=activity) for note_id in note_ids],
+        batch_size=batch_size,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--notes', type=int, default=10_000)
+    args = parser.parse_args()
+
+    with test_database():
+        user = create_user('serialization')
+        with measure(f'seed {args.notes} notes', count_queries=False):
+            create_notes(user, args.notes)
+
+        request = Request(APIRequestFactory().get('/api/notes/notes/'))
+        notes = Note.objects.filter(user=user).order_by('-created_at')
+
+        with measure('ModelSerializer + JSONRenderer') as slow:
+            data = NoteSerializer(
+                notes.prefetch_related('checkboxes', 'activities'), many=True, context={'request': request}
+            ).data
+            expected = JSONRenderer().render(data)
+
+        with measure('.values() fast path + ORJSONRenderer') as fast:
+            serializer = NoteSerializer(context={'request': request})
+            content = ORJSONRenderer().render(serializer.to_representation_values(serializer.values_queryset(notes)))
+
+        assert content == expected, 'the fast path output differs'
+        print(f'    {len(content) / 1e6:.1f} MB, {slow["elapsed"] / fast["elapsed"]:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark of send_reminder_notifications with many due reminders, with
+Celery in eager mode and the local-memory email backend, so the fanned out
+digest tasks run inline.
+
+    python -m benchmarks.reminder_dispatch --reminders 100000
+"""
+
+import argparse
+
+from benchmarks.utils import test_database, measure, create_users
+
+from django.core import mail
+from django.test.utils import override_settings
+from django.utils import timezone
+from apps.notes.models import Note
+from apps.notes.tasks import send_reminder_notifications
+from ufranotes.celery import app as celery_app
+
+FREQUENCIES = ['none', 'daily', 'weekly', 'monthly']
+
+
+def create_due_reminders(count, users):
+    due = timezone.now() - timezone.timedelta(minutes=1)
+    Note.objects.bulk_create(
+        [
+            Note(
+                title=f'Reminder {i}', content='Benchmark reminder ' * 20, user=users[i % len(users)],
+                has_reminder=True, reminder_datetime=due, next_fire_at=due,
+                reminder_frequency=FREQUENCIES[i % len(FREQUENCIES)]
+            )
+            for i in range(count)
+        ],
+        batch_size=1000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--reminders', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=1000)
+    args = parser.parse_args()
+    
+    with test_database(), override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+        users = create_users('user', args.users)
+        create_due_reminders(args.reminders, users)
+        
+        mail.outbox = []
+        celery_app.conf.update(CELERY_TASK_ALWAYS_EAGER=True)
+        with measure(f'send_reminder_notifications ({args.reminders} due)'):
+            result = send_reminder_notifications()
+        print(result, f'- {len(mail.outbox)} emails in the outbox')
+
+
+if __name__ == '__main__':
+    main()
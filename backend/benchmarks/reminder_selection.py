@@ -0,0 +1,55 @@
+"""
+Benchmark of due reminder selection over a large notes table, comparing
+the previous has_reminder/reminder_datetime filter with the range scan of
+the next_fire_at index.
+
+    python -m benchmarks.reminder_selection --notes 1000000
+"""
+
+import argparse
+import datetime
+
+from benchmarks.utils import test_database, measure, create_users
+
+from django.utils import timezone
+from apps.notes.models import Note
+
+
+def create_notes(count, users, now):
+    """Create notes where 1% have reminders and a tenth of those are due"""
+    batch = []
+    for i in range(count):
+        note = Note(title=f'Note {i}', content='Benchmark', user=users[i % len(users)])
+        if i % 100 == 0:
+            offset = datetime.timedelta(hours=-1 if i % 1000 == 0 else 24 + i % 500)
+            note.has_reminder = True
+            note.reminder_datetime = note.next_fire_at = now + offset
+        batch.append(note)
+        if len(batch) == 10_000:
+            Note.objects.bulk_create(batch)
+            batch = []
+    Note.objects.bulk_create(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--notes', type=int, default=1_000_000)
+    args = parser.parse_args()
+    
+    with test_database():
+        now = timezone.now()
+        users = create_users('user', 1000)
+        with measure(f'seed {args.notes} notes', count_queries=False):
+            create_notes(args.notes, users, now)
+        
+        previous = Note.objects.filter(has_reminder=True, reminder_datetime__lte=now)
+        indexed = Note.objects.filter(next_fire_at__lte=now).order_by('next_fire_at')
+        
+        for label, queryset in [('previous filter', previous), ('next_fire_at index', indexed)]:
+            with measure(f'select due reminders ({label})'):
+                due = list(queryset.values_list('id', flat=True))
+            print(f'    {len(due)} due, plan: {queryset.explain()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Benchmarks run against a throwaway test database created from the
+configured DATABASES, the same way the test suite does. Run them from the
+backend directory, e.g.:
+
+    python -m benchmarks.checkbox_counters
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ufranotes.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from ufranotes.celery import app as celery_app
+
+
+@contextmanager
+def test_database():
+    """Create a test database for the duration of the benchmark, running Celery tasks inline"""
+    celery_app.conf.update(CELERY_TASK_ALWAYS_EAGER=True)
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def measure(label, count_queries=True):
+    """Print the wall-clock time and, optionally, the number of queries of the block"""
+    result = {}
+    queries = None
+    if count_queries:
+        connection.queries_log.clear()
+        queries = CaptureQueriesContext(connection)
+        queries.__enter__()
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['elapsed'] = time.perf_counter() - start
+        if queries is not None:
+            queries.__exit__(None, None, None)
+            result['queries'] = len(queries)
+    
+    query_count = f'{result["queries"]:8d} queries' if count_queries else ''
+    print(f'{label:<48} {result["elapsed"] * 1000:10.1f} ms {query_count}')
+
+
+def create_user(username):
+    """Create a benchmark user"""
+    return get_user_model().objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='benchmark123'
+    )
+
+
+def create_users(prefix, count):
+    """Create many benchmark users at once, without hashing passwords"""
+    User = get_user_model()
+    return User.objects.bulk_create([
+        User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', password='!')
+        for i in range(count)
+    ])
+
+
+def analyze(*models):
+    """Refresh the planner statistics of the given models' tables after seeding"""
+    statement = 'ANALYZE TABLE {}' if connection.vendor == 'mysql' else 'ANALYZE {}'
+    with connection.cursor() as cursor:
+        for model in models:
+            cursor.execute(statement.format(connection.ops.quote_name(model._meta.db_table)))
@@ -0,0 +1,150 @@
+"""
+Async read path of the API viewsets, for deployments served over ASGI.
+
+DRF views are synchronous, so under ASGI every request holds a thread from
+start to end. With ASYNC_READS enabled, viewsets using AsyncReadMixin serve
+the GET requests of the actions listed in async_actions with a coroutine
+handler, `a<action>`: the checks of initial() (authentication, permissions,
+throttling) still run in one hop to the request's thread, then the handler
+awaits the async ORM. Every other request goes through the regular view.
+
+Django's async ORM runs the queries of a request one after the other, in
+the request's thread. gather_queries() runs independent queries on a pool
+of ASYNC_READS_THREADS threads instead, each keeping its own database
+connection open from one query to the next, up to CONN_MAX_AGE, so their
+waits on the database overlap while the process holds at most that many
+extra connections. Each
+query reads its own snapshot, as consecutive queries in autocommit already
+do: rows written in between may show in one and not the other. Inside a
+transaction the queries keep to the request's connection, the only one
+that sees its writes.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, connections
+from django.db.models import prefetch_related_objects
+from django.http import Http404
+from django.utils.decorators import classonlymethod
+from rest_framework.response import Response
+
+SAFE_METHODS = ['get', 'head']
+
+
+def in_transaction():
+    return connection.in_atomic_block
+
+
+def run_query(function):
+    """
+    Run a query function on a pool thread. The thread's connections are
+    checked before each query, as Django does between requests: one past
+    CONN_MAX_AGE, or that hit an error and is unusable, is closed, and with
+    CONN_HEALTH_CHECKS one the server dropped meanwhile is replaced.
+    """
+    for conn in connections.all(initialized_only=True):
+        conn.close_if_unusable_or_obsolete()
+    return function()
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(settings.ASYNC_READS_THREADS, thread_name_prefix='async-reads')
+    return _executor
+
+
+async def gather_queries(*functions):
+    """
+    Run independent, read-only, query functions and return their results
+    """
+    if await sync_to_async(in_transaction)():
+        return [await sync_to_async(function)() for function in functions]
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*[loop.run_in_executor(get_executor(), run_query, function) for function in functions])
+
+
+class AsyncReadMixin:
+    """
+    Viewset mixin serving the GET requests of async_actions with coroutine
+    handlers when ASYNC_READS is enabled
+    """
+    async_actions = []
+    
+    @classonlymethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        methods = [method for method in SAFE_METHODS if (actions or {}).get('get') in cls.async_actions]
+        if not settings.ASYNC_READS or not methods:
+            return view
+        sync_view = sync_to_async(view)
+        
+        async def async_view(request, *args, **kwargs):
+            if request.method.lower() not in methods:
+                return await sync_view(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            self.action_map = {**actions, 'head': actions['get']}
+            for method, action in self.action_map.items():
+                setattr(self, method, getattr(self, action))
+            return await self.adispatch(request, *args, **kwargs)
+        
+        async_view.cls = cls
+        async_view.initkwargs = initkwargs
+        async_view.actions = actions
+        # csrf_exempt() only wraps sync views before Django 5.0
+        async_view.csrf_exempt = True
+        return async_view
+    
+    async def adispatch(self, request, *args, **kwargs):
+        """
+        Async counterpart of dispatch(), awaiting the handler of the action
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            response = await getattr(self, f'a{self.action}')(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        if hasattr(self.response, 'render'):
+            # Render, and run the callbacks storing the response in the cache,
+            # in the request's thread rather than in the event loop
+            await sync_to_async(self.response.render)()
+        return self.response
+    
+    async def aget_object(self):
+        """
+        Async counterpart of get_object(); the prefetch lookups of the
+        queryset, independent of each other, are loaded together
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        lookups = queryset._prefetch_related_lookups
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.prefetch_related(None).aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        
+        if lookups:
+            obj._prefetched_objects_cache = {}
+            await gather_queries(*[partial(prefetch_related_objects, [obj], lookup) for lookup in lookups])
+        self.check_object_permissions(self.request, obj)
+        return obj
+    
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        data = await sync_to_async(lambda: self.get_serializer(instance).data)()
+        return Response(data)
@@ -0,0 +1,204 @@
+"""
+Conditional requests for the API viewsets.
+
+Reads answer with a strong ETag and a Last-Modified header derived from the
+rows the response is built from: for each source queryset, the latest
+modification time and the number of rows, aggregated in one UNION ALL query
+without loading or serializing any object. A new or changed row moves the
+latest time and a deleted one lowers the count (and leaves a tombstone where
+the model keeps them), so the validators change whenever the response would.
+
+`If-None-Match` and `If-Modified-Since` are answered with 304 Not Modified
+before the serializer runs. Updates and deletions honor `If-Match` and
+`If-Unmodified-Since`, evaluated with the row locked so two clients editing
+the same version can't both succeed; a failed precondition returns 412.
+
+Viewsets that declare the cache scopes their reads depend on also keep the
+rendered responses in the versioned response cache (see response_cache), so
+a repeated read is answered, or found not modified, without any query.
+The async read path (see asyncviews) goes through aconditional_read().
+"""
+
+import hashlib
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, IntegerField, Max, Value
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import NotFound
+from .response_cache import get_response, response_key, store_response
+
+PRECONDITION_HEADERS = ['HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE', 'HTTP_IF_NONE_MATCH']
+
+
+def versions_query(sources):
+    """
+    Return the query of the (latest modification time, row count) of each
+    (queryset, field) source
+    """
+    queries = [
+        queryset.prefetch_related(None).order_by()
+        .values(version_source=Value(i, output_field=IntegerField()))
+        .annotate(latest=Max(field), count=Count('pk'))
+        for i, (queryset, field) in enumerate(sources)
+    ]
+    return queries[0].union(*queries[1:], all=True)
+
+
+def read_versions(sources, rows):
+    rows = {row['version_source']: (row['latest'], row['count']) for row in rows}
+    return [rows.get(i, (None, 0)) for i in range(len(sources))]
+
+
+def get_versions(sources):
+    """
+    Return the (latest modification time, row count) of each
+    (queryset, field) source, in a single query
+    """
+    return read_versions(sources, versions_query(sources))
+
+
+async def aget_versions(sources):
+    return read_versions(sources, [row async for row in versions_query(sources)])
+
+
+class ConditionalRequestMixin:
+    """
+    Viewset mixin emitting ETag and Last-Modified on reads and evaluating the
+    request preconditions against them before the serializer runs
+    
+    get_version_sources() returns the (queryset, timestamp field) pairs the
+    response of the current action is built from; on detail actions the
+    first one must select the object itself, which is locked on writes.
+    cache_scopes lists the response cache scopes the reads depend on; reads
+    are not cached when it is None.
+    """
+    cache_scopes = None
+    
+    def get_version_sources(self):
+        """
+        Return the viewset queryset, narrowed to the object on detail actions
+        """
+        queryset = self.get_queryset()
+        if self.detail:
+            queryset = queryset.filter(pk=self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        return [(queryset, 'updated_at')]
+    
+    def get_cache_scopes(self):
+        return self.cache_scopes
+    
+    def get_response_cache_key(self):
+        """
+        Return the response cache key of the current read, or None when it
+        is not cached; only JSON responses are
+        """
+        scopes = self.get_cache_scopes()
+        if scopes is None or self.request.accepted_renderer.format != 'json':
+            return None
+        return response_key(scopes, self.request)
+    
+    def get_validators(self, versions=None):
+        """
+        Return the ETag and the Last-Modified time of the current
+        representation, given the versions of its sources when they are
+        already known
+        """
+        if versions is None:
+            versions = get_versions(self.get_version_sources())
+        state = [self.request.user.pk, self.request.get_full_path(), self.request.accepted_renderer.format]
+        state += [(latest.isoformat() if latest else None, count) for latest, count in versions]
+        times = [latest for latest, _ in versions if latest is not None]
+        return quote_etag(hashlib.sha1(repr(state).encode()).hexdigest()), max(times, default=None)
+    
+    def evaluate_preconditions(self, validators):
+        """
+        Return the 304 or 412 response the request preconditions call for,
+        or None when the request should be processed
+        """
+        etag, last_modified = validators
+        return get_conditional_response(
+            self.request, etag=etag, last_modified=last_modified and int(last_modified.timestamp()),
+        )
+    
+    def set_validators(self, response, validators):
+        etag, last_modified = validators
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+    
+    def conditional_read(self, handler, request, *args, **kwargs):
+        """
+        Answer a read from the response cache, or from the validators when
+        the client's copy is current, or run the handler
+        """
+        key, cached = self.get_cached_response()
+        if cached is not None:
+            response, validators = cached
+            return self.set_validators(self.evaluate_preconditions(validators) or response, validators)
+        
+        validators = self.get_validators()
+        response = self.evaluate_preconditions(validators) or handler(request, *args, **kwargs)
+        if key and response.status_code == 200:
+            store_response(key, response, validators)
+        return self.set_validators(response, validators)
+    
+    async def aconditional_read(self, handler, request, *args, **kwargs):
+        """
+        conditional_read() of the async read path, awaiting the handler
+        """
+        key, cached = await sync_to_async(self.get_cached_response)()
+        if cached is not None:
+            response, validators = cached
+            return self.set_validators(self.evaluate_preconditions(validators) or response, validators)
+        
+        validators = self.get_validators(await aget_versions(self.get_version_sources()))
+        response = self.evaluate_preconditions(validators) or await handler(request, *args, **kwargs)
+        if key and response.status_code == 200:
+            # Stored once adispatch() renders the response, off the event loop
+            store_response(key, response, validators)
+        return self.set_validators(response, validators)
+    
+    def get_cached_response(self):
+        """
+        Return the response cache key of the current read and the cached
+        (response, validators), either of which may be None
+        """
+        key = self.get_response_cache_key()
+        return key, get_response(key) if key else None
+    
+    def conditional_write(self, handler, request, *args, **kwargs):
+        """
+        Run a write only if its preconditions hold for the locked object;
+        requests without preconditions skip the check entirely
+        """
+        if not any(header in request.META for header in PRECONDITION_HEADERS):
+            return handler(request, *args, **kwargs)
+        
+        with transaction.atomic():
+            queryset, _ = self.get_version_sources()[0]
+            if not list(queryset.prefetch_related(None).select_for_update(of=('self',)).values_list('pk')):
+                raise NotFound()
+            response = self.evaluate_preconditions(self.get_validators()) or handler(request, *args, **kwargs)
+        if request.method != 'DELETE' and response.status_code == 200:
+            self.set_validators(response, self.get_validators())
+        return response
+    
+    def list(self, request, *args, **kwargs):
+        return self.conditional_read(super().list, request, *args, **kwargs)
+    
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_read(super().retrieve, request, *args, **kwargs)
+    
+    async def alist(self, request, *args, **kwargs):
+        return await self.aconditional_read(super().alist, request, *args, **kwargs)
+    
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.aconditional_read(super().aretrieve, request, *args, **kwargs)
+    
+    def update(self, request, *args, **kwargs):
+        return self.conditional_write(super().update, request, *args, **kwargs)
+    
+    def destroy(self, request, *args, **kwargs):
+        return self.conditional_write(super().destroy, request, *args, **kwargs)
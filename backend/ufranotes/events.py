@@ -0,0 +1,260 @@
+"""
+Live change events of a user's data, for the Server-Sent Events stream.
+
+Changes are published once their transaction commits. Each event gets the
+next number of its user's sequence and is stored in a per-user ring buffer
+of the last NOTES_EVENTS_BUFFER_SIZE events, kept in the default cache
+(Redis in production, so shared by every worker), then handed to the
+broker, which wakes up the user's open streams.
+
+The broker is chosen with NOTES_EVENTS_BROKER: 'local' delivers events to
+the streams of the same process, enough for a single ASGI worker; 'redis'
+goes through Redis pub/sub (NOTES_EVENTS_REDIS_URL), so changes made by any
+worker reach every stream.
+
+A stream resuming after a disconnection sends the id of the last event it
+received; the events after it are replayed from the ring buffer. When they
+are no longer there, the stream starts with a 'reset' event and the client
+should catch up with a delta sync instead.
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Events a subscription holds for a stream that doesn't read them; a stream
+# falling further behind is closed and resumes from the ring buffer
+QUEUE_SIZE = 100
+
+logger = logging.getLogger(__name__)
+
+
+def event_key(user_id, name):
+    return f'events:{user_id}:{name}'
+
+
+def next_event_id(user_id):
+    """
+    Return the next number of the user's sequence. A missing or evicted
+    counter starts again at a number past any earlier event, so streams
+    resuming from the old sequence get a reset.
+    """
+    key = event_key(user_id, 'last')
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns() // 1000, None)
+        return cache.incr(key)
+
+
+def publish(user_id, event_type, action, data):
+    """
+    Publish a change to the user's streams once the current transaction
+    commits; nothing is sent for changes rolled back
+    """
+    transaction.on_commit(lambda: send(user_id, event_type, action, data))
+
+
+def send(user_id, event_type, action, data):
+    """
+    Buffer an event and hand it to the broker. The change is committed by
+    then, so an unreachable cache or broker is logged instead of failing
+    the request; streams missing the event get a reset when they resume.
+    """
+    try:
+        event = {'id': next_event_id(user_id), 'type': event_type, 'action': action, 'data': data}
+        size = settings.NOTES_EVENTS_BUFFER_SIZE
+        cache.set(event_key(user_id, event['id'] % size), orjson.dumps(event), None)
+        get_broker().publish(user_id, event)
+    except Exception:
+        logger.exception('Could not publish the %s event of user %s', event_type, user_id)
+        return None
+    return event
+
+
+def replay(user_id, last_id):
+    """
+    Return the buffered events of the user after last_id, or None when some
+    of them have already left the ring buffer
+    """
+    size = settings.NOTES_EVENTS_BUFFER_SIZE
+    current = cache.get(event_key(user_id, 'last'), 0)
+    if last_id > current or current - last_id > size:
+        return None
+    
+    numbers = range(last_id + 1, current + 1)
+    slots = cache.get_many([event_key(user_id, number % size) for number in numbers])
+    events = []
+    for number in numbers:
+        slot = slots.get(event_key(user_id, number % size))
+        event = orjson.loads(slot) if slot is not None else None
+        if event is not None and event['id'] > number:
+            return None
+        # Events not written yet are being published and arrive live
+        if event is not None and event['id'] == number:
+            events.append(event)
+    return events
+
+
+class Subscription:
+    """
+    Events published to one user while a stream is open
+    """
+    
+    def __init__(self):
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.loop = asyncio.get_running_loop()
+        self.overflowed = False
+    
+    def put(self, event):
+        """
+        Queue an event; may be called from any thread
+        """
+        self.loop.call_soon_threadsafe(self.put_nowait, event)
+    
+    def put_nowait(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+    
+    async def get(self):
+        """
+        Return the next event, or None once events were dropped
+        """
+        if self.overflowed:
+            return None
+        event = await self.queue.get()
+        return None if self.overflowed else event
+
+
+class LocalBroker:
+    """
+    Broker delivering events to the subscriptions of the current process
+    """
+    
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+    
+    def publish(self, user_id, event):
+        for subscription in list(self.subscriptions.get(user_id, ())):
+            subscription.put(event)
+    
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        subscription = Subscription()
+        self.subscriptions[user_id].add(subscription)
+        try:
+            yield subscription
+        finally:
+            self.subscriptions[user_id].discard(subscription)
+            if not self.subscriptions[user_id]:
+                del self.subscriptions[user_id]
+
+
+class RedisBroker:
+    """
+    Broker going through Redis pub/sub, one channel per user, so events
+    published by any process reach every subscription
+    """
+    
+    def __init__(self, url):
+        import redis
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+    
+    def channel(self, user_id):
+        return f'notes:events:{user_id}'
+    
+    def publish(self, user_id, event):
+        self.client.publish(self.channel(user_id), orjson.dumps(event))
+    
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        import redis.asyncio
+        subscription = Subscription()
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.channel(user_id))
+        
+        async def forward():
+            async for message in pubsub.listen():
+                if message['type'] == 'message':
+                    subscription.put_nowait(orjson.loads(message['data']))
+        
+        task = asyncio.create_task(forward())
+        try:
+            yield subscription
+        finally:
+            task.cancel()
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        if settings.NOTES_EVENTS_BROKER == 'redis':
+            _broker = RedisBroker(settings.NOTES_EVENTS_REDIS_URL)
+        else:
+            _broker = LocalBroker()
+    return _broker
+
+
+def format_event(event):
+    """
+    Return the Server-Sent Events frame of an event
+    """
+    return b'id: %d\nevent: %s\ndata: %s\n\n' % (
+        event['id'], event['type'].encode(), orjson.dumps({'action': event['action'], 'data': event['data']}),
+    )
+
+
+async def event_stream(user_id, last_id=None):
+    """
+    Yield the Server-Sent Events frames of the user's changes, starting with
+    those after last_id, with a comment every NOTES_EVENTS_KEEPALIVE seconds
+    without events so proxies keep the connection open
+    
+    The stream ends after NOTES_EVENTS_STREAM_TIMEOUT seconds: Django doesn't
+    notice a client disconnecting from a streaming response, so this is what
+    frees abandoned streams. EventSource reconnects by itself and resumes
+    from the last event it received.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.NOTES_EVENTS_STREAM_TIMEOUT
+    async with get_broker().subscribe(user_id) as subscription:
+        # Subscribed first, so nothing published during the replay is missed
+        yield b'retry: 3000\n\n'
+        replayed = set()
+        if last_id is not None:
+            events = await sync_to_async(replay)(user_id, last_id)
+            if events is None:
+                yield b'event: reset\ndata: {}\n\n'
+            for event in events or []:
+                replayed.add(event['id'])
+                yield format_event(event)
+        
+        while loop.time() < deadline:
+            timeout = min(settings.NOTES_EVENTS_KEEPALIVE, deadline - loop.time())
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout)
+            except asyncio.TimeoutError:
+                yield b': keep-alive\n\n'
+                continue
+            if event is None:
+                # Too far behind; the client reconnects and resumes
+                return
+            if event['id'] not in replayed:
+                yield format_event(event)
@@ -0,0 +1,39 @@
+"""
+JSON renderer built on orjson.
+
+The output is byte for byte the one of DRF's JSONRenderer with the default
+settings (compact, unescaped unicode, U+2028/U+2029 escaped). Values orjson
+writes differently are left to the stock renderer: dates and times go through
+DRF's encoder, floats written with an exponent ("1e16" instead of "1e+16")
+and anything orjson rejects (non-string keys, integers over 64 bits) are
+rendered again with the standard library, as are indented responses.
+"""
+
+import re
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+EXPONENT = re.compile(rb'\de-?\d')
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement of JSONRenderer serializing with orjson
+    """
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        try:
+            content = orjson.dumps(data, default=self.encoder_class().default, option=OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if EXPONENT.search(content):
+            return super().render(data, accepted_media_type, renderer_context)
+        return content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,125 @@
+"""
+Versioned cache of API read responses.
+
+Responses are stored with their ETag and Last-Modified under keys that
+include the version of every scope they depend on: the data of one user
+('user:<id>') or the shared activities ('activities'). Model signals bump the
+version of a scope when its data changes, so stale responses are never read
+again and simply expire. A version is bumped when the change is made and
+again when its transaction commits, so a response built by a concurrent
+request from data read before the commit is never served either.
+
+Only the default cache is used, which keeps this working on the local
+memory and file-based backends as well as on Redis. Hits and misses are
+counted in the cache too, so the counters are shared by every process using
+the same Redis.
+"""
+
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+# Scope of the requesting user's data, and of the activities shared by all users
+USER = 'user'
+ACTIVITIES = 'activities'
+COUNTERS = ['hits', 'misses']
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def version_key(scope):
+    return f'response:version:{scope}'
+
+
+def get_versions(scopes):
+    """
+    Return the current version of each scope, starting missing or evicted
+    ones at a number no earlier version can collide with
+    """
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(scope):
+    key = version_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def invalidate(scope):
+    """
+    Invalidate the cached responses of a scope, now and once the current
+    transaction commits
+    """
+    bump_version(scope)
+    transaction.on_commit(lambda: bump_version(scope))
+
+
+def invalidate_user(user_id):
+    invalidate(user_scope(user_id))
+
+
+def response_key(scopes, request):
+    """
+    Return the cache key of the response to a request, for the current
+    versions of the scopes it depends on
+    """
+    scopes = [user_scope(request.user.pk) if scope == USER else scope for scope in scopes]
+    variant = f'{request.build_absolute_uri()} {request.accepted_media_type}'
+    versions = ':'.join(map(str, get_versions(scopes)))
+    return f"response:{','.join(scopes)}:{versions}:{hashlib.sha1(variant.encode()).hexdigest()}"
+
+
+def get_response(key):
+    """
+    Return the cached (response, validators) under the key, or None,
+    counting the hit or miss
+    """
+    cached = cache.get(key)
+    count('misses' if cached is None else 'hits')
+    if cached is None:
+        return None
+    content, content_type, validators = cached
+    return HttpResponse(content, content_type=content_type), validators
+
+
+def store_response(key, response, validators):
+    """
+    Cache a response with its validators once it has been rendered
+    """
+    def store(rendered):
+        cache.set(key, (rendered.content, rendered['Content-Type'], validators), settings.RESPONSE_CACHE_TIMEOUT)
+    
+    response.add_post_render_callback(store)
+
+
+def count(counter):
+    key = f'response:{counter}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_stats():
+    """
+    Return the hit and miss counters and the hit ratio
+    """
+    values = cache.get_many([f'response:{counter}' for counter in COUNTERS])
+    stats = {counter: values.get(f'response:{counter}', 0) for counter in COUNTERS}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / total if total else None
+    return stats
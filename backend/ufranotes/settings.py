@@ -79,6 +79,11 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default=''),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='3306'),
+        # Seconds a connection is reused, also by the threads of async reads;
+        # keep it below MySQL's wait_timeout. Health checks replace connections
+        # the server dropped before that.
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
         'OPTIONS': {
             'charset': 'utf8mb4',
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
@@ -86,6 +91,36 @@ DATABASES = {
     }
 }
 
+# Cache
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at Redis in production
+# (django.core.cache.backends.redis.RedisCache, redis://localhost:6379/1), or at a
+# directory to share the cache between local processes
+# (django.core.cache.backends.filebased.FileBasedCache, /var/tmp/ufranotes)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='ufranotes'),
+    }
+}
+
+MINDMAP_CACHE_TIMEOUT = config('MINDMAP_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=60 * 60, cast=int)
+
+# Search
+# 'auto' uses MySQL FULLTEXT on MySQL and the inverted index elsewhere; 'fulltext' or 'index' force one
+NOTES_SEARCH_BACKEND = config('NOTES_SEARCH_BACKEND', default='auto')
+
+# Note graph
+# 'auto' uses a recursive CTE when the database supports it and a batched BFS otherwise; 'cte' or 'bfs' force one
+NOTES_GRAPH_BACKEND = config('NOTES_GRAPH_BACKEND', default='auto')
+
+# Async reads
+# Serve the read-heavy actions (note list and detail, mind map, connection list, profile)
+# with async views; enable when the API is served over ASGI
+ASYNC_READS = config('ASYNC_READS', default=False, cast=bool)
+# Threads, each with its own database connection, running the independent queries of async reads
+ASYNC_READS_THREADS = config('ASYNC_READS_THREADS', default=4, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -131,6 +166,10 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'ufranotes.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ]
@@ -186,4 +225,43 @@ CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localho
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
-CELERY_TIMEZONE = TIME_ZONE 
\ No newline at end of file
+CELERY_TIMEZONE = TIME_ZONE
+# Run tasks inline, without a broker or workers (local development)
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=False, cast=bool)
+# Periodic tasks run by `celery beat`
+CELERY_BEAT_SCHEDULE = {
+    'prune-deleted-objects': {
+        'task': 'apps.notes.tasks.prune_deleted_objects',
+        'schedule': 24 * 60 * 60,
+    },
+}
+
+# Sync
+# Seconds a sync token lags behind the snapshot; must exceed the longest write transaction
+SYNC_SAFETY_WINDOW = config('SYNC_SAFETY_WINDOW', default=300, cast=int)
+# Days deletion tombstones are kept; older tokens get a full snapshot flagged with 'reset'
+SYNC_TOMBSTONE_RETENTION = config('SYNC_TOMBSTONE_RETENTION', default=30, cast=int)
+
+# Reminders
+# Users whose digests are delivered by each worker task
+REMINDER_BATCH_SIZE = config('REMINDER_BATCH_SIZE', default=500, cast=int)
+# 'skip': fire once for all missed occurrences; 'all': replay each missed occurrence
+REMINDER_CATCH_UP = config('REMINDER_CATCH_UP', default='skip')
+
+# Checkboxes
+# Buffer checkbox toggles in the cache and write them to the database in batches
+CHECKBOX_WRITE_BEHIND = config('CHECKBOX_WRITE_BEHIND', default=False, cast=bool)
+# Seconds a buffered toggle may wait for the flush task
+CHECKBOX_FLUSH_DELAY = config('CHECKBOX_FLUSH_DELAY', default=5, cast=int)
+
+# Live events
+# 'local' delivers change events to the streams of the same process; 'redis' goes through
+# Redis pub/sub, needed when several workers serve the API
+NOTES_EVENTS_BROKER = config('NOTES_EVENTS_BROKER', default='local')
+NOTES_EVENTS_REDIS_URL = config('NOTES_EVENTS_REDIS_URL', default='redis://localhost:6379/2')
+# Events kept per user for streams resuming with Last-Event-ID
+NOTES_EVENTS_BUFFER_SIZE = config('NOTES_EVENTS_BUFFER_SIZE', default=200, cast=int)
+# Seconds between keep-alive comments on an idle stream
+NOTES_EVENTS_KEEPALIVE = config('NOTES_EVENTS_KEEPALIVE', default=15, cast=int)
+# Seconds after which a stream is closed, for the client to reconnect and resume
+NOTES_EVENTS_STREAM_TIMEOUT = config('NOTES_EVENTS_STREAM_TIMEOUT', default=300, cast=int)
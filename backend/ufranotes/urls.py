@@ -6,6 +6,11 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.http import HttpResponse, JsonResponse
 from django.views.generic import RedirectView
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from apps.notes.views import batch
+from .response_cache import get_stats
 
 def api_root(request):
     """Vista para a raiz da API que fornece informação básica"""
@@ -19,6 +24,7 @@ def api_root(request):
                 'users': '/api/users/',
                 'notes': '/api/notes/',
                 'activities': '/api/activities/',
+                'batch': '/api/batch/',
                 'admin': '/admin/'
             }
         })
@@ -32,6 +38,12 @@ def api_root(request):
             }
         })
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def response_cache_stats(request):
+    """Contadores de acertos e falhas do cache de respostas, para monitoramento"""
+    return Response(get_stats())
+
 urlpatterns = [
     path('', api_root, name='api-root'),
     path('admin/', admin.site.urls),
@@ -40,6 +52,8 @@ urlpatterns = [
     path('api/users/', include('apps.users.urls')),
     path('api/notes/', include('apps.notes.urls')),
     path('api/activities/', include('apps.activities.urls')),
+    path('api/batch/', batch, name='batch'),
+    path('api/cache/stats/', response_cache_stats, name='response-cache-stats'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,198 @@
+"""
+Read-only fast path of the list endpoints, serializing .values() rows.
+
+Building a model instance for every row, and walking the serializer fields
+of each one, dominates the time of large lists. Serializers with
+ValuesSerializerMixin build the same representation from .values() rows
+instead: plain fields are read from their column and only converted when
+the stored value is not already its representation (dates), method fields
+are computed from the column declared in values_methods, and nested lists
+are loaded with one query per relation and grouped by parent, as
+prefetch_related would.
+"""
+
+from collections import defaultdict
+from functools import partial
+from operator import itemgetter
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from .asyncviews import gather_queries
+
+# Fields whose representation is the value stored in the column
+PLAIN_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.ChoiceField,
+    serializers.IntegerField, serializers.PrimaryKeyRelatedField,
+)
+PARENT = '_values_parent'
+
+
+def converted(column, convert):
+    def get(row):
+        value = row[column]
+        return None if value is None else convert(value)
+    return get
+
+
+def datetime_representation(field):
+    """
+    Return the to_representation of a DateTimeField with the output time
+    zone looked up once instead of for every value
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    zone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or zone is None:
+        return field.to_representation
+    
+    def to_representation(value):
+        if isinstance(value, str) or timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(zone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return to_representation
+
+
+class ValuesSerializerMixin:
+    """
+    Serializer mixin building the representation of many objects from
+    .values() rows, with a constant number of queries
+    
+    values_methods maps each SerializerMethodField to the column it is
+    computed from and the name of the serializer method computing it from
+    the value of that column.
+    """
+    values_methods = {}
+    
+    def get_values_columns(self):
+        """
+        Return the columns of the non nested fields
+        """
+        columns = []
+        for name, field in self.fields.items():
+            if isinstance(field, serializers.ListSerializer):
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                columns.append(self.values_methods[name][0])
+            elif isinstance(field, serializers.ManyRelatedField) or (
+                isinstance(field, serializers.RelatedField) and not isinstance(field, serializers.PrimaryKeyRelatedField)
+            ):
+                raise ImproperlyConfigured(f'{type(self).__name__}.{name} can not be serialized from .values()')
+            else:
+                columns.append(field.source.replace('.', '__'))
+        return columns
+    
+    def values_queryset(self, queryset, *columns, **expressions):
+        """
+        Return the .values() rows the representation is built from, with
+        the given extra columns
+        """
+        pk = queryset.model._meta.pk.name
+        columns = dict.fromkeys([pk, *self.get_values_columns(), *columns])
+        return queryset.prefetch_related(None).values(*columns, **expressions)
+    
+    def get_nested_values(self, field, pks):
+        """
+        Return the representations of a nested list field for the given
+        parents, grouped by parent
+        """
+        relation = self.Meta.model._meta.get_field(field.source)
+        if relation.one_to_many:
+            lookup = relation.field.name
+        elif relation.many_to_many and not relation.auto_created:
+            lookup = relation.related_query_name()
+        else:
+            raise ImproperlyConfigured(f'{type(self).__name__}.{field.field_name} can not be serialized from .values()')
+        
+        queryset = relation.related_model._default_manager.filter(**{f'{lookup}__in': pks})
+        rows = list(field.child.values_queryset(queryset, **{PARENT: F(lookup)}))
+        groups = defaultdict(list)
+        for row, item in zip(rows, field.child.to_representation_values(rows)):
+            groups[row[PARENT]].append(item)
+        return groups
+    
+    def get_nested_fields(self):
+        return {name: field for name, field in self.fields.items() if isinstance(field, serializers.ListSerializer)}
+    
+    def to_representation_values(self, rows, nested=None):
+        """
+        Return the representation of the objects of the given .values()
+        rows, identical to the one of to_representation(); nested may hold
+        the groups of the nested lists, already loaded
+        """
+        rows = list(rows)
+        pk = self.Meta.model._meta.pk.name
+        pks = [row[pk] for row in rows]
+        if nested is None and rows:
+            nested = {name: self.get_nested_values(field, pks) for name, field in self.get_nested_fields().items()}
+        
+        getters = []
+        for name, field in self.fields.items():
+            if isinstance(field, serializers.ListSerializer):
+                groups = nested[name] if rows else {}
+                getters.append((name, lambda row, groups=groups: groups.get(row[pk], [])))
+            elif isinstance(field, serializers.SerializerMethodField):
+                column, method = self.values_methods[name]
+                getters.append((name, lambda row, column=column, method=getattr(self, method): method(row[column])))
+            elif isinstance(field, PLAIN_FIELDS):
+                getters.append((name, itemgetter(field.source.replace('.', '__'))))
+            elif isinstance(field, serializers.DateTimeField):
+                getters.append((name, converted(field.source.replace('.', '__'), datetime_representation(field))))
+            else:
+                getters.append((name, converted(field.source.replace('.', '__'), field.to_representation)))
+        
+        return [{name: get(row) for name, get in getters} for row in rows]
+    
+    async def ato_representation_values(self, rows):
+        """
+        to_representation_values() of the async read path, loading the
+        nested lists together
+        """
+        rows = list(rows)
+        fields = self.get_nested_fields()
+        if not rows or not fields:
+            return self.to_representation_values(rows, {})
+        pk = self.Meta.model._meta.pk.name
+        pks = [row[pk] for row in rows]
+        groups = await gather_queries(*[partial(self.get_nested_values, field, pks) for field in fields.values()])
+        return self.to_representation_values(rows, dict(zip(fields, groups)))
+
+
+class ValuesListMixin:
+    """
+    Viewset mixin serving the list action through the .values() fast path
+    of its serializer
+    """
+    
+    def get_values_queryset(self, serializer):
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = [ordering]
+        return serializer.values_queryset(
+            self.filter_queryset(self.get_queryset()), *[field.lstrip('-') for field in ordering]
+        )
+    
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        queryset = self.get_values_queryset(serializer)
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.to_representation_values(page))
+        return Response(serializer.to_representation_values(queryset))
+    
+    async def alist(self, request, *args, **kwargs):
+        """
+        list() of the async read path; the paginator reads its page in the
+        request's thread
+        """
+        serializer = self.get_serializer()
+        queryset = self.get_values_queryset(serializer)
+        
+        page = await sync_to_async(self.paginate_queryset)(queryset)
+        if page is not None:
+            return self.get_paginated_response(await serializer.ato_representation_values(page))
+        return Response(await serializer.ato_representation_values([row async for row in queryset]))